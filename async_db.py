@@ -0,0 +1,178 @@
+"""
+Background-thread facade over the db.py helpers.
+
+AsyncDatabase runs every write on one dedicated writer thread and reads on
+a small set of reader threads, so callers on the Tk main loop (or an
+asyncio loop) never block on SQLite. Each call returns a DatabaseFuture,
+which is a concurrent.futures.Future that can also be awaited:
+
+    adb = AsyncDatabase()
+    future = adb.perform_activity_async("Feed Pet", pet_id)   # from any thread
+    pet = await adb.get_or_create_pet_async()                 # from a coroutine
+
+TkDispatcher hands results back to the Tk thread through root.after.
+
+Reads only run in parallel when the database was opened with a read pool
+(init_database(pool_size=...)); otherwise they share the writer connection
+and simply queue behind its lock, off the calling thread.
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import Future
+
+import db
+
+# Helpers that write (or may write) and therefore run on the writer thread
+WRITE_HELPERS = (
+    'get_or_create_pet', 'update_pet_status', 'perform_activity',
+    'check_achievements', 'add_appointment', 'add_medical_record', 'add_reminder',
+    'ingest_activity_logs',
+)
+
+# Read-only helpers, spread over the reader threads
+READ_HELPERS = (
+    'get_recent_chats', 'get_current_scene', 'get_available_scenes', 'get_pet_achievements',
+    'get_upcoming_appointments', 'get_medical_history', 'get_active_reminders',
+    'get_activity_counts', 'get_chat_page', 'get_medical_page', 'get_activity_log_page',
+    'get_appointment_page', 'search_chats',
+)
+
+# Tells a worker thread to exit
+_STOP = object()
+
+
+class DatabaseFuture(Future):
+    """Future for a queued database call; also awaitable from asyncio code"""
+
+    def __await__(self):
+        return asyncio.wrap_future(self).__await__()
+
+
+class AsyncDatabase:
+    """Runs db.py helpers on a single writer thread plus reader threads"""
+
+    def __init__(self, readers=2):
+        self._writes = queue.SimpleQueue()
+        self._reads = queue.SimpleQueue()
+        self._threads = [threading.Thread(target=self._work, args=(self._writes,),
+                                          name="petpal-db-writer", daemon=True)]
+        for i in range(max(1, readers)):
+            self._threads.append(threading.Thread(target=self._work, args=(self._reads,),
+                                                  name=f"petpal-db-reader-{i}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        self._closed = False
+
+    def _work(self, jobs):
+        """Worker loop: run queued calls until told to stop"""
+        while True:
+            job = jobs.get()
+            if job is _STOP:
+                return
+            future, func, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, func, *args, write=True, **kwargs):
+        """Queue func(*args, **kwargs) on the writer (or a reader) thread"""
+        if self._closed:
+            raise RuntimeError("AsyncDatabase is closed")
+        future = DatabaseFuture()
+        (self._writes if write else self._reads).put((future, func, args, kwargs))
+        return future
+
+    def save_chat_message_async(self, user_message, ai_response, pet_id, user_id):
+        """Queue db.save_chat_message(); returns a DatabaseFuture
+
+        user_id has no default here: db's default user 1 would file (and in
+        sharded mode route) every chat under the wrong user.
+        """
+        return self.submit(db.save_chat_message, user_message, ai_response, pet_id=pet_id, user_id=user_id)
+
+    def execute_query_async(self, query, params=None, fetch=False):
+        """Queue a raw query; plain SELECTs go to the reader threads"""
+        write = not (fetch and db.READ_QUERY_PATTERN.match(query))
+        return self.submit(lambda: db.get_database().execute_query(query, params, fetch), write=write)
+
+    def close(self, wait=True):
+        """Stop the worker threads once the calls already queued have run"""
+        if self._closed:
+            return
+        self._closed = True
+        self._writes.put(_STOP)
+        for _ in self._threads[1:]:
+            self._reads.put(_STOP)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+def _async_helper(name, write):
+    func = getattr(db, name)
+
+    def helper(self, *args, **kwargs):
+        return self.submit(func, *args, write=write, **kwargs)
+
+    helper.__name__ = f"{name}_async"
+    helper.__doc__ = f"Queue db.{name}(); returns a DatabaseFuture"
+    return helper
+
+for _name in WRITE_HELPERS:
+    setattr(AsyncDatabase, f"{_name}_async", _async_helper(_name, write=True))
+for _name in READ_HELPERS:
+    setattr(AsyncDatabase, f"{_name}_async", _async_helper(_name, write=False))
+
+
+class TkDispatcher:
+    """Delivers DatabaseFuture results to callbacks on the Tk thread
+
+    Tk must only be touched from its own thread, so finished futures are
+    queued and drained by a root.after poll that runs only while calls
+    are outstanding.
+    """
+
+    def __init__(self, root, poll_ms=30):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._done = queue.SimpleQueue()
+        self._pending = 0
+        self._job = None
+
+    def deliver(self, future, callback=None, errback=None):
+        """Call callback(result) or errback(exception) on the Tk thread when future finishes"""
+        self._pending += 1
+        future.add_done_callback(lambda f: self._done.put((f, callback, errback)))
+        if self._job is None:
+            self._job = self.root.after(self.poll_ms, self._drain)
+        return future
+
+    def _drain(self):
+        self._job = None
+        while True:
+            try:
+                future, callback, errback = self._done.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            error = future.exception() if not future.cancelled() else None
+            if error is not None:
+                if errback:
+                    errback(error)
+                else:
+                    print(f"Database error: {error}")
+            elif callback and not future.cancelled():
+                callback(future.result())
+        if self._pending:
+            self._job = self.root.after(self.poll_ms, self._drain)
+
+    def close(self):
+        """Stop polling; results still in flight are dropped"""
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
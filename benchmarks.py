@@ -0,0 +1,601 @@
+"""
+Micro-benchmarks for the PetPal database layer.
+
+Every benchmark runs against a throwaway database in a temporary directory,
+so it never touches petpal_game.db.
+
+Usage:
+    python benchmarks.py <name> [rows]
+    python benchmarks.py all
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import db
+from async_db import AsyncDatabase
+from pet_simulation import PetSimulation
+
+
+def _temp_database(workdir, name="bench.db", **kwargs):
+    """Open a fresh DatabaseManager inside workdir"""
+    return db.DatabaseManager(Path(workdir) / name, **kwargs)
+
+
+def _report(label, rows, seconds, unit="rows"):
+    rate = rows / seconds if seconds else float("inf")
+    print(f"  {label:<32} {rows:>9} {unit}  {seconds:8.3f}s  {rate:>12,.0f} {unit}/sec")
+    return rate
+
+
+# ----------------------
+# Bulk writes
+# ----------------------
+def bench_bulk(rows=5000):
+    """Per-row execute_query inserts vs bulk_insert"""
+    print(f"Bulk insert vs per-row insert ({rows} activity log rows)")
+    columns = ("pet_id", "activity_id", "experience_gained") + db.SNAPSHOT_COLUMNS
+    log_row = (1, 1, 10) + (100,) * len(db.SNAPSHOT_COLUMNS)
+    query = f"""INSERT INTO activity_logs ({', '.join(columns)})
+                VALUES ({', '.join('?' for _ in columns)})"""
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = _temp_database(workdir, "per_row.db")
+        start = time.perf_counter()
+        for _ in range(rows):
+            database.execute_query(query, log_row)
+        per_row = _report("execute_query (per row)", rows, time.perf_counter() - start)
+        database.close()
+
+        database = _temp_database(workdir, "bulk.db")
+        start = time.perf_counter()
+        database.bulk_insert(
+            "activity_logs", (log_row for _ in range(rows)),
+            columns=columns
+        )
+        bulk = _report("bulk_insert", rows, time.perf_counter() - start)
+        database.close()
+
+    print(f"  speedup: {bulk / per_row:.1f}x")
+
+
+# ----------------------
+# Startup
+# ----------------------
+def bench_startup(rows=200):
+    """Opening a populated database: legacy startup DDL vs migrations"""
+    print(f"Cold start on a populated database ({rows} opens)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _temp_database(workdir).close()
+        path = Path(workdir) / "bench.db"
+
+        start = time.perf_counter()
+        for _ in range(rows):
+            # What every open used to do on top of connecting: all of the
+            # DDL plus the default data checks
+            database = db.DatabaseManager(path)
+            database.create_tables()
+            database.initialize_default_data()
+            database.close()
+        legacy = _report("create_tables + default data", rows, time.perf_counter() - start, "opens")
+
+        start = time.perf_counter()
+        for _ in range(rows):
+            db.DatabaseManager(path).close()
+        migrated = _report("migrate (user_version check)", rows, time.perf_counter() - start, "opens")
+
+    print(f"  speedup: {migrated / legacy:.1f}x")
+
+
+# ----------------------
+# Performance profiles
+# ----------------------
+def bench_profiles(rows=300):
+    """perform_activity + save_chat_message under each performance profile"""
+    print(f"Performance profiles ({rows} actions + {rows} chat messages each)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for profile in [None] + list(db.PERFORMANCE_PROFILES):
+            label = profile or "sqlite defaults"
+            db.init_database(Path(workdir) / f"{label.replace(' ', '_')}.db", profile=profile)
+            pet = db.get_or_create_pet()
+
+            start = time.perf_counter()
+            for i in range(rows):
+                db.perform_activity("Feed Pet", pet["id"])
+                db.save_chat_message(f"Hello #{i}", "Woof!", pet["id"])
+            _report(label, rows * 2, time.perf_counter() - start, "ops")
+            db.close_database()
+
+
+# ----------------------
+# Activity log snapshots
+# ----------------------
+def bench_snapshots(rows=50000):
+    """Legacy JSON status snapshots vs the compact integer columns: size and scan speed"""
+    print(f"Activity log snapshots ({rows} rows)")
+    before = {"health": 80, "hunger": 45, "happiness": 70, "energy": 60, "cleanliness": 90, "experience": 340}
+    after = dict(before, hunger=75, happiness=75, experience=350)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = {}
+        for label in ("json", "compact"):
+            database = _temp_database(workdir, f"{label}.db")
+            database.execute_query("DELETE FROM activity_logs")
+            empty = Path(database.db_path).stat().st_size
+            if label == "json":
+                # Written the way perform_activity used to
+                database.bulk_insert(
+                    "activity_logs",
+                    ((1, 1, db.json.dumps(before), db.json.dumps(after), 10) for _ in range(rows)),
+                    columns=("pet_id", "activity_id", "status_before", "status_after", "experience_gained")
+                )
+            else:
+                database.bulk_insert(
+                    "activity_logs",
+                    ((1, 1, 10) + db.encode_status_snapshots(before, after) for _ in range(rows)),
+                    columns=("pet_id", "activity_id", "experience_gained") + db.SNAPSHOT_COLUMNS
+                )
+            database.execute_query("PRAGMA wal_checkpoint(TRUNCATE)")
+            database.execute_query("VACUUM")
+            size = Path(database.db_path).stat().st_size - empty
+
+            start = time.perf_counter()
+            columns = "status_before, status_after" if label == "json" else ", ".join(db.SNAPSHOT_COLUMNS)
+            decoded = [db.decode_status_snapshots(row)
+                       for row in database.execute_query(f"SELECT {columns} FROM activity_logs", fetch=True)]
+            seconds = time.perf_counter() - start
+            assert decoded[-1] == (before, after)
+            results[label] = (size / rows, _report(f"{label} scan + decode", rows, seconds))
+            print(f"  {'':<32} {size / rows:9.1f} bytes/row")
+            database.close()
+
+    print(f"  size: {results['json'][0] / results['compact'][0]:.1f}x smaller, "
+          f"scan: {results['compact'][1] / results['json'][1]:.1f}x faster")
+
+
+# ----------------------
+# Result rows
+# ----------------------
+def bench_records(rows=10000):
+    """get_recent_chats as dicts vs Record tuples: latency and retained memory"""
+    print(f"Result rows ({rows} chat rows per fetch)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db.init_database(Path(workdir) / "bench.db")
+        pet = db.get_or_create_pet()
+        db.get_database().bulk_insert(
+            "ai_chathistory",
+            ((pet["id"], 1, f"Hello #{i}", "Woof!", "happy") for i in range(rows)),
+            columns=("pet_id", "user_id", "user_message", "ai_response", "mood_context")
+        )
+
+        for label, records in (("dicts", False), ("records", True)):
+            repeats = 20
+            start = time.perf_counter()
+            for _ in range(repeats):
+                db.get_recent_chats(pet["id"], limit=rows, records=records)
+            _report(label, rows * repeats, time.perf_counter() - start)
+
+            tracemalloc.start()
+            result = db.get_recent_chats(pet["id"], limit=rows, records=records)
+            retained = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f"  {'':<32} {retained / len(result):9.1f} bytes/row retained")
+            del result
+        db.close_database()
+
+
+# ----------------------
+# History pagination
+# ----------------------
+def bench_pages(rows=100000):
+    """Fetching the last page of a deep activity log: OFFSET vs keyset cursor"""
+    page_size = 50
+    print(f"Deepest page of {rows} activity log rows ({page_size} per page)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db.init_database(Path(workdir) / "bench.db")
+        pet = db.get_or_create_pet()
+        db.ingest_activity_logs(
+            {"pet_id": pet["id"], "activity_id": 1, "experience_gained": 10,
+             "performed_at": f"2024-01-01 00:{i // 60 % 60:02d}:{i % 60:02d}"}
+            for i in range(rows)
+        )
+        database = db.get_database()
+        offset = rows - page_size
+        repeats = 50
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            database.execute_query(
+                """SELECT * FROM activity_logs WHERE pet_id = ? 
+                   ORDER BY performed_at DESC, id DESC LIMIT ? OFFSET ?""",
+                (pet["id"], page_size, offset), fetch=True
+            )
+        _report("LIMIT/OFFSET", repeats, time.perf_counter() - start, "pages")
+
+        cursor = database.execute_query(
+            """SELECT performed_at, id FROM activity_logs WHERE pet_id = ? 
+               ORDER BY performed_at DESC, id DESC LIMIT 1 OFFSET ?""",
+            (pet["id"], offset - 1), fetch=True
+        )[0]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            db.get_activity_log_page(pet["id"], before_timestamp=cursor[0], before_id=cursor[1], page_size=page_size)
+        _report("keyset cursor", repeats, time.perf_counter() - start, "pages")
+        db.close_database()
+
+
+# ----------------------
+# Async facade
+# ----------------------
+def bench_async(rows=300):
+    """Time the calling (UI) thread spends blocked: direct helper calls vs AsyncDatabase"""
+    print(f"Caller-thread blocking, durable profile ({rows} actions + {rows} chat messages)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db.init_database(Path(workdir) / "bench.db", pool_size=2, profile="durable")
+        pet = db.get_or_create_pet()
+
+        start = time.perf_counter()
+        for i in range(rows):
+            db.perform_activity("Feed Pet", pet["id"])
+            db.save_chat_message(f"Hello #{i}", "Woof!", pet["id"])
+        _report("direct calls", rows * 2, time.perf_counter() - start, "ops")
+
+        adb = AsyncDatabase()
+        start = time.perf_counter()
+        futures = []
+        for i in range(rows):
+            futures.append(adb.perform_activity_async("Feed Pet", pet["id"]))
+            futures.append(adb.save_chat_message_async(f"Hello #{i}", "Woof!", pet["id"], pet["user_id"]))
+        _report("AsyncDatabase (submit only)", rows * 2, time.perf_counter() - start, "ops")
+        for future in futures:
+            future.result()
+        _report("AsyncDatabase (until written)", rows * 2, time.perf_counter() - start, "ops")
+
+        async def read_back():
+            return await adb.get_recent_chats_async(pet["id"], limit=1)
+
+        latest = asyncio.run(read_back())
+        assert latest[0]["user_message"] == f"Hello #{rows - 1}"
+        adb.close()
+        db.close_database()
+
+
+# ----------------------
+# Pet state cache
+# ----------------------
+def bench_state_cache(rows=3000):
+    """Per-tick decay written through update_pet_status vs the write-behind cache"""
+    flush_every = 30
+    print(f"Decay ticks ({rows} ticks, cache flushed every {flush_every})")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db.init_database(Path(workdir) / "bench.db")
+        pet = db.get_or_create_pet()
+
+        start = time.perf_counter()
+        for _ in range(rows):
+            db.update_pet_status(pet["id"], hunger=pet["hunger"] - 1, energy=pet["energy"] - 1)
+        _report("update_pet_status per tick", rows, time.perf_counter() - start, "ticks")
+
+        state = db.pet_state_cache.load(pet["id"])
+        start = time.perf_counter()
+        for tick in range(rows):
+            state["hunger"] = max(0, state["hunger"] - 1)
+            state["energy"] = max(0, state["energy"] - 1)
+            if tick % flush_every == 0:
+                db.pet_state_cache.flush()
+        db.pet_state_cache.flush()
+        _report("PetStateCache", rows, time.perf_counter() - start, "ticks")
+        db.close_database()
+
+
+# ----------------------
+# Headless simulation
+# ----------------------
+def bench_simulation(rows=1000):
+    """Simulated pet-hours per wall-clock second, ticking every second vs hourly steps"""
+    print(f"Headless PetSimulation ({rows} pets)")
+
+    sims = [PetSimulation(auto_reset=True) for _ in range(rows)]
+    start = time.perf_counter()
+    for sim in sims[:10]:
+        for second in range(3600):
+            if second % 600 == 0:
+                sim.apply_action("Feed")
+            sim.step(1.0)
+    _report("1s ticks (10 pets x 1h)", 10, time.perf_counter() - start, "pet-hours")
+
+    start = time.perf_counter()
+    for sim in sims:
+        for hour in range(24):
+            sim.apply_action("Feed")
+            sim.step(3600.0)
+    _report("hourly steps (24h each)", rows * 24, time.perf_counter() - start, "pet-hours")
+
+
+# ----------------------
+# Pet population
+# ----------------------
+def bench_population(rows=100000):
+    """Vectorized PetPopulation: load, step and flush at rows and 10x rows pets"""
+    from pet_population import PetPopulation
+
+    for size in (rows, rows * 10):
+        print(f"PetPopulation ({size} pets)")
+        with tempfile.TemporaryDirectory() as workdir:
+            db.init_database(Path(workdir) / "bench.db", profile="throughput")
+            db.get_database().bulk_insert(
+                "pet", ((1, f"Pet {i}", 40 + i % 60, 100, 100, 100, 100) for i in range(size)),
+                columns=("user_id", "name", "hunger", "happiness", "energy", "cleanliness", "health")
+            )
+
+            start = time.perf_counter()
+            population = PetPopulation.load()
+            _report("load", len(population), time.perf_counter() - start, "pets")
+
+            steps = 60
+            start = time.perf_counter()
+            for _ in range(steps):
+                population.step()
+            _report(f"step x{steps} (1s ticks)", len(population) * steps, time.perf_counter() - start, "pet-ticks")
+
+            start = time.perf_counter()
+            population.step(3600)
+            _report("step(3600) (one hour)", len(population), time.perf_counter() - start, "pets")
+
+            start = time.perf_counter()
+            written = population.flush()
+            _report("flush", written, time.perf_counter() - start, "pets")
+            db.close_database()
+
+
+# ----------------------
+# Sharded world tick
+# ----------------------
+def bench_world(rows=20000):
+    """WorldRunner throughput with 1, 2, 4... shards (up to the core count)"""
+    from world_runner import WorldRunner
+
+    ticks = 30
+    cores = os.cpu_count() or 1
+    print(f"Sharded world tick ({rows} pets, {ticks} ticks, {cores} cores)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        path = Path(workdir) / "bench.db"
+        db.init_database(path, profile="throughput")
+        db.get_database().bulk_insert(
+            "pet", ((1, f"Pet {i}", 60 + i % 40, 100, 100, 100, 100) for i in range(rows)),
+            columns=("user_id", "name", "hunger", "happiness", "energy", "cleanliness", "health")
+        )
+
+        shards = 1
+        while True:
+            runner = WorldRunner(path, shards=shards)
+            start = time.perf_counter()
+            for tick in range(ticks):
+                runner.tick(flush=(tick == ticks - 1))
+            _report(f"{shards} shard(s)", rows * ticks, time.perf_counter() - start, "pet-ticks")
+            worst = max(shard["p95_ms"] for shard in runner.report())
+            print(f"  {'':<32} {worst:9.2f} ms worst per-shard p95 tick")
+            runner.close(flush=False)
+            if shards >= max(cores, 2):
+                break
+            shards *= 2
+        db.close_database()
+
+
+# ----------------------
+# Online backup
+# ----------------------
+def bench_backup(rows=300000):
+    """Gameplay write latency while a backup runs: one-shot copy vs page-stepped backup"""
+    print(f"Write latency during a backup ({rows} activity log rows)")
+    columns = ("pet_id", "activity_id", "experience_gained") + db.SNAPSHOT_COLUMNS
+    log_row = (1, 1, 10) + (100,) * len(db.SNAPSHOT_COLUMNS)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db.init_database(Path(workdir) / "bench.db")
+        pet = db.get_or_create_pet()
+        db.get_database().bulk_insert("activity_logs", (log_row for _ in range(rows)), columns=columns)
+        size = os.path.getsize(Path(workdir) / "bench.db") / 1e6
+
+        for label, pages in (("one step (pages=-1)", -1), (f"stepped (pages={db.BACKUP_PAGES})", db.BACKUP_PAGES)):
+            latencies = []
+            done = threading.Event()
+
+            def feed():
+                while not done.is_set():
+                    start = time.perf_counter()
+                    db.perform_activity("Feed Pet", pet["id"])
+                    latencies.append(time.perf_counter() - start)
+
+            writer = threading.Thread(target=feed)
+            writer.start()
+            time.sleep(0.05)
+            start = time.perf_counter()
+            db.backup_database(Path(workdir) / "backup.db", pages=pages)
+            elapsed = time.perf_counter() - start
+            done.set()
+            writer.join()
+            latencies.sort()
+            print(f"  {label:<24} {size:6.1f} MB in {elapsed:6.3f}s  {len(latencies):>6} writes  "
+                  f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.2f} ms  max {latencies[-1] * 1000:7.2f} ms")
+        db.close_database()
+
+
+# ----------------------
+# Archive tier
+# ----------------------
+def bench_archive(rows=100000):
+    """Hot file size and chat read latency as history accumulates, with and without archiving"""
+    print(f"Chat history growing by {rows} rows/year over 100 pets; archive after {db.ARCHIVE_AFTER_DAYS} days")
+    reads = 2000
+
+    def read_latency(pets):
+        start = time.perf_counter()
+        for i in range(reads):
+            db.get_recent_chats(pets[i % len(pets)], limit=20)
+        return (time.perf_counter() - start) / reads * 1e6
+
+    for years in (1, 2, 4):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = Path(workdir) / "bench.db"
+            database = db.init_database(path, archive_path=path.with_suffix(".archive.db"), profile="throughput")
+            pets = [db.get_or_create_pet(user_id)["id"] for user_id in range(1, 101)]
+            total = rows * years
+            seconds = years * 365 * 86400
+            database.bulk_insert("ai_chathistory", (
+                (pets[i % 100], 1, f"Message {i}", "Woof!", f"-{seconds - i * seconds // total} seconds")
+                for i in range(total)
+            ), columns=("pet_id", "user_id", "user_message", "ai_response", "timestamp"))
+            # bulk_insert binds the offsets as text; turn them into timestamps
+            database.execute_query("UPDATE ai_chathistory SET timestamp = datetime('now', timestamp)")
+
+            before_size = os.path.getsize(path) / 1e6
+            before = read_latency(pets)
+            start = time.perf_counter()
+            moved = db.archive_history(vacuum=True)["ai_chathistory"]
+            elapsed = time.perf_counter() - start
+            after_size = os.path.getsize(path) / 1e6
+            after = read_latency(pets)
+            print(f"  {years} year(s), {total:>7} rows: hot file {before_size:6.1f} -> {after_size:5.1f} MB, "
+                  f"get_recent_chats {before:6.1f} -> {after:6.1f} us  ({moved} rows archived in {elapsed:.2f}s)")
+            db.close_database()
+
+
+# ----------------------
+# Rollups
+# ----------------------
+def bench_rollups(rows=200000):
+    """Daily stat history for a dashboard: aggregating raw logs vs reading the rollups"""
+    print(f"Daily health min/avg/max for one pet ({rows} activity logs over 100 pets and a year)")
+    snapshot = dict(health=90, hunger=70, happiness=80, energy=70, cleanliness=85, experience=0)
+
+    first_day = datetime(2025, 1, 1)
+
+    def logs(count, offset=0):
+        for i in range(offset, offset + count):
+            yield {"pet_id": i % 100 + 1, "activity_id": 1, "experience_gained": 10,
+                   "performed_at": f"{first_day + timedelta(days=i * 365 // rows, hours=i % 24):%Y-%m-%d %H:%M:%S}",
+                   "status_before": snapshot, "status_after": dict(snapshot, health=50 + i % 50)}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db.init_database(Path(workdir) / "bench.db", profile="throughput")
+        for user_id in range(1, 101):
+            db.get_or_create_pet(user_id)
+        db.ingest_activity_logs(logs(rows))
+
+        start = time.perf_counter()
+        days = {}
+        for log in db.iter_activity_logs(1, records=True):
+            health = db.decode_status_snapshots(log)[1]["health"]
+            day = days.setdefault(log["performed_at"][:10], [health, 0, 0, health])
+            day[0] = min(day[0], health)
+            day[1] += health
+            day[2] += 1
+            day[3] = max(day[3], health)
+        raw = time.perf_counter() - start
+        _report("aggregate raw logs", len(days), raw, "days")
+
+        start = time.perf_counter()
+        db.refresh_rollups()
+        _report("refresh_rollups (first run)", rows, time.perf_counter() - start)
+        db.ingest_activity_logs(logs(1000, rows))
+        start = time.perf_counter()
+        db.refresh_rollups()
+        _report("refresh_rollups (+1000 rows)", 1000, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        rollups = db.get_stat_rollups(1)
+        rolled = time.perf_counter() - start
+        _report("get_stat_rollups", len(rollups), rolled, "days")
+        assert all(day["min_health"] == days[day["bucket"]][0] for day in rollups if day["bucket"] in days)
+        print(f"  speedup: {raw / rolled:.0f}x")
+        db.close_database()
+
+
+# ----------------------
+# Chat search
+# ----------------------
+def bench_search(rows=1000000):
+    """search_chats through the FTS5 index vs a LIKE '%...%' scan"""
+    print(f"Chat search over {rows} messages (10 pets)")
+    words = ("walk park ball treat bath nap vet bone squirrel fetch cuddle dinner sunny rainy "
+             "garden toy sock stick frisbee leash").split() + [f"word{n}" for n in range(2000)]
+    queries = ("squirrel", "walk park", "frisbee garden sock")
+    searches = 200
+
+    def messages():
+        pick = random.Random(42).choice
+        for i in range(rows):
+            text = " ".join(pick(words) for _ in range(6))
+            yield (i % 10 + 1, 1, f"Did you see the {text}?", f"Woof! {pick(words)}!")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database = db.init_database(Path(workdir) / "bench.db", profile="throughput")
+        for user_id in range(1, 11):
+            db.get_or_create_pet(user_id)
+        start = time.perf_counter()
+        database.bulk_insert("ai_chathistory", messages(), columns=("pet_id", "user_id", "user_message", "ai_response"))
+        _report("insert (index kept by triggers)", rows, time.perf_counter() - start)
+
+        for query in queries:
+            start = time.perf_counter()
+            for i in range(searches):
+                found = db.search_chats(i % 10 + 1, query)
+            fts = _report(f"FTS5  {query!r}", searches, time.perf_counter() - start, "searches")
+
+            has_fts = db.HAS_FTS5
+            db.HAS_FTS5 = False  # force the LIKE fallback
+            start = time.perf_counter()
+            for i in range(searches // 10):
+                db.search_chats(i % 10 + 1, query)
+            like = _report(f"LIKE  {query!r}", searches // 10, time.perf_counter() - start, "searches")
+            db.HAS_FTS5 = has_fts
+            print(f"  speedup: {fts / like:.0f}x ({len(found)} results)")
+        db.close_database()
+
+
+BENCHMARKS = {
+    "bulk": bench_bulk,
+    "startup": bench_startup,
+    "profiles": bench_profiles,
+    "snapshots": bench_snapshots,
+    "records": bench_records,
+    "pages": bench_pages,
+    "async": bench_async,
+    "statecache": bench_state_cache,
+    "simulation": bench_simulation,
+    "population": bench_population,
+    "world": bench_world,
+    "backup": bench_backup,
+    "archive": bench_archive,
+    "rollups": bench_rollups,
+    "search": bench_search,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or (sys.argv[1] not in BENCHMARKS and sys.argv[1] != "all"):
+        print("Usage: python benchmarks.py [all|" + "|".join(BENCHMARKS) + "] [rows]")
+        sys.exit(1)
+
+    names = list(BENCHMARKS) if sys.argv[1] == "all" else [sys.argv[1]]
+    for name in names:
+        if len(sys.argv) > 2:
+            BENCHMARKS[name](int(sys.argv[2]))
+        else:
+            BENCHMARKS[name]()
+        print()
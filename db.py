@@ -1,51 +1,737 @@
 import sqlite3
+import contextvars
+import inspect
 import json
 import os
-from datetime import datetime
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import lru_cache, wraps
+from operator import itemgetter
 from pathlib import Path
+from types import MappingProxyType
+
+from pet_simulation import DECAY_TICK_SECONDS, DECAYING_STATS, decay_pet_stats, decay_tick
+
+# Statements that can safely run on a pooled read-only connection
+READ_QUERY_PATTERN = re.compile(r"^\s*(SELECT|EXPLAIN)\b", re.IGNORECASE)
+
+# Longest wait (seconds) for a pooled read connection before giving up
+POOL_TIMEOUT = 30.0
+
+# UPDATE ... RETURNING needs SQLite 3.35+
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+def _has_fts5():
+    """Whether this SQLite build includes the FTS5 extension"""
+    connection = sqlite3.connect(':memory:')
+    try:
+        connection.execute("CREATE VIRTUAL TABLE fts5_probe USING fts5(text)")
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        connection.close()
+
+# Chat search uses an FTS5 index when available, LIKE scans otherwise
+HAS_FTS5 = _has_fts5()
+
+# Markers around the matched terms in search_chats() snippets
+SNIPPET_MARKERS = ('[', ']')
+
+# Pet stats kept between 0 and 100
+PET_STATS = ('health', 'hunger', 'happiness', 'energy', 'cleanliness')
+
+# Values captured in each activity_logs status snapshot, stored as
+# before_<field> / after_<field> integer columns
+SNAPSHOT_FIELDS = PET_STATS + ('experience',)
+SNAPSHOT_COLUMNS = tuple(f"{prefix}_{field}" for prefix in ('before', 'after') 
+                         for field in SNAPSHOT_FIELDS)
+
+# Writes matching this invalidate the cached activity catalog
+ACTIVITIES_TABLE_PATTERN = re.compile(r"\bactivities\b", re.IGNORECASE)
+
+# Table and column names accepted by the bulk write helpers
+IDENTIFIER_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)?$")
+
+# Conflict clauses accepted by bulk_insert(on_conflict=...)
+CONFLICT_CLAUSES = ('abort', 'fail', 'ignore', 'replace', 'rollback')
+
+# Named sets of connection pragmas; pick one with DatabaseManager(profile=...)
+# cache_size is negative KiB, mmap_size is bytes, busy_timeout is milliseconds
+PERFORMANCE_PROFILES = {
+    # Every commit is fsynced before it returns
+    'durable': {
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -2000,
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,
+    },
+    # Commits survive an app crash; only a power loss can drop the last few
+    'balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+    },
+    # No fsyncs at all; for batch jobs and benchmarks that can be re-run
+    'throughput': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+    },
+}
+
+DEFAULT_PROFILE = 'balanced'
+
+# Tables the archive tier moves old rows out of: table -> the column that ages a row.
+# Archived rows are read back through the TEMP view <table>_all.
+ARCHIVE_TABLES = {
+    'ai_chathistory': 'timestamp',
+    'activity_logs': 'performed_at',
+}
+ARCHIVE_AFTER_DAYS = 90
+
+# Rollup granularities: name -> strftime format of the bucket a log row falls in
+ROLLUP_GRANULARITIES = {
+    'hour': '%Y-%m-%d %H:00:00',
+    'day': '%Y-%m-%d',
+}
+# Raw activity logs older than this many days (and already rolled up) may be
+# pruned by prune_activity_logs(); None keeps them forever
+RAW_LOG_RETENTION_DAYS = None
+
+# Online backups copy this many pages per step and sleep this long (seconds)
+# between steps, so gameplay writes get the connection in between
+BACKUP_PAGES = 256
+BACKUP_SLEEP = 0.005
+
+# Default catalog data seeded into every new database
+DEFAULT_ACTIVITIES = [
+    ('Feed Pet', 'Give your pet some delicious food', 5, 20, 10, -5, 0, 10),
+    ('Play with Pet', 'Play games and have fun together', 10, -10, 25, -15, -5, 15),
+    ('Pet Bath', 'Give your pet a nice warm bath', 5, 0, 10, -5, 30, 8),
+    ('Vet Visit', 'Take your pet for a health checkup', 30, 0, -5, -10, 5, 20),
+    ('Nap Time', 'Let your pet rest and recharge', 5, 0, 10, 30, 0, 5),
+    ('Training', 'Teach your pet new tricks', 10, -5, 15, -10, 0, 25),
+    ('Grooming', 'Professional grooming session', 8, 0, 15, -8, 25, 12),
+    ('Walk', 'Take a nice walk around the neighborhood', 15, -8, 20, -12, -3, 18)
+]
+
+DEFAULT_SCENES = [
+    ('normal_home', 'Home', 'assets/backgrounds/normal_home.png', '', 1),
+    ('feeding', 'Kitchen', 'assets/backgrounds/feeding.png', 'eating', 1),
+    ('sleeping', 'Bedroom', 'assets/backgrounds/sleeping.png', 'sleeping', 1),
+    ('showering', 'Bathroom', 'assets/backgrounds/showering.png', 'showering', 1),
+    ('play', 'Playground', 'assets/backgrounds/play.png', 'playing', 1),
+    ('sick', 'Vet Clinic', 'assets/backgrounds/sick.png', 'sick', 1),
+    ('park', 'Dog Park', 'assets/backgrounds/park.png', 'playing', 5),
+    ('beach', 'Beach', 'assets/backgrounds/beach.png', 'happy', 10)
+]
+
+DEFAULT_ACHIEVEMENTS = [
+    ('First Steps', 'welcome', 'Welcome to PetPal!', 'star', 10, 'days_alive', 1),
+    ('Best Friend', 'friendship', 'Reach 100 happiness', 'heart', 50, 'happiness', 100),
+    ('Healthy Pet', 'health', 'Maintain 90+ health for 7 days', 'plus', 75, 'health_streak', 7),
+    ('Clean Freak', 'cleanliness', 'Keep pet clean for 5 days', 'droplets', 25, 'clean_streak', 5),
+    ('Player', 'activity', 'Play 50 times', 'game-controller', 100, 'play_count', 50),
+    ('Chef', 'feeding', 'Feed pet 100 times', 'chef-hat', 75, 'feed_count', 100),
+    ('Veteran', 'experience', 'Reach level 10', 'trophy', 200, 'level', 10)
+]
+
+def _check_identifier(name):
+    """Reject table/column names that can't be safely interpolated into SQL"""
+    if not IDENTIFIER_PATTERN.match(name):
+        raise ValueError(f"Invalid SQL identifier: {name!r}")
+    return name
+
+class Record(tuple):
+    """Read-only result row with dict-style and attribute access
+    
+    Records are plain tuples underneath, so a list of them costs far less
+    than the same rows copied into dicts. record['name'], record.name,
+    record.get('name'), keys() and to_dict() all work, and dict(record)
+    gives a regular dict. Iterating yields values, like sqlite3.Row.
+    """
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            try:
+                key = self._index[key]
+            except KeyError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+    
+    def get(self, key, default=None):
+        index = self._index.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+    
+    def keys(self):
+        return self._fields
+    
+    def values(self):
+        return tuple(self)
+    
+    def items(self):
+        return zip(self._fields, self)
+    
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+    
+    def __repr__(self):
+        fields = ', '.join(f"{name}={value!r}" for name, value in zip(self._fields, self))
+        return f"{type(self).__name__}({fields})"
+
+@lru_cache(maxsize=256)
+def record_class(columns):
+    """Record subclass for a tuple of column names, created once per column set"""
+    namespace = {
+        '__slots__': (),
+        '_fields': columns,
+        '_index': {name: index for index, name in enumerate(columns)},
+    }
+    for index, name in enumerate(columns):
+        if name.isidentifier() and not hasattr(Record, name):
+            namespace[name] = property(itemgetter(index))
+    return type('Record', (Record,), namespace)
+
+class ConnectionPool:
+    """Checkout-based pool of read-only connections"""
+    
+    def __init__(self, factory, size=4, timeout=POOL_TIMEOUT):
+        """Create an empty pool; connections are opened lazily up to size"""
+        self.factory = factory
+        self.size = max(1, size)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+        # The connection each thread has checked out through connection(),
+        # and how many open with-blocks on that thread are using it
+        self._held = threading.local()
+    
+    def acquire(self, timeout=None):
+        """Check out a connection, opening a new one if the pool isn't full yet
+        
+        When the pool is exhausted, waits up to timeout seconds (default
+        self.timeout) for one to be given back, then raises sqlite3.OperationalError.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._lock:
+            if len(self._connections) < self.size:
+                connection = self.factory()
+                self._connections.append(connection)
+                return connection
+        
+        # Pool is exhausted, wait for another thread to give one back
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No pooled read connection was released within {timeout}s (pool size {self.size})"
+            ) from None
+    
+    def release(self, connection):
+        """Return a checked out connection to the pool"""
+        self._idle.put(connection)
+    
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a with-block
+        
+        A thread that already holds one (e.g. inside an iter_query loop)
+        reuses it, so its nested queries never wait on themselves. It goes
+        back to the pool when the last block using it ends, in any order.
+        """
+        held = self._held
+        if not getattr(held, 'users', 0):
+            held.connection = self.acquire()
+            held.users = 0
+        held.users += 1
+        try:
+            yield held.connection
+        finally:
+            held.users -= 1
+            if not held.users:
+                connection, held.connection = held.connection, None
+                self.release(connection)
+    
+    def close(self):
+        """Close every connection the pool has opened"""
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+            self._idle = queue.LifoQueue()
+
+class ActivityCatalog:
+    """Immutable snapshot of the activities table, keyed by name and by id"""
+    
+    def __init__(self, rows, version):
+        records = [MappingProxyType(dict(row)) for row in rows]
+        self.version = version
+        self.by_name = MappingProxyType({record['name']: record for record in records})
+        self.by_id = MappingProxyType({record['id']: record for record in records})
 
 class DatabaseManager:
-    def __init__(self, db_path="petpal_game.db"):
-        """Initialize database connection and create tables if they don't exist"""
+    def __init__(self, db_path="petpal_game.db", pool_size=0, profile=DEFAULT_PROFILE, archive_path=None):
+        """Initialize database connection and create tables if they don't exist
+        
+        With pool_size > 0, SELECTs run on a pool of up to pool_size read-only
+        connections while all writes go through one dedicated writer connection.
+        profile names an entry of PERFORMANCE_PROFILES (None keeps SQLite's defaults).
+        archive_path is attached as the archive tier (see archive_history());
+        by default <name>.archive.db is attached if it exists.
+        """
+        if profile is not None and profile not in PERFORMANCE_PROFILES:
+            raise ValueError(f"Unknown performance profile: {profile!r}")
         self.db_path = Path(db_path)
+        self.pool_size = pool_size
+        self.profile = profile
+        if archive_path is None and str(self.db_path) != ':memory:':
+            default_archive = self.db_path.with_suffix('.archive.db')
+            archive_path = default_archive if default_archive.exists() else None
+        self.archive_path = Path(archive_path) if archive_path is not None else None
+        self._archive_ready = False
         self.connection = None
+        self.read_pool = None
+        self._write_lock = threading.RLock()
+        self._transaction_depth = 0
+        self._transaction_owner = None
+        # Bumped whenever activities are written; see get_activity_catalog()
+        self.catalog_version = 0
+        self._catalog_dirty = False
+        self._activity_catalog = None
+        # Whether the FTS5 chat index exists, looked up once (see _has_chat_index)
+        self._chat_index = None
         self.connect()
-        self.create_tables()
-        self.initialize_default_data()
+        self.migrate()
+        # Outside the versioned migrations, so a database migrated without
+        # FTS5 gets its chat index once a build with FTS5 opens it
+        ensure_chat_search(self)
+        if self.archive_path is not None:
+            self._setup_archive()
+    
+    def _open_connection(self, read_only=False):
+        """Open a new connection to the database file"""
+        connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        connection.row_factory = sqlite3.Row  # Enable dict-like access to rows
+        if self.archive_path is not None:
+            # Before the profile, so journal_mode applies to the archive as well
+            connection.execute("ATTACH DATABASE ? AS archive", (str(self.archive_path),))
+        self._apply_profile(connection, read_only)
+        # After the profile: changing temp_store discards the temp schema
+        if self._archive_ready:
+            self._create_archive_views(connection)
+        if read_only:
+            connection.execute("PRAGMA query_only = ON")
+        else:
+            # Autocommit mode, so transaction() controls BEGIN/COMMIT explicitly
+            connection.isolation_level = None
+        return connection
+    
+    def _apply_profile(self, connection, read_only=False):
+        """Set the performance profile's pragmas on a new connection"""
+        if self.profile is None:
+            return
+        for pragma, value in PERFORMANCE_PROFILES[self.profile].items():
+            # The journal mode is stored in the file, so only the writer sets it
+            if pragma == 'journal_mode' and read_only:
+                continue
+            connection.execute(f"PRAGMA {pragma} = {value}")
+    
+    def active_pragmas(self):
+        """Read back the pragmas a profile controls from the writer connection"""
+        pragmas = {}
+        with self._write_lock:
+            for pragma in PERFORMANCE_PROFILES[DEFAULT_PROFILE]:
+                row = self.connection.execute(f"PRAGMA {pragma}").fetchone()
+                pragmas[pragma] = row[0] if row else None
+        return pragmas
     
     def connect(self):
         """Create database connection"""
         try:
-            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.connection.row_factory = sqlite3.Row  # Enable dict-like access to rows
-            print(f"Connected to database: {self.db_path}")
+            self.connection = self._open_connection()
+            # An in-memory database is private to its connection, so it can't be pooled
+            if self.pool_size > 0 and str(self.db_path) != ':memory:':
+                self.read_pool = ConnectionPool(
+                    lambda: self._open_connection(read_only=True), self.pool_size
+                )
+            print(f"Connected to database: {self.db_path} (profile: {self.profile or 'sqlite defaults'})")
         except sqlite3.Error as e:
             print(f"Error connecting to database: {e}")
     
     def close(self):
         """Close database connection"""
+        if self.read_pool:
+            self.read_pool.close()
+            self.read_pool = None
         if self.connection:
             self.connection.close()
             print("Database connection closed")
     
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a database query"""
+    def in_transaction(self):
+        """Return True if the calling thread is inside a transaction() block"""
+        return self._transaction_depth > 0 and self._transaction_owner == threading.get_ident()
+    
+    @contextmanager
+    def transaction(self):
+        """Run a block of statements as one unit of work with a single commit
+        
+        Nested blocks become savepoints, so an inner failure only rolls back
+        its own statements when the outer block handles the exception.
+        """
+        with self._write_lock:
+            depth = self._transaction_depth
+            savepoint = f"sp_{depth}"
+            if depth == 0:
+                self.connection.execute("BEGIN IMMEDIATE")
+                self._transaction_owner = threading.get_ident()
+            else:
+                self.connection.execute(f"SAVEPOINT {savepoint}")
+            self._transaction_depth += 1
+            
+            try:
+                yield self
+            except BaseException:
+                self._transaction_depth -= 1
+                if depth == 0:
+                    self._transaction_owner = None
+                    self.connection.execute("ROLLBACK")
+                    self._end_catalog_writes()
+                else:
+                    self.connection.execute(f"ROLLBACK TO {savepoint}")
+                    self.connection.execute(f"RELEASE {savepoint}")
+                raise
+            
+            self._transaction_depth -= 1
+            if depth == 0:
+                self._transaction_owner = None
+                try:
+                    self.connection.execute("COMMIT")
+                except sqlite3.Error:
+                    self.connection.execute("ROLLBACK")
+                    raise
+                finally:
+                    self._end_catalog_writes()
+            else:
+                self.connection.execute(f"RELEASE {savepoint}")
+    
+    def _note_write(self, query):
+        """Invalidate the activity catalog if a write touched the activities table"""
+        if READ_QUERY_PATTERN.match(query) or not ACTIVITIES_TABLE_PATTERN.search(query):
+            return
+        if self.in_transaction():
+            # Bumping now would let another thread cache the pre-commit rows
+            # under the new version, so wait for the transaction to finish
+            self._catalog_dirty = True
+        else:
+            self.catalog_version += 1
+    
+    def _end_catalog_writes(self):
+        """Bump the catalog version once a transaction that wrote activities ends"""
+        if self._catalog_dirty:
+            self._catalog_dirty = False
+            self.catalog_version += 1
+    
+    def execute_query(self, query, params=None, fetch=False, records=False, rowcount=False):
+        """Execute a database query
+        
+        With fetch and records=True, rows come back as lightweight Record
+        tuples instead of sqlite3.Row objects. Without fetch, the result is
+        the last inserted row id, or the number of rows changed with
+        rowcount=True.
+        """
+        # Reads inside our own transaction must see its uncommitted writes
+        if (fetch and self.read_pool and READ_QUERY_PATTERN.match(query)
+                and not self.in_transaction()):
+            with self.read_pool.connection() as connection:
+                return self._execute(connection, query, params, fetch, records, rowcount)
+        
+        # Writes (and every statement in single-connection mode) are serialized
+        with self._write_lock:
+            return self._execute(self.connection, query, params, fetch, records, rowcount)
+    
+    def _execute(self, connection, query, params, fetch, records=False, rowcount=False):
+        """Run a query on the given connection"""
         try:
-            cursor = self.connection.cursor()
+            cursor = connection.cursor()
+            if records:
+                # Fetch plain tuples and wrap them with one class per result shape
+                cursor.row_factory = None
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
+            if connection is self.connection:
+                self._note_write(query)
             
-            if fetch:
+            if fetch and records:
+                cls = record_class(tuple(column[0] for column in cursor.description))
+                return list(map(cls, cursor.fetchall()))
+            elif fetch:
                 return cursor.fetchall()
+            elif rowcount:
+                return cursor.rowcount
             else:
-                self.connection.commit()
+                # The writer is in autocommit mode, so this only commits
+                # when we're not inside a transaction() block
                 return cursor.lastrowid
         except sqlite3.Error as e:
             print(f"Database error: {e}")
+            if self.in_transaction():
+                # Let transaction() roll back the whole unit of work
+                raise
             return None
     
+    def iter_query(self, query, params=None, chunk_size=500, records=False):
+        """Yield the rows of a query, fetching chunk_size rows at a time
+        
+        Only one chunk is held in memory at once. With a read pool and
+        outside a transaction the rows come from a pooled read-only
+        connection, so a long export never holds the write lock. Otherwise,
+        like every statement in single-connection mode, they are read from
+        the manager's own connection (the only one that can see a ':memory:'
+        database).
+        """
+        if self.read_pool and not self.in_transaction():
+            with self.read_pool.connection() as connection:
+                yield from self._iter_rows(connection, query, params, chunk_size, records)
+        else:
+            # Also sees the transaction's own uncommitted writes
+            with self._write_lock:
+                yield from self._iter_rows(self.connection, query, params, chunk_size, records)
+    
+    def _iter_rows(self, connection, query, params, chunk_size, records):
+        """Run a query on the given connection and yield its rows chunk by chunk"""
+        try:
+            cursor = connection.cursor()
+            if records:
+                cursor.row_factory = None
+            cursor.execute(query, params or ())
+            cls = record_class(tuple(column[0] for column in cursor.description)) if records else None
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from (map(cls, rows) if records else rows)
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            if self.in_transaction():
+                raise
+    
+    def execute_many(self, query, params_seq):
+        """Execute one prepared statement for every parameter set in a single transaction
+        
+        Returns the number of rows affected, or None on error.
+        """
+        try:
+            with self.transaction():
+                cursor = self.connection.executemany(query, params_seq)
+                self._note_write(query)
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            if self.in_transaction():
+                raise
+            return None
+    
+    def bulk_insert(self, table, rows, columns=None, on_conflict=None, batch_size=1000):
+        """Insert many rows with one prepared statement and one transaction per batch
+        
+        rows can be dicts (columns default to the first row's keys) or tuples
+        (columns default to every column of the table, in order). on_conflict
+        is one of CONFLICT_CLAUSES, e.g. 'ignore' to skip duplicates.
+        Returns the number of rows inserted, or None on error.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        
+        if columns is None and isinstance(first, dict):
+            columns = list(first.keys())
+        
+        verb = "INSERT"
+        if on_conflict:
+            if on_conflict.lower() not in CONFLICT_CLAUSES:
+                raise ValueError(f"Unsupported conflict clause: {on_conflict!r}")
+            verb = f"INSERT OR {on_conflict.upper()}"
+        
+        if columns:
+            column_list = ', '.join(_check_identifier(column) for column in columns)
+            placeholders = ', '.join('?' for _ in columns)
+            query = f"{verb} INTO {_check_identifier(table)} ({column_list}) VALUES ({placeholders})"
+        else:
+            placeholders = ', '.join('?' for _ in first)
+            query = f"{verb} INTO {_check_identifier(table)} VALUES ({placeholders})"
+        
+        def as_params(row):
+            if isinstance(row, dict):
+                return tuple(row.get(column) for column in columns)
+            return tuple(row)
+        
+        inserted = 0
+        batch = [as_params(first)]
+        for row in rows:
+            batch.append(as_params(row))
+            if len(batch) >= batch_size:
+                count = self.execute_many(query, batch)
+                if count is None:
+                    return None
+                inserted += count
+                batch = []
+        
+        if batch:
+            count = self.execute_many(query, batch)
+            if count is None:
+                return None
+            inserted += count
+        
+        return inserted
+    
+    def backup(self, target, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, progress=None):
+        """Copy the live database into target (a file path or sqlite3 connection)
+        
+        Uses the SQLite online backup API from the writer connection, so
+        writes made while it runs are carried into the copy instead of
+        restarting it. A file is written next to target and renamed into
+        place once complete. progress(status, remaining, total) is called
+        after each step. Returns target, or None on error.
+        """
+        if isinstance(target, sqlite3.Connection):
+            try:
+                self.connection.backup(target, pages=pages, progress=progress, sleep=sleep)
+                return target
+            except sqlite3.Error as e:
+                print(f"Error backing up database: {e}")
+                return None
+        
+        target = Path(target)
+        partial = target.with_name(f"{target.name}.partial")
+        try:
+            if partial.exists():
+                partial.unlink()
+            destination = sqlite3.connect(partial)
+            try:
+                self.connection.backup(destination, pages=pages, progress=progress, sleep=sleep)
+                # A standalone file, without -wal/-shm sidecars to carry around
+                destination.execute("PRAGMA journal_mode = DELETE")
+            finally:
+                destination.close()
+            os.replace(partial, target)
+            return target
+        except (sqlite3.Error, OSError) as e:
+            print(f"Error backing up database: {e}")
+            if partial.exists():
+                partial.unlink()
+            return None
+    
+    def snapshot(self, target=None, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP):
+        """Back up into a read-only connection for analytics queries
+        
+        With target=None the copy lives in memory; otherwise it is written
+        to target and opened read-only. Queries on it never contend with
+        the live database and never see later writes. Returns None on error.
+        """
+        if target is None:
+            connection = sqlite3.connect(':memory:', check_same_thread=False)
+            if self.backup(connection, pages, sleep) is None:
+                connection.close()
+                return None
+        else:
+            if self.backup(target, pages, sleep) is None:
+                return None
+            connection = sqlite3.connect(f"{Path(target).resolve().as_uri()}?mode=ro", uri=True, 
+                                         check_same_thread=False)
+        connection.row_factory = sqlite3.Row
+        connection.execute("PRAGMA query_only = ON")
+        return connection
+    
+    def _setup_archive(self):
+        """Create (or catch up) the archive tables, then the views on the writer connection"""
+        with self.transaction():
+            self.connection.execute(
+                """CREATE TABLE IF NOT EXISTS archive.archive_state (
+                       table_name TEXT PRIMARY KEY, archived_before TIMESTAMP NOT NULL)"""
+            )
+            for table, age_column in ARCHIVE_TABLES.items():
+                columns = self.connection.execute(f"PRAGMA main.table_info({table})").fetchall()
+                definitions = ', '.join(f"{column['name']} {column['type']}{' PRIMARY KEY' if column['pk'] else ''}"
+                                        for column in columns)
+                self.connection.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} ({definitions})")
+                # Columns added to the hot table by later migrations
+                archived = {column['name'] for column in self.connection.execute(f"PRAGMA archive.table_info({table})")}
+                for column in columns:
+                    if column['name'] not in archived:
+                        self.connection.execute(f"ALTER TABLE archive.{table} ADD COLUMN {column['name']} {column['type']}")
+                self.connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS archive.idx_{table}_pet_{age_column} ON {table} (pet_id, {age_column})"
+                )
+        self._archive_ready = True
+        with self._write_lock:
+            self._create_archive_views(self.connection)
+    
+    def _create_archive_views(self, connection):
+        """Create the <table>_all views (hot rows UNION ALL archived rows) on one connection"""
+        for table in ARCHIVE_TABLES:
+            columns = ', '.join(column[1] for column in connection.execute(f"PRAGMA main.table_info({table})"))
+            connection.execute(f"DROP VIEW IF EXISTS temp.{table}_all")
+            connection.execute(
+                f"""CREATE TEMP VIEW {table}_all AS 
+                    SELECT {columns} FROM main.{table} UNION ALL SELECT {columns} FROM archive.{table}"""
+            )
+    
+    def archive_horizon(self, table):
+        """Every archived row of table is older than this timestamp; None if nothing is archived"""
+        if not self._archive_ready:
+            return None
+        rows = self.execute_query(
+            "SELECT archived_before FROM archive.archive_state WHERE table_name = ?", (table,), fetch=True
+        )
+        return rows[0][0] if rows else None
+    
+    def schema_version(self):
+        """Return the last migration applied to this database (PRAGMA user_version)"""
+        rows = self.execute_query("PRAGMA user_version", fetch=True)
+        return rows[0][0] if rows else 0
+    
+    def migrate(self):
+        """Apply pending schema migrations in order, one transaction per step
+        
+        An up-to-date database costs a single PRAGMA read here.
+        """
+        current = self.schema_version()
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            with self.transaction():
+                # Another process may have migrated while we waited for the lock
+                if self.schema_version() >= version:
+                    continue
+                step(self)
+                self.execute_query(f"PRAGMA user_version = {int(version)}")
+            print(f"Applied migration {version}: {description}")
+    
     def get_user_pets(user_id):
         """Return a list of pets owned by a user"""
         db = get_database()
@@ -248,127 +934,642 @@ class DatabaseManager:
             activities_table, activity_logs_table, scenes_table
         ]
         
-        for table in tables:
-            self.execute_query(table)
+        with self.transaction():
+            for table in tables:
+                self.execute_query(table)
         
         print("All database tables created successfully")
     
     def initialize_default_data(self):
         """Initialize database with default data"""
+        with self.transaction():
+            # Check if default user exists
+            user = self.execute_query("SELECT id FROM users WHERE username = ?", ('default_user',), fetch=True)
+            if not user:
+                # Create default user
+                user_id = self.execute_query(
+                    "INSERT INTO users (username, email, is_active) VALUES (?, ?, ?)",
+                    ('default_user', 'user@petpal.com', 1)
+                )
+                print("Created default user")
+            else:
+                user_id = user[0]['id']
+            
+            # Check if default pet exists
+            pet = self.execute_query("SELECT id FROM pet WHERE user_id = ?", (user_id,), fetch=True)
+            if not pet:
+                # Create default pet
+                pet_id = self.execute_query(
+                    """INSERT INTO pet (user_id, name, species, breed, mood, health, hunger, 
+                       happiness, energy, cleanliness) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    (user_id, 'Buddy', 'dog', 'Golden Retriever', 'happy', 100, 80, 90, 100, 100)
+                )
+                print("Created default pet")
+            else:
+                pet_id = pet[0]['id']
+            
+            # Seed the catalogs in one batch each; names are UNIQUE, so
+            # rows that already exist are skipped
+            self.bulk_insert(
+                'activities', DEFAULT_ACTIVITIES,
+                columns=('name', 'description', 'health_effect', 'hunger_effect',
+                         'happiness_effect', 'energy_effect', 'cleanliness_effect',
+                         'experience_points'),
+                on_conflict='ignore'
+            )
+            self.bulk_insert(
+                'scenes', DEFAULT_SCENES,
+                columns=('name', 'display_name', 'image_path', 'mood_requirement', 'unlock_level'),
+                on_conflict='ignore'
+            )
+            seed_pet_achievements(pet_id, database=self)
+        
+        print("Default data initialized")
+
+
+# Schema migrations, applied in version order by DatabaseManager.migrate()
+MIGRATIONS = []
+
+def migration(version, description):
+    """Register a function as the schema migration for a version"""
+    def register(step):
+        MIGRATIONS.append((version, description, step))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return step
+    return register
+
+@migration(1, "create tables and default data")
+def _migration_initial_schema(database):
+    # Every statement here is idempotent, so databases created before
+    # migrations existed (user_version 0) are adopted as-is
+    database.create_tables()
+    database.initialize_default_data()
+
+@migration(2, "indexes for hot lookups")
+def _migration_lookup_indexes(database):
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_pet_user ON pet (user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_ai_chathistory_pet_timestamp ON ai_chathistory (pet_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_logs_pet_activity ON activity_logs (pet_id, activity_id)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_pet_date ON appointments (pet_id, appointment_date)",
+        "CREATE INDEX IF NOT EXISTS idx_medical_records_pet_visit ON medical_records (pet_id, visit_date)",
+        """CREATE INDEX IF NOT EXISTS idx_reminders_pet_user_active 
+           ON reminders (pet_id, user_id, is_active, is_completed, due_date)""",
+        "CREATE INDEX IF NOT EXISTS idx_achievement_pet_name ON achievement (pet_id, achievement_name)",
+        "CREATE INDEX IF NOT EXISTS idx_scenes_mood_level ON scenes (mood_requirement, unlock_level)",
+        "CREATE INDEX IF NOT EXISTS idx_scenes_unlock_level ON scenes (unlock_level)",
+    ]
+    for index in indexes:
+        database.execute_query(index)
+
+@migration(3, "backfill achievement progress counters")
+def _migration_achievement_progress(database):
+    # Counted straight from the logs: pet_activity_counters only exists from version 4
+    activities = {row['name']: row['id'] for row in 
+                  database.execute_query("SELECT id, name FROM activities", fetch=True)}
+    for requirement_type, activity_name in ACTIVITY_REQUIREMENTS.items():
+        if activity_name not in activities:
+            continue
+        database.execute_query(
+            """UPDATE achievement SET current_progress = (
+                   SELECT COUNT(*) FROM activity_logs 
+                   WHERE activity_logs.pet_id = achievement.pet_id 
+                   AND activity_logs.activity_id = ?
+               ) WHERE requirement_type = ?""",
+            (activities[activity_name], requirement_type)
+        )
+    database.execute_query(
+        """UPDATE achievement SET is_unlocked = 1, unlocked_at = CURRENT_TIMESTAMP 
+           WHERE is_unlocked = 0 AND requirement_type IN ('play_count', 'feed_count') 
+           AND current_progress >= requirement_value"""
+    )
+
+@migration(4, "trigger-maintained per-pet activity counters")
+def _migration_activity_counters(database):
+    database.execute_query("""
+        CREATE TABLE IF NOT EXISTS pet_activity_counters (
+            pet_id INTEGER NOT NULL,
+            activity_id INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            last_performed_at TIMESTAMP,
+            PRIMARY KEY (pet_id, activity_id)
+        ) WITHOUT ROWID
+    """)
+    # Counters are lifetime totals: there is deliberately no DELETE trigger,
+    # so pruning or archiving old log rows doesn't lower them
+    database.execute_query("""
+        CREATE TRIGGER IF NOT EXISTS trg_activity_logs_count 
+        AFTER INSERT ON activity_logs 
+        BEGIN
+            INSERT INTO pet_activity_counters (pet_id, activity_id, count, last_performed_at) 
+            VALUES (NEW.pet_id, NEW.activity_id, 1, COALESCE(NEW.performed_at, CURRENT_TIMESTAMP)) 
+            ON CONFLICT (pet_id, activity_id) DO UPDATE SET 
+                count = count + 1, 
+                last_performed_at = MAX(COALESCE(last_performed_at, ''), excluded.last_performed_at);
+        END
+    """)
+    rebuild_activity_counters(database)
+
+@migration(5, "compact integer columns for activity_logs status snapshots")
+def _migration_compact_snapshots(database):
+    existing = {row['name'] for row in database.execute_query("PRAGMA table_info(activity_logs)", fetch=True)}
+    for column in SNAPSHOT_COLUMNS:
+        if column not in existing:
+            database.execute_query(f"ALTER TABLE activity_logs ADD COLUMN {column} INTEGER")
+    compact_activity_logs(database)
+
+@migration(6, "index backing keyset pagination of activity_logs")
+def _migration_activity_log_pages(database):
+    database.execute_query(
+        "CREATE INDEX IF NOT EXISTS idx_activity_logs_pet_performed ON activity_logs (pet_id, performed_at)"
+    )
+
+@migration(7, "persist the neglect timer for offline decay")
+def _migration_neglect_timer(database):
+    existing = {row['name'] for row in database.execute_query("PRAGMA table_info(pet)", fetch=True)}
+    if 'neglect_timer' not in existing:
+        database.execute_query("ALTER TABLE pet ADD COLUMN neglect_timer INTEGER DEFAULT 0")
+
+@migration(8, "hourly and daily rollups of pet stats and activities")
+def _migration_rollups(database):
+    stat_columns = ', '.join(f"min_{stat} INTEGER, sum_{stat} INTEGER, max_{stat} INTEGER" for stat in PET_STATS)
+    database.execute_query(f"""
+        CREATE TABLE IF NOT EXISTS pet_stat_rollups (
+            pet_id INTEGER NOT NULL,
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            samples INTEGER NOT NULL,
+            {stat_columns},
+            PRIMARY KEY (pet_id, granularity, bucket)
+        ) WITHOUT ROWID
+    """)
+    database.execute_query("""
+        CREATE TABLE IF NOT EXISTS pet_activity_rollups (
+            pet_id INTEGER NOT NULL,
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            activity_id INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            experience INTEGER NOT NULL,
+            PRIMARY KEY (pet_id, granularity, bucket, activity_id)
+        ) WITHOUT ROWID
+    """)
+    # High-water marks: the last source row each rollup has absorbed
+    database.execute_query(
+        "CREATE TABLE IF NOT EXISTS rollup_state (source TEXT PRIMARY KEY, last_id INTEGER NOT NULL)"
+    )
+    refresh_rollups(database)
+
+@migration(9, "FTS5 full-text index over chat history")
+def _migration_chat_search(database):
+    if not HAS_FTS5:
+        print("SQLite built without FTS5; chat search will use LIKE scans")
+        return
+    ensure_chat_search(database)
+
+def ensure_chat_search(database):
+    """Create and fill the FTS5 chat index if this build has FTS5 and the database lacks it
+    
+    Returns whether the index exists. DatabaseManager runs this on open, so
+    it costs one sqlite_master lookup per manager, and none without FTS5;
+    searches reuse the cached answer.
+    """
+    if not HAS_FTS5:
+        return False
+    if _has_chat_index(database):
+        return True
+    try:
+        with database.transaction():
+            _create_chat_search(database)
+    except sqlite3.Error:
+        # Rolled back: look again next time
+        database._chat_index = None
+        raise
+    return True
+
+def _create_chat_search(database):
+    """The FTS5 chat index, its sync triggers, and a rebuild from ai_chathistory"""
+    # External content: the index stores only terms, the text stays in ai_chathistory.
+    # pet_id is indexed too, so a search only walks the one pet's entries.
+    database.execute_query("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS ai_chathistory_fts USING fts5(
+            user_message, ai_response, pet_id, 
+            content='ai_chathistory', content_rowid='id', tokenize='porter unicode61'
+        )
+    """)
+    database._chat_index = True
+    database.execute_query("""
+        CREATE TRIGGER IF NOT EXISTS trg_ai_chathistory_fts_insert AFTER INSERT ON ai_chathistory 
+        BEGIN
+            INSERT INTO ai_chathistory_fts (rowid, user_message, ai_response, pet_id) 
+            VALUES (NEW.id, NEW.user_message, NEW.ai_response, NEW.pet_id);
+        END
+    """)
+    database.execute_query("""
+        CREATE TRIGGER IF NOT EXISTS trg_ai_chathistory_fts_delete AFTER DELETE ON ai_chathistory 
+        BEGIN
+            INSERT INTO ai_chathistory_fts (ai_chathistory_fts, rowid, user_message, ai_response, pet_id) 
+            VALUES ('delete', OLD.id, OLD.user_message, OLD.ai_response, OLD.pet_id);
+        END
+    """)
+    database.execute_query("""
+        CREATE TRIGGER IF NOT EXISTS trg_ai_chathistory_fts_update 
+        AFTER UPDATE OF user_message, ai_response, pet_id ON ai_chathistory 
+        BEGIN
+            INSERT INTO ai_chathistory_fts (ai_chathistory_fts, rowid, user_message, ai_response, pet_id) 
+            VALUES ('delete', OLD.id, OLD.user_message, OLD.ai_response, OLD.pet_id);
+            INSERT INTO ai_chathistory_fts (rowid, user_message, ai_response, pet_id) 
+            VALUES (NEW.id, NEW.user_message, NEW.ai_response, NEW.pet_id);
+        END
+    """)
+    rebuild_chat_search(database)
+
+# Gameplay events: name -> list of callbacks. Callbacks get keyword arguments,
+# always including database and pet_id:
+#   'activity_performed'  activity (catalog record), pet (row after the update)
+#   'pet_status_changed'  pet (row after the update)
+_subscribers = {}
+
+def subscribe(event, callback):
+    """Call callback(**payload) every time event is emitted"""
+    _subscribers.setdefault(event, []).append(callback)
+
+def unsubscribe(event, callback):
+    """Stop calling a subscribed callback"""
+    if callback in _subscribers.get(event, []):
+        _subscribers[event].remove(callback)
+
+def emit(event, **payload):
+    """Deliver an event to its subscribers, in subscription order"""
+    for callback in list(_subscribers.get(event, [])):
+        callback(**payload)
+
+# Database operation functions
+db = None
+
+# Sharded mode (init_sharded_database): the router, and the shard the
+# helper running on this thread/task has been routed to
+shard_router = None
+_routed_database = contextvars.ContextVar('routed_database', default=None)
+
+# Tables whose rows belong to a pet, moved along with it when rebalancing.
+PET_OWNED_TABLES = ('ai_chathistory', 'activity_logs', 'achievement', 'appointments', 
+                    'medical_records', 'reminders')
+# Per-pet aggregates, copied verbatim after the logs: the counters are lifetime
+# totals and the rollups outlive pruned logs, so neither can be recounted
+PET_AGGREGATE_TABLES = ('pet_activity_counters', 'pet_stat_rollups', 'pet_activity_rollups')
+
+class ShardRouter:
+    """Maps users and their pets to one of several SQLite shard files
+    
+    directory.db holds the users table plus shard_users (user -> shard) and
+    shard_pets (pet -> user, which also hands out globally unique pet ids).
+    Everything a pet owns lives in its user's shard_<n>.db. Lookups are
+    cached in memory.
+    """
+    
+    def __init__(self, directory, shards=4, pool_size=0, profile=DEFAULT_PROFILE):
+        self.path = Path(directory)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.pool_size = pool_size
+        self.profile = profile
+        self._lock = threading.RLock()
+        self._user_shards = {}
+        self._pet_users = {}
         
-        # Check if default user exists
-        user = self.execute_query("SELECT id FROM users WHERE username = ?", ('default_user',), fetch=True)
-        if not user:
-            # Create default user
-            user_id = self.execute_query(
-                "INSERT INTO users (username, email, is_active) VALUES (?, ?, ?)",
-                ('default_user', 'user@petpal.com', 1)
+        self.directory = DatabaseManager(self.path / "directory.db", pool_size=pool_size, profile=profile)
+        with self.directory.transaction():
+            self.directory.execute_query(
+                "CREATE TABLE IF NOT EXISTS shard_users (user_id INTEGER PRIMARY KEY, shard INTEGER NOT NULL)"
             )
-            print("Created default user")
-        else:
-            user_id = user[0]['id']
+            self.directory.execute_query(
+                """CREATE TABLE IF NOT EXISTS shard_pets (
+                       pet_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL)"""
+            )
+            self.directory.execute_query("CREATE INDEX IF NOT EXISTS idx_shard_pets_user ON shard_pets (user_id)")
+            self.directory.execute_query("CREATE TABLE IF NOT EXISTS shard_files (shard INTEGER PRIMARY KEY)")
         
-        # Check if default pet exists
-        pet = self.execute_query("SELECT id FROM pet WHERE user_id = ?", (user_id,), fetch=True)
-        if not pet:
-            # Create default pet
-            pet_id = self.execute_query(
-                """INSERT INTO pet (user_id, name, species, breed, mood, health, hunger, 
-                   happiness, energy, cleanliness) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (user_id, 'Buddy', 'dog', 'Golden Retriever', 'happy', 100, 80, 90, 100, 100)
+        # The shard count only grows (see rebalance), so reopen every shard made so far
+        existing = self.directory.execute_query("SELECT COUNT(*) FROM shard_files", fetch=True)[0][0]
+        self.shards = []
+        for index in range(max(shards, existing)):
+            self._add_shard()
+    
+    def _add_shard(self):
+        """Open (creating if needed) the next shard file"""
+        index = len(self.shards)
+        path = self.path / f"shard_{index}.db"
+        # A shard added by rebalance gets an archive like the others, to take moved archived rows
+        archive_path = path.with_suffix('.archive.db') if any(shard.archive_path for shard in self.shards) else None
+        database = DatabaseManager(path, pool_size=self.pool_size, profile=self.profile, archive_path=archive_path)
+        known = self.directory.execute_query("SELECT 1 FROM shard_files WHERE shard = ?", (index,), fetch=True)
+        if not known:
+            # Migrations seed every new file with the default user and pet;
+            # users live in the directory and pet ids come from shard_pets,
+            # so those copies would only collide with real rows
+            with database.transaction():
+                for table in PET_OWNED_TABLES + PET_AGGREGATE_TABLES + ('pet', 'users'):
+                    database.execute_query(f"DELETE FROM {table}")
+            self.directory.execute_query("INSERT INTO shard_files (shard) VALUES (?)", (index,))
+        self.shards.append(database)
+        return database
+    
+    def shard_for_user(self, user_id):
+        """Index of the user's shard, assigning new users by user_id"""
+        shard = self._user_shards.get(user_id)
+        if shard is not None:
+            return shard
+        with self._lock:
+            self.directory.execute_query(
+                "INSERT OR IGNORE INTO shard_users (user_id, shard) VALUES (?, ?)",
+                (user_id, user_id % len(self.shards))
             )
-            print("Created default pet")
-        else:
-            pet_id = pet[0]['id']
-        
-        # Initialize default activities
-        default_activities = [
-            ('Feed Pet', 'Give your pet some delicious food', 5, 20, 10, -5, 0, 10),
-            ('Play with Pet', 'Play games and have fun together', 10, -10, 25, -15, -5, 15),
-            ('Pet Bath', 'Give your pet a nice warm bath', 5, 0, 10, -5, 30, 8),
-            ('Vet Visit', 'Take your pet for a health checkup', 30, 0, -5, -10, 5, 20),
-            ('Nap Time', 'Let your pet rest and recharge', 5, 0, 10, 30, 0, 5),
-            ('Training', 'Teach your pet new tricks', 10, -5, 15, -10, 0, 25),
-            ('Grooming', 'Professional grooming session', 8, 0, 15, -8, 25, 12),
-            ('Walk', 'Take a nice walk around the neighborhood', 15, -8, 20, -12, -3, 18)
-        ]
+            row = self.directory.execute_query("SELECT shard FROM shard_users WHERE user_id = ?", (user_id,), fetch=True)
+            self._user_shards[user_id] = row[0][0]
+            return row[0][0]
+    
+    def shard_for_pet(self, pet_id):
+        """Index of the pet's shard, or None for a pet the directory doesn't know"""
+        user_id = self._pet_users.get(pet_id)
+        if user_id is None:
+            row = self.directory.execute_query("SELECT user_id FROM shard_pets WHERE pet_id = ?", (pet_id,), fetch=True)
+            if not row:
+                return None
+            user_id = self._pet_users[pet_id] = row[0][0]
+        return self.shard_for_user(user_id)
+    
+    def for_user(self, user_id):
+        return self.shards[self.shard_for_user(user_id)]
+    
+    def for_pet(self, pet_id):
+        shard = self.shard_for_pet(pet_id)
+        return self.shards[shard] if shard is not None else None
+    
+    def allocate_pet_id(self, user_id):
+        """Reserve a globally unique id for a new pet of user_id"""
+        pet_id = self.directory.execute_query("INSERT INTO shard_pets (user_id) VALUES (?)", (user_id,))
+        self._pet_users[pet_id] = user_id
+        return pet_id
+    
+    def map_shards(self, func):
+        """Run func(database) on every shard in parallel; returns the results in shard order"""
+        with ThreadPoolExecutor(max_workers=len(self.shards)) as pool:
+            return list(pool.map(func, self.shards))
+    
+    def shard_sizes(self):
+        """Number of users and pets routed to each shard"""
+        sizes = [{'shard': index, 'users': 0, 'pets': 0} for index in range(len(self.shards))]
+        for row in self.directory.execute_query(
+                """SELECT u.shard, COUNT(DISTINCT u.user_id), COUNT(p.pet_id) 
+                   FROM shard_users u LEFT JOIN shard_pets p ON p.user_id = u.user_id GROUP BY u.shard""",
+                fetch=True):
+            sizes[row[0]].update(users=row[1], pets=row[2])
+        return sizes
+    
+    def move_user(self, user_id, target):
+        """Move a user's pets and everything they own to another shard; returns pets moved"""
+        source_index = self.shard_for_user(user_id)
+        if source_index == target:
+            return 0
+        source, destination = self.shards[source_index], self.shards[target]
         
-        for activity in default_activities:
-            existing = self.execute_query("SELECT id FROM activities WHERE name = ?", (activity[0],), fetch=True)
-            if not existing:
-                self.execute_query(
-                    """INSERT INTO activities (name, description, health_effect, hunger_effect, 
-                       happiness_effect, energy_effect, cleanliness_effect, experience_points) 
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                    activity
-                )
+        pet_ids = [row[0] for row in source.execute_query("SELECT id FROM pet WHERE user_id = ?", (user_id,), fetch=True)]
+        for pet_id in pet_ids:
+            pet_state_cache.flush(pet_id)
+        owned = f"pet_id IN ({', '.join('?' for _ in pet_ids)})"
+        archived = [table for table in ARCHIVE_TABLES if source.archive_horizon(table) is not None 
+                    and source.execute_query(f"SELECT 1 FROM archive.{table} WHERE {owned} LIMIT 1", pet_ids, fetch=True)]
+        if archived and not destination._archive_ready:
+            raise sqlite3.Error(f"Shard {target} has no archive attached for user {user_id}'s archived rows")
+        # Fold the pets' pending logs into the rollups that travel with them
+        refresh_rollups(source)
         
-        # Initialize default scenes
-        default_scenes = [
-            ('normal_home', 'Home', 'assets/backgrounds/normal_home.png', '', 1),
-            ('feeding', 'Kitchen', 'assets/backgrounds/feeding.png', 'eating', 1),
-            ('sleeping', 'Bedroom', 'assets/backgrounds/sleeping.png', 'sleeping', 1),
-            ('showering', 'Bathroom', 'assets/backgrounds/showering.png', 'showering', 1),
-            ('play', 'Playground', 'assets/backgrounds/play.png', 'playing', 1),
-            ('sick', 'Vet Clinic', 'assets/backgrounds/sick.png', 'sick', 1),
-            ('park', 'Dog Park', 'assets/backgrounds/park.png', 'playing', 5),
-            ('beach', 'Beach', 'assets/backgrounds/beach.png', 'happy', 10)
-        ]
+        with destination.transaction():
+            # Clear anything left behind by an interrupted earlier move
+            for table in PET_OWNED_TABLES + PET_AGGREGATE_TABLES:
+                destination.execute_query(f"DELETE FROM {table} WHERE {owned}", pet_ids)
+            if destination._archive_ready:
+                for table in ARCHIVE_TABLES:
+                    destination.execute_query(f"DELETE FROM archive.{table} WHERE {owned}", pet_ids)
+            destination.execute_query("DELETE FROM pet WHERE user_id = ?", (user_id,))
+            # The destination's own pending logs go into its rollups before
+            # the high-water mark is moved past the copied ones below
+            refresh_rollups(destination)
+            
+            # Archived rows first, so they keep sorting before the hot ones
+            for table in archived:
+                self._copy_archived(source, destination, table, owned, pet_ids)
+            
+            # Pets keep their ids; owned rows get fresh ones in the new file
+            copies = [('pet', "SELECT * FROM pet WHERE user_id = ?", (user_id,), False)]
+            if pet_ids:
+                copies += [(table, f"SELECT * FROM {table} WHERE {owned} ORDER BY id", pet_ids, True)
+                           for table in PET_OWNED_TABLES]
+                # After the logs, replacing the counters their trigger just made
+                copies += [(table, f"SELECT * FROM {table} WHERE {owned}", pet_ids, False)
+                           for table in PET_AGGREGATE_TABLES]
+            for table, query, params, new_ids in copies:
+                if table in PET_AGGREGATE_TABLES:
+                    destination.execute_query(f"DELETE FROM {table} WHERE {owned}", pet_ids)
+                rows = ({key: value for key, value in row.items() if not (new_ids and key == 'id')}
+                        for row in source.iter_query(query, params, records=True))
+                if destination.bulk_insert(table, rows) is None:
+                    # bulk_insert has already printed the error; abandon the move
+                    raise sqlite3.Error(f"Failed to copy {table} for user {user_id}")
+            
+            # The copied logs are already in the copied rollups
+            destination.execute_query(
+                f"""INSERT INTO rollup_state (source, last_id) 
+                    SELECT 'activity_logs', MAX(id) FROM {_history_source(destination, 'activity_logs')} 
+                    HAVING MAX(id) IS NOT NULL 
+                    ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id"""
+            )
         
-        for scene in default_scenes:
-            existing = self.execute_query("SELECT id FROM scenes WHERE name = ?", (scene[0],), fetch=True)
-            if not existing:
-                self.execute_query(
-                    """INSERT INTO scenes (name, display_name, image_path, mood_requirement, unlock_level) 
-                       VALUES (?, ?, ?, ?, ?)""",
-                    scene
-                )
+        self.directory.execute_query("UPDATE shard_users SET shard = ? WHERE user_id = ?", (target, user_id))
+        with self._lock:
+            self._user_shards[user_id] = target
         
-        # Initialize default achievements
-        default_achievements = [
-            ('First Steps', 'welcome', 'Welcome to PetPal!', 'star', 10, 'days_alive', 1),
-            ('Best Friend', 'friendship', 'Reach 100 happiness', 'heart', 50, 'happiness', 100),
-            ('Healthy Pet', 'health', 'Maintain 90+ health for 7 days', 'plus', 75, 'health_streak', 7),
-            ('Clean Freak', 'cleanliness', 'Keep pet clean for 5 days', 'droplets', 25, 'clean_streak', 5),
-            ('Player', 'activity', 'Play 50 times', 'game-controller', 100, 'play_count', 50),
-            ('Chef', 'feeding', 'Feed pet 100 times', 'chef-hat', 75, 'feed_count', 100),
-            ('Veteran', 'experience', 'Reach level 10', 'trophy', 200, 'level', 10)
-        ]
+        with source.transaction():
+            for table in PET_OWNED_TABLES + PET_AGGREGATE_TABLES:
+                source.execute_query(f"DELETE FROM {table} WHERE {owned}", pet_ids)
+            for table in archived:
+                source.execute_query(f"DELETE FROM archive.{table} WHERE {owned}", pet_ids)
+            source.execute_query("DELETE FROM pet WHERE user_id = ?", (user_id,))
+        for pet_id in pet_ids:
+            achievement_engine.reset(pet_id)
+        return len(pet_ids)
+    
+    def _copy_archived(self, source, destination, table, owned, pet_ids):
+        """Copy the pets' archived rows of table into the destination's archive
         
-        for achievement in default_achievements:
-            existing = self.execute_query(
-                "SELECT id FROM achievement WHERE pet_id = ? AND achievement_name = ?", 
-                (pet_id, achievement[0]), fetch=True
-            )
-            if not existing:
-                self.execute_query(
-                    """INSERT INTO achievement (pet_id, achievement_name, achievement_type, 
-                       description, icon, points, requirement_type, requirement_value) 
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (pet_id, achievement[0], achievement[1], achievement[2], 
-                     achievement[3], achievement[4], achievement[5], achievement[6])
-                )
+        The rows go through the hot table first, so they take ids from its
+        AUTOINCREMENT sequence and never collide with hot rows in the view.
+        """
+        start = destination.execute_query(
+            "SELECT COALESCE(MAX(seq), 0) FROM main.sqlite_sequence WHERE name = ?", (table,), fetch=True
+        )[0][0]
+        rows = ({key: value for key, value in row.items() if key != 'id'}
+                for row in source.iter_query(f"SELECT * FROM archive.{table} WHERE {owned} ORDER BY id",
+                                             pet_ids, records=True))
+        if destination.bulk_insert(table, rows) is None:
+            raise sqlite3.Error(f"Failed to copy archived {table} rows")
+        columns = ', '.join(column[1] for column in destination.execute_query(f"PRAGMA main.table_info({table})", fetch=True))
+        destination.execute_query(
+            f"INSERT INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table} WHERE id > ?", (start,)
+        )
+        destination.execute_query(f"DELETE FROM main.{table} WHERE id > ?", (start,))
+        # Readers only look in the archive for rows older than its horizon
+        destination.execute_query(
+            """INSERT INTO archive.archive_state (table_name, archived_before) VALUES (?, ?)
+               ON CONFLICT (table_name) DO UPDATE SET archived_before = MAX(archived_before, excluded.archived_before)""",
+            (table, source.archive_horizon(table))
+        )
+    
+    def rebalance(self, shards=None):
+        """Grow to `shards` shards if asked, then move users until pet counts are even
         
-        print("Default data initialized")
+        Greedy: repeatedly moves the biggest user from the fullest shard
+        that still narrows the gap to the emptiest one. Returns the moves
+        as (user_id, from_shard, to_shard).
+        """
+        while shards is not None and len(self.shards) < shards:
+            self._add_shard()
+        
+        users = {}
+        totals = [0] * len(self.shards)
+        for user_id, shard, pets in self.directory.execute_query(
+                """SELECT u.user_id, u.shard, COUNT(p.pet_id) FROM shard_users u 
+                   JOIN shard_pets p ON p.user_id = u.user_id GROUP BY u.user_id""", fetch=True):
+            users.setdefault(shard, []).append((pets, user_id))
+            totals[shard] += pets
+        
+        moves = []
+        while True:
+            fullest = max(range(len(totals)), key=totals.__getitem__)
+            emptiest = min(range(len(totals)), key=totals.__getitem__)
+            gap = totals[fullest] - totals[emptiest]
+            candidates = [user for user in users.get(fullest, []) if 0 < user[0] < gap]
+            if not candidates:
+                return moves
+            pets, user_id = max(candidates)
+            self.move_user(user_id, emptiest)
+            users[fullest].remove((pets, user_id))
+            users.setdefault(emptiest, []).append((pets, user_id))
+            totals[fullest] -= pets
+            totals[emptiest] += pets
+            moves.append((user_id, fullest, emptiest))
+    
+    def close(self):
+        for database in self.shards:
+            database.close()
+        self.directory.close()
 
+# Per-shard maintenance for `python db.py shards`, run on every shard at once
+SHARD_MAINTENANCE = {
+    'migrate': lambda database: (database.migrate(), database.schema_version())[1],
+    'analyze': lambda database: database.execute_query("ANALYZE") is not None,
+    'vacuum': lambda database: database.execute_query("VACUUM") is not None,
+    'checkpoint': lambda database: tuple(database.execute_query("PRAGMA wal_checkpoint(TRUNCATE)", fetch=True)[0]),
+    'integrity': lambda database: database.execute_query("PRAGMA quick_check", fetch=True)[0][0],
+    'rebuild-counters': lambda database: rebuild_activity_counters(database),
+    'compact-logs': lambda database: compact_activity_logs(database),
+    'rollups': lambda database: refresh_rollups(database),
+    'rebuild-search': lambda database: rebuild_chat_search(database),
+}
 
-# Database operation functions
-db = None
+@contextmanager
+def route_to(database):
+    """Run the helpers called in this block against the given shard"""
+    token = _routed_database.set(database)
+    try:
+        yield database
+    finally:
+        _routed_database.reset(token)
+
+def _routed(func):
+    """Run a helper on the shard of its pet_id (or user_id) argument in sharded mode
+    
+    Helpers called without either inherit the caller's shard, or fall back
+    to the shard of user 1, which is what their defaults refer to.
+    """
+    signature = inspect.signature(func)
+    
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        router = shard_router
+        if router is None:
+            return func(*args, **kwargs)
+        
+        arguments = signature.bind_partial(*args, **kwargs).arguments
+        database = None
+        if arguments.get('pet_id') is not None:
+            database = router.for_pet(arguments['pet_id'])
+        if database is None and arguments.get('user_id') is not None:
+            database = router.for_user(arguments['user_id'])
+        if database is None:
+            database = _routed_database.get() or router.for_user(1)
+        with route_to(database):
+            return func(*args, **kwargs)
+    return wrapper
+
+@_routed
+def seed_pet_achievements(pet_id, database=None):
+    """Create the default achievement rows a pet doesn't have yet"""
+    database = database or get_database()
+    return database.execute_many(
+        """INSERT INTO achievement (pet_id, achievement_name, achievement_type, 
+           description, icon, points, requirement_type, requirement_value) 
+           SELECT ?, ?, ?, ?, ?, ?, ?, ? 
+           WHERE NOT EXISTS (SELECT 1 FROM achievement WHERE pet_id = ? AND achievement_name = ?)""",
+        [(pet_id,) + achievement + (pet_id, achievement[0]) for achievement in DEFAULT_ACHIEVEMENTS]
+    )
 
-def init_database(db_path="petpal_game.db"):
+def init_database(db_path="petpal_game.db", pool_size=0, profile=DEFAULT_PROFILE, archive_path=None):
     """Initialize the database connection"""
     global db
-    db = DatabaseManager(db_path)
+    db = DatabaseManager(db_path, pool_size=pool_size, profile=profile, archive_path=archive_path)
     return db
 
+def init_sharded_database(directory="petpal_shards", shards=4, pool_size=0, profile=DEFAULT_PROFILE):
+    """Initialize sharded mode: users in directory.db, pet data spread over shard files
+    
+    The helper functions route themselves to the right shard; outside a
+    helper get_database() returns the directory database.
+    """
+    global db, shard_router
+    shard_router = ShardRouter(directory, shards=shards, pool_size=pool_size, profile=profile)
+    db = shard_router.directory
+    # Cached achievements and pet state belong to whatever was open before
+    achievement_engine.reset()
+    pet_state_cache.clear()
+    return shard_router
+
 def get_database():
-    """Get the database instance"""
+    """Get the database instance (the routed shard inside a helper in sharded mode)"""
     global db
+    routed = _routed_database.get()
+    if routed is not None:
+        return routed
     if db is None:
         db = init_database()
     return db
 
+# Activity catalog
+def get_activity_catalog(database=None):
+    """Return the cached ActivityCatalog, reloading it only after activities change"""
+    database = database or get_database()
+    catalog = database._activity_catalog
+    if catalog is None or catalog.version != database.catalog_version:
+        # Read the version first: a write racing with the load then just
+        # causes one more reload instead of a stale cache
+        version = database.catalog_version
+        rows = database.execute_query("SELECT * FROM activities", fetch=True) or []
+        catalog = ActivityCatalog(rows, version)
+        database._activity_catalog = catalog
+    return catalog
+
 # Pet-related functions
+@_routed
 def get_or_create_pet(user_id=1):
     """Get or create a pet for the user"""
     database = get_database()
@@ -382,32 +1583,42 @@ def get_or_create_pet(user_id=1):
     if pet:
         return dict(pet[0])  # Convert sqlite3.Row to dict
     
-    # Create new pet if none exists
-    pet_id = database.execute_query(
-        """INSERT INTO pet (user_id, name, species, breed, mood, health, hunger, 
-           happiness, energy, cleanliness) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (user_id, 'Buddy', 'dog', 'Golden Retriever', 'happy', 100, 80, 90, 100, 100)
-    )
-    
-    # Return the newly created pet
-    pet = database.execute_query(
-        "SELECT * FROM pet WHERE id = ?", 
-        (pet_id,), fetch=True
-    )
+    # Create new pet if none exists (in sharded mode its id comes from the directory)
+    new_id = shard_router.allocate_pet_id(user_id) if shard_router is not None else None
+    with database.transaction():
+        pet_id = database.execute_query(
+            """INSERT INTO pet (id, user_id, name, species, breed, mood, health, hunger, 
+               happiness, energy, cleanliness) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (new_id, user_id, 'Buddy', 'dog', 'Golden Retriever', 'happy', 100, 80, 90, 100, 100)
+        )
+        
+        # Return the newly created pet
+        pet = database.execute_query(
+            "SELECT * FROM pet WHERE id = ?", 
+            (pet_id,), fetch=True
+        )
     
     return dict(pet[0])
 
-def update_pet_status(pet_id=None, **kwargs):
-    """Update pet status"""
+@_routed
+def update_pet_status(pet_id=None, catch_up=True, **kwargs):
+    """Update pet status
+    
+    Unless catch_up is False (the values are already current, as in the state
+    cache), the decay owed since updated_at is applied first, so moving
+    updated_at to now does not forgive it.
+    """
     if pet_id is None:
         pet = get_or_create_pet()
         pet_id = pet['id']
     
     database = get_database()
+    # Cached stats not yet written go first, so this explicit update wins
+    pet_state_cache.flush(pet_id)
     
     # Build update query dynamically
     valid_fields = ['mood', 'health', 'hunger', 'happiness', 'energy', 'cleanliness', 
-                   'last_fed', 'last_played', 'last_bathed', 'experience', 'level']
+                   'last_fed', 'last_played', 'last_bathed', 'experience', 'level', 'neglect_timer']
     
     updates = []
     values = []
@@ -420,17 +1631,249 @@ def update_pet_status(pet_id=None, **kwargs):
             updates.append(f"{field} = ?")
             values.append(value)
     
-    if updates:
-        updates.append("updated_at = CURRENT_TIMESTAMP")
-        query = f"UPDATE pet SET {', '.join(updates)} WHERE id = ?"
-        values.append(pet_id)
+    with database.transaction():
+        if updates and catch_up:
+            advance_pet_to_now(pet_id)
+        
+        if updates and HAS_RETURNING:
+            # Update and read back the row in one statement
+            updates.append("updated_at = CURRENT_TIMESTAMP")
+            query = f"UPDATE pet SET {', '.join(updates)} WHERE id = ? RETURNING *"
+            values.append(pet_id)
+            
+            pet = database.execute_query(query, values, fetch=True)
+            if not pet:
+                return None
+            pet = dict(pet[0])
+            emit('pet_status_changed', database=database, pet_id=pet_id, pet=pet)
+            return pet
+        
+        if updates:
+            updates.append("updated_at = CURRENT_TIMESTAMP")
+            query = f"UPDATE pet SET {', '.join(updates)} WHERE id = ?"
+            values.append(pet_id)
+            
+            database.execute_query(query, values)
+        
+        # Return updated pet
+        pet = database.execute_query("SELECT * FROM pet WHERE id = ?", (pet_id,), fetch=True)
+        if not pet:
+            return None
+        pet = dict(pet[0])
+        if updates:
+            emit('pet_status_changed', database=database, pet_id=pet_id, pet=pet)
+    return pet
+
+@_routed
+def advance_pet_to_now(pet_id=None, now=None):
+    """Apply the decay a pet missed since its row was last written; returns the pet
+    
+    now defaults to the current time and may be any SQLite time value.
+    """
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    database = get_database()
+    # Pending cached stats are newer than the row, so write them first
+    pet_state_cache.flush(pet_id)
+    
+    with database.transaction():
+        pet = database.execute_query(
+            """SELECT *, CAST(strftime('%s', COALESCE(?, 'now')) AS INTEGER) 
+                         - CAST(strftime('%s', updated_at) AS INTEGER) AS elapsed 
+               FROM pet WHERE id = ?""",
+            (now, pet_id), fetch=True
+        )
+        if not pet:
+            return None
+        pet = dict(pet[0])
+        ticks = (pet.pop('elapsed') or 0) // DECAY_TICK_SECONDS
+        if ticks <= 0:
+            return pet
         
-        database.execute_query(query, values)
+        decayed = decay_pet_stats(pet, ticks)
+        return update_pet_status(pet_id, catch_up=False, 
+                                 **{field: decayed[field] for field in 
+                                    DECAYING_STATS + ('health', 'neglect_timer')})
+
+# Pet fields kept by the state cache
+PET_STATE_FIELDS = PET_STATS + ('mood', 'experience', 'level', 'neglect_timer')
+
+class PetState(dict):
+    """Live stats for one cached pet; changed fields are remembered until the next flush"""
+    
+    def __init__(self, pet_id, values, lock):
+        super().__init__(values)
+        self.pet_id = pet_id
+        self.dirty = set()
+        self._lock = lock
+    
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in PET_STATE_FIELDS and self.get(key) != value:
+                self.dirty.add(key)
+            super().__setitem__(key, value)
+    
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+class PetStateCache:
+    """Authoritative in-memory copy of active pets' stats with write-behind flushing
+    
+    Callers mutate the PetState returned by load() as often as they like;
+    only the fields that changed are written back, once per flush, on an
+    interval (start()), on evict() and in close_database().
+    """
+    
+    def __init__(self, flush_interval=30.0):
+        self.flush_interval = flush_interval
+        self._states = {}
+        self._lock = threading.RLock()
+        self._timer = None
+        self._generation = 0
+    
+    def load(self, pet_id):
+        """Return the live PetState for a pet, reading it (caught up to now) from the database once"""
+        with self._lock:
+            state = self._states.get(pet_id)
+            if state is not None:
+                return state
+        
+        pet = advance_pet_to_now(pet_id)
+        if not pet:
+            return None
+        with self._lock:
+            return self._states.setdefault(
+                pet_id, PetState(pet_id, {field: pet[field] for field in PET_STATE_FIELDS}, self._lock)
+            )
     
-    # Return updated pet
-    pet = database.execute_query("SELECT * FROM pet WHERE id = ?", (pet_id,), fetch=True)
-    return dict(pet[0]) if pet else None
+    def get(self, pet_id):
+        """Return the cached PetState for a pet, or None if it isn't loaded"""
+        return self._states.get(pet_id)
+    
+    def sync(self, pet_id, pet):
+        """Take fresh values from a pet row for every field with no pending change"""
+        state = self._states.get(pet_id)
+        if state is None:
+            return
+        with self._lock:
+            for field in PET_STATE_FIELDS:
+                if field not in state.dirty and field in pet:
+                    dict.__setitem__(state, field, pet[field])
+    
+    def on_pet_changed(self, database, pet_id, pet, **_):
+        self.sync(pet_id, pet)
+    
+    def flush(self, pet_id=None):
+        """Write pending changes (of one pet, or all pets), one transaction per database; returns pets written"""
+        with self._lock:
+            if pet_id is None:
+                states = list(self._states.values())
+            else:
+                states = [self._states[pet_id]] if pet_id in self._states else []
+            pending = []
+            for state in states:
+                if state.dirty:
+                    pending.append((state, {field: state[field] for field in state.dirty}))
+                    state.dirty = set()
+        if not pending:
+            return 0
+        
+        # One transaction per database the pets live on; in sharded mode
+        # that is each pet's shard, never the directory
+        batches = {}
+        for state, changes in pending:
+            if shard_router is not None:
+                database = shard_router.for_pet(state.pet_id) or shard_router.for_user(1)
+            else:
+                database = get_database()
+            batches.setdefault(id(database), (database, []))[1].append((state, changes))
+        
+        written = 0
+        for database, batch in batches.values():
+            try:
+                with route_to(database), database.transaction():
+                    for state, changes in batch:
+                        update_pet_status(state.pet_id, catch_up=False, **changes)
+            except sqlite3.Error:
+                # Keep the changes pending so the next flush retries them
+                with self._lock:
+                    for state, changes in batch:
+                        state.dirty.update(changes)
+                continue
+            written += len(batch)
+        return written
+    
+    def evict(self, pet_id):
+        """Flush a pet and stop caching it (e.g. on logout)"""
+        self.flush(pet_id)
+        with self._lock:
+            self._states.pop(pet_id, None)
+    
+    def clear(self):
+        """Forget every cached pet without writing anything"""
+        with self._lock:
+            self._states = {}
+    
+    def start(self, flush_interval=None):
+        """Flush every flush_interval seconds on a background timer"""
+        if flush_interval is not None:
+            self.flush_interval = flush_interval
+        with self._lock:
+            self.stop()
+            self._schedule(self._generation)
+    
+    def _schedule(self, generation):
+        self._timer = threading.Timer(self.flush_interval, self._tick, (generation,))
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def _tick(self, generation):
+        self.flush()
+        with self._lock:
+            # A stop() or restart since this timer was set supersedes it
+            if generation == self._generation:
+                self._schedule(generation)
+    
+    def stop(self):
+        """Cancel the periodic flush"""
+        with self._lock:
+            self._generation += 1
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+pet_state_cache = PetStateCache()
+
+def _stat_snapshot_sql(after=False):
+    """SELECT expressions for a snapshot of the pet row, optionally with an activity's effects applied"""
+    values = []
+    for stat in PET_STATS:
+        values.append(f"MAX(0, MIN(100, {stat} + :{stat}_effect))" if after else stat)
+    values.append("experience + :experience_points" if after else "experience")
+    return ', '.join(values)
+
+# Log an activity with before/after snapshots computed from the current pet row
+PERFORM_ACTIVITY_LOG_SQL = f"""
+    INSERT INTO activity_logs (pet_id, activity_id, {', '.join(SNAPSHOT_COLUMNS)}, experience_gained) 
+    SELECT id, :activity_id, {_stat_snapshot_sql()}, {_stat_snapshot_sql(after=True)}, :experience_points 
+    FROM pet WHERE id = :pet_id
+"""
 
+# Apply an activity's clamped effects and level-up in place, returning the new row
+PERFORM_ACTIVITY_UPDATE_SQL = f"""
+    UPDATE pet SET 
+        {', '.join(f"{stat} = MAX(0, MIN(100, {stat} + :{stat}_effect))" for stat in PET_STATS)}, 
+        experience = experience + :experience_points, 
+        level = CASE WHEN experience + :experience_points >= level * 100 THEN level + 1 ELSE level END, 
+        updated_at = CURRENT_TIMESTAMP 
+    WHERE id = :pet_id 
+    RETURNING *
+"""
+
+@_routed
 def perform_activity(activity_name, pet_id=None):
     """Perform an activity and update pet status"""
     if pet_id is None:
@@ -438,19 +1881,46 @@ def perform_activity(activity_name, pet_id=None):
         pet_id = pet['id']
     
     database = get_database()
-    
-    # Get activity details
-    activity = database.execute_query(
-        "SELECT * FROM activities WHERE name = ?", 
-        (activity_name,), fetch=True
-    )
-    
-    if not activity:
-        print(f"Activity '{activity_name}' not found")
-        return None
-    
-    activity = dict(activity[0])
-    
+    # The activity applies on top of any cached stats not yet written
+    pet_state_cache.flush(pet_id)
+    
+    # One action is one unit of work: the pet update, its log entry and any
+    # achievement unlocks are committed together
+    with database.transaction():
+        # Get activity details
+        activity = get_activity_catalog().by_name.get(activity_name)
+        
+        if not activity:
+            print(f"Activity '{activity_name}' not found")
+            return None
+        
+        # The activity applies on top of the decay owed since the last write
+        advance_pet_to_now(pet_id)
+        
+        if HAS_RETURNING:
+            params = dict(activity, activity_id=activity['id'], pet_id=pet_id)
+            # The log row is written first so its SELECT sees the pet before
+            # the update; both run inside this transaction, so no other
+            # writer can change the pet in between
+            database.execute_query(PERFORM_ACTIVITY_LOG_SQL, params)
+            updated_pet = database.execute_query(PERFORM_ACTIVITY_UPDATE_SQL, params, fetch=True)
+            if not updated_pet:
+                print(f"Pet with id {pet_id} not found")
+                return None
+            updated_pet = dict(updated_pet[0])
+        else:
+            updated_pet = _perform_activity_fallback(database, activity, pet_id)
+            if updated_pet is None:
+                return None
+        
+        # Achievements and other listeners react to the event in this transaction
+        emit('activity_performed', database=database, pet_id=pet_id, 
+             activity=activity, pet=updated_pet)
+        
+        return updated_pet
+
+def _perform_activity_fallback(database, activity, pet_id):
+    """Read-compute-write version of perform_activity for SQLite without RETURNING"""
     # Get current pet status
     pet = database.execute_query("SELECT * FROM pet WHERE id = ?", (pet_id,), fetch=True)
     if not pet:
@@ -460,65 +1930,200 @@ def perform_activity(activity_name, pet_id=None):
     pet = dict(pet[0])
     
     # Store status before activity
-    status_before = {
-        'health': pet['health'],
-        'hunger': pet['hunger'],
-        'happiness': pet['happiness'],
-        'energy': pet['energy'],
-        'cleanliness': pet['cleanliness'],
-        'experience': pet['experience']
-    }
+    status_before = {stat: pet[stat] for stat in PET_STATS}
+    status_before['experience'] = pet['experience']
     
     # Calculate new values
-    new_health = max(0, min(100, pet['health'] + activity['health_effect']))
-    new_hunger = max(0, min(100, pet['hunger'] + activity['hunger_effect']))
-    new_happiness = max(0, min(100, pet['happiness'] + activity['happiness_effect']))
-    new_energy = max(0, min(100, pet['energy'] + activity['energy_effect']))
-    new_cleanliness = max(0, min(100, pet['cleanliness'] + activity['cleanliness_effect']))
-    new_experience = pet['experience'] + activity['experience_points']
+    status_after = {
+        stat: max(0, min(100, pet[stat] + activity[f'{stat}_effect'])) for stat in PET_STATS
+    }
+    status_after['experience'] = pet['experience'] + activity['experience_points']
     
     # Check for level up
     new_level = pet['level']
     experience_needed = new_level * 100  # Simple level calculation
-    if new_experience >= experience_needed:
+    if status_after['experience'] >= experience_needed:
         new_level += 1
     
     # Update pet
-    updated_pet = update_pet_status(
-        pet_id=pet_id,
-        health=new_health,
-        hunger=new_hunger,
-        happiness=new_happiness,
-        energy=new_energy,
-        cleanliness=new_cleanliness,
-        experience=new_experience,
-        level=new_level
-    )
-    
-    # Store status after activity
-    status_after = {
-        'health': new_health,
-        'hunger': new_hunger,
-        'happiness': new_happiness,
-        'energy': new_energy,
-        'cleanliness': new_cleanliness,
-        'experience': new_experience
-    }
+    updated_pet = update_pet_status(pet_id=pet_id, catch_up=False, level=new_level, **status_after)
     
     # Log the activity
     database.execute_query(
-        """INSERT INTO activity_logs (pet_id, activity_id, status_before, status_after, experience_gained) 
-           VALUES (?, ?, ?, ?, ?)""",
-        (pet_id, activity['id'], json.dumps(status_before), 
-         json.dumps(status_after), activity['experience_points'])
+        f"""INSERT INTO activity_logs (pet_id, activity_id, {', '.join(SNAPSHOT_COLUMNS)}, experience_gained) 
+            VALUES ({', '.join('?' for _ in range(len(SNAPSHOT_COLUMNS) + 3))})""",
+        (pet_id, activity['id']) + encode_status_snapshots(status_before, status_after) 
+        + (activity['experience_points'],)
     )
     
-    # Check and unlock achievements
-    check_achievements(pet_id)
-    
     return updated_pet
 
+def rebuild_activity_counters(database=None):
+    """Recompute pet_activity_counters from activity_logs; returns the number of counter rows
+    
+    Logs moved to the archive tier still count towards the lifetime totals.
+    Once rollups exist, rows up to their high-water mark are counted from
+    the daily rollups instead, since prune_activity_logs() may have deleted
+    them; last_performed_at then falls back to the hour they were logged in.
+    """
+    database = database or get_database()
+    source = _history_source(database, 'activity_logs')
+    has_rollups = database.execute_query(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'rollup_state'", fetch=True
+    )
+    state = has_rollups and database.execute_query(
+        "SELECT last_id FROM rollup_state WHERE source = 'activity_logs'", fetch=True
+    )
+    
+    with database.transaction():
+        database.execute_query("DELETE FROM pet_activity_counters")
+        if not state:
+            return database.execute_query(
+                f"""INSERT INTO pet_activity_counters (pet_id, activity_id, count, last_performed_at) 
+                    SELECT pet_id, activity_id, COUNT(*), MAX(performed_at) 
+                    FROM {source} GROUP BY pet_id, activity_id""",
+                rowcount=True
+            )
+        
+        last_id = state[0][0]
+        return database.execute_query(
+            f"""INSERT INTO pet_activity_counters (pet_id, activity_id, count, last_performed_at) 
+                SELECT pet_id, activity_id, SUM(count), MAX(last_performed_at) FROM (
+                    SELECT pet_id, activity_id, count, NULL AS last_performed_at 
+                    FROM pet_activity_rollups WHERE granularity = 'day' 
+                    UNION ALL 
+                    SELECT pet_id, activity_id, 0, MAX(bucket) 
+                    FROM pet_activity_rollups WHERE granularity = 'hour' GROUP BY pet_id, activity_id 
+                    UNION ALL 
+                    SELECT pet_id, activity_id, SUM(id > ?), MAX(performed_at) 
+                    FROM {source} GROUP BY pet_id, activity_id
+                ) GROUP BY pet_id, activity_id""",
+            (last_id,), rowcount=True
+        )
+
+@_routed
+def get_activity_counts(pet_id=None):
+    """Return {activity name: {'activity_id', 'count', 'last_performed_at'}} for a pet
+    
+    Reads the trigger-maintained counters, so the cost doesn't depend on
+    how many activity_logs rows the pet has.
+    """
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    database = get_database()
+    catalog = get_activity_catalog(database)
+    
+    counters = database.execute_query(
+        "SELECT activity_id, count, last_performed_at FROM pet_activity_counters WHERE pet_id = ?",
+        (pet_id,), fetch=True
+    ) or []
+    
+    counts = {}
+    for counter in counters:
+        activity = catalog.by_id.get(counter['activity_id'])
+        name = activity['name'] if activity else f"activity #{counter['activity_id']}"
+        counts[name] = dict(counter)
+    return counts
+
+def encode_status_snapshots(status_before, status_after):
+    """Flatten before/after snapshot dicts into values for SNAPSHOT_COLUMNS"""
+    before = status_before or {}
+    after = status_after or {}
+    return (tuple(before.get(field) for field in SNAPSHOT_FIELDS) 
+            + tuple(after.get(field) for field in SNAPSHOT_FIELDS))
+
+def decode_status_snapshots(row):
+    """Return (status_before, status_after) dicts for an activity_logs row
+    
+    Works for compact rows and for rows still holding the legacy JSON text,
+    whether row is a dict, a sqlite3.Row or a Record.
+    """
+    keys = set(row.keys())
+    snapshots = []
+    for prefix in ('before', 'after'):
+        first = f'{prefix}_{SNAPSHOT_FIELDS[0]}'
+        if first in keys and row[first] is not None:
+            snapshots.append({field: row[f'{prefix}_{field}'] for field in SNAPSHOT_FIELDS})
+        elif f'status_{prefix}' in keys and row[f'status_{prefix}']:
+            snapshots.append(json.loads(row[f'status_{prefix}']))
+        else:
+            snapshots.append(None)
+    return tuple(snapshots)
+
+def compact_activity_logs(database=None, chunk_size=5000):
+    """Move legacy JSON status snapshots into the integer columns; returns rows converted
+    
+    Rows are read and rewritten in id order, chunk_size at a time, so
+    memory stays bounded however large the log is.
+    """
+    database = database or get_database()
+    update = f"""UPDATE activity_logs SET {', '.join(f'{column} = ?' for column in SNAPSHOT_COLUMNS)}, 
+                 status_before = NULL, status_after = NULL WHERE id = ?"""
+    
+    converted = 0
+    last_id = 0
+    while True:
+        rows = database.execute_query(
+            """SELECT id, status_before, status_after FROM activity_logs 
+               WHERE id > ? AND (status_before IS NOT NULL OR status_after IS NOT NULL) 
+               ORDER BY id LIMIT ?""",
+            (last_id, chunk_size), fetch=True
+        )
+        if not rows:
+            break
+        
+        params = [encode_status_snapshots(*decode_status_snapshots(row)) + (row['id'],) for row in rows]
+        count = database.execute_many(update, params)
+        if count is None:
+            break
+        converted += count
+        last_id = rows[-1]['id']
+    
+    return converted
+
+def ingest_activity_logs(entries, batch_size=1000):
+    """Bulk load activity log entries (dicts keyed by activity_logs column)
+    
+    status_before/status_after may be given as dicts or legacy JSON text;
+    either way they are stored in the compact snapshot columns.
+    """
+    if shard_router is not None and _routed_database.get() is None:
+        # Split the entries by shard and load each batch into its own file
+        batches = {}
+        for entry in entries:
+            database = shard_router.for_pet(entry['pet_id']) or shard_router.for_user(1)
+            batches.setdefault(id(database), (database, []))[1].append(entry)
+        loaded = 0
+        for database, batch in batches.values():
+            with route_to(database):
+                loaded += ingest_activity_logs(batch, batch_size) or 0
+        return loaded
+    
+    database = get_database()
+    
+    def rows():
+        for entry in entries:
+            entry = dict(entry)
+            snapshots = []
+            for key in ('status_before', 'status_after'):
+                snapshot = entry.pop(key, None)
+                snapshots.append(json.loads(snapshot) if isinstance(snapshot, str) else snapshot)
+            entry.update(zip(SNAPSHOT_COLUMNS, encode_status_snapshots(*snapshots)))
+            # An explicit NULL would bypass the column's CURRENT_TIMESTAMP default
+            if entry.get('performed_at') is None:
+                entry['performed_at'] = datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+            yield entry
+    
+    return database.bulk_insert(
+        'activity_logs', rows(),
+        columns=('pet_id', 'activity_id', 'performed_at', 'experience_gained') + SNAPSHOT_COLUMNS,
+        batch_size=batch_size
+    )
+
 # Chat functions
+@_routed
 def save_chat_message(user_message, ai_response, pet_id=None, user_id=1):
     """Save chat conversation to database"""
     if pet_id is None:
@@ -539,23 +2144,116 @@ def save_chat_message(user_message, ai_response, pet_id=None, user_id=1):
     
     return chat_id
 
-def get_recent_chats(pet_id=None, user_id=1, limit=10):
-    """Get recent chat history"""
+@_routed
+def get_recent_chats(pet_id=None, user_id=1, limit=10, records=False):
+    """Get recent chat history (as Record tuples when records=True)"""
     if pet_id is None:
         pet = get_or_create_pet(user_id)
         pet_id = pet['id']
     
     database = get_database()
     
-    chats = database.execute_query(
-        """SELECT * FROM ai_chathistory WHERE pet_id = ? 
-           ORDER BY timestamp DESC LIMIT ?""",
-        (pet_id, limit), fetch=True
-    )
+    query = "SELECT * FROM {} WHERE pet_id = ? ORDER BY timestamp DESC LIMIT ?"
+    chats = database.execute_query(query.format('ai_chathistory'), (pet_id, limit), fetch=True, records=records)
+    if _reaches_archive(database, 'ai_chathistory', chats or [], limit, pet_id):
+        chats = database.execute_query(query.format('ai_chathistory_all'), (pet_id, limit), fetch=True, records=records)
     
+    if records:
+        return chats or []
     return [dict(chat) for chat in chats] if chats else []
 
+@_routed
+def iter_chat_history(pet_id=None, user_id=1, chunk_size=500, records=False):
+    """Stream a pet's whole chat history, newest first"""
+    if pet_id is None:
+        pet = get_or_create_pet(user_id)
+        pet_id = pet['id']
+    
+    database = get_database()
+    return database.iter_query(
+        f"SELECT * FROM {_history_source(database, 'ai_chathistory')} WHERE pet_id = ? ORDER BY timestamp DESC, id DESC",
+        (pet_id,), chunk_size=chunk_size, records=records
+    )
+
+def _chat_search_terms(text):
+    """Split free text into search terms, dropping FTS5 syntax characters"""
+    return [term for term in re.split(r'[^\w\']+', text) if term.strip("'")]
+
+def _has_chat_index(database):
+    """Whether this database has the FTS5 chat index (see ensure_chat_search)
+    
+    The schema is only read the first time; ensure_chat_search() keeps the
+    cached answer current when it builds the index.
+    """
+    if database._chat_index is None:
+        database._chat_index = HAS_FTS5 and bool(database.execute_query(
+            "SELECT 1 FROM sqlite_master WHERE name = 'ai_chathistory_fts'", fetch=True
+        ))
+    return database._chat_index
+
+@_routed
+def search_chats(pet_id=None, query='', limit=20, records=False):
+    """Search a pet's chat history; best matches first
+    
+    Every word of query must appear (in the message or the response);
+    matching is case-insensitive and stemmed, so 'walks' finds 'walk'.
+    Each row carries 'message_snippet' and 'response_snippet' with the
+    matches marked by SNIPPET_MARKERS. Uses the FTS5 index, ranked by
+    bm25, or a LIKE scan ordered by recency when the index is missing.
+    Chats moved to the archive tier are not searched.
+    """
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    terms = _chat_search_terms(query)
+    if not terms:
+        return []
+    database = get_database()
+    
+    if _has_chat_index(database):
+        # Quote every term so user input is never parsed as FTS5 syntax
+        terms = ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+        match = f'pet_id:"{int(pet_id)}" AND {{user_message ai_response}}: ({terms})'
+        opening, closing = SNIPPET_MARKERS
+        rows = database.execute_query(
+            """SELECT c.*, snippet(ai_chathistory_fts, 0, ?, ?, '...', 12) AS message_snippet, 
+                      snippet(ai_chathistory_fts, 1, ?, ?, '...', 12) AS response_snippet, 
+                      bm25(ai_chathistory_fts, 1.0, 1.0, 0.0) AS rank 
+               FROM ai_chathistory_fts JOIN ai_chathistory c ON c.id = ai_chathistory_fts.rowid 
+               WHERE ai_chathistory_fts MATCH ? ORDER BY rank LIMIT ?""",
+            (opening, closing, opening, closing, match, limit), fetch=True, records=records
+        )
+    else:
+        conditions = ' AND '.join("(user_message LIKE ? ESCAPE '\\' OR ai_response LIKE ? ESCAPE '\\')" 
+                                  for _ in terms)
+        params = [pet_id]
+        for term in terms:
+            pattern = '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            params += [pattern, pattern]
+        rows = database.execute_query(
+            f"""SELECT *, user_message AS message_snippet, ai_response AS response_snippet, NULL AS rank 
+                FROM ai_chathistory 
+                WHERE pet_id = ? AND {conditions} ORDER BY timestamp DESC, id DESC LIMIT ?""",
+            params + [limit], fetch=True, records=records
+        )
+    
+    if records:
+        return rows or []
+    return [dict(row) for row in rows] if rows else []
+
+def rebuild_chat_search(database=None):
+    """Rebuild the chat search index from ai_chathistory and merge it; returns rows indexed"""
+    database = database or get_database()
+    if not _has_chat_index(database):
+        return 0
+    with database.transaction():
+        database.execute_query("INSERT INTO ai_chathistory_fts (ai_chathistory_fts) VALUES ('rebuild')")
+        database.execute_query("INSERT INTO ai_chathistory_fts (ai_chathistory_fts) VALUES ('optimize')")
+    return database.execute_query("SELECT COUNT(*) FROM main.ai_chathistory", fetch=True)[0][0]
+
 # Scene functions
+@_routed
 def get_current_scene(pet_id=None):
     """Get appropriate scene based on pet mood and level"""
     if pet_id is None:
@@ -589,20 +2287,163 @@ def get_current_scene(pet_id=None):
     
     return dict(scene[0]) if scene else None
 
-def get_available_scenes(pet_level=1):
-    """Get all available scenes for pet level"""
+@_routed
+def get_available_scenes(pet_level=1, records=False):
+    """Get all available scenes for pet level (as Record tuples when records=True)"""
     database = get_database()
     
     scenes = database.execute_query(
         "SELECT * FROM scenes WHERE unlock_level <= ? AND is_active = 1 ORDER BY unlock_level",
-        (pet_level,), fetch=True
+        (pet_level,), fetch=True, records=records
     )
     
+    if records:
+        return scenes or []
     return [dict(scene) for scene in scenes] if scenes else []
 
 # Achievement functions
-def check_achievements(pet_id=None):
-    """Check and unlock achievements"""
+
+# Requirement types counted from activity events, and the activity each counts
+ACTIVITY_REQUIREMENTS = {'play_count': 'Play with Pet', 'feed_count': 'Feed Pet'}
+
+# Requirement types met once the pet stat of the same name reaches the value
+STAT_REQUIREMENTS = ('level', 'happiness', 'health')
+
+# Requirement types met by `value` consecutive days on which the stat never
+# dropped below the threshold; checked from the daily rollups
+STREAK_REQUIREMENTS = {'health_streak': ('health', 90), 'clean_streak': ('cleanliness', 80)}
+
+class AchievementEngine:
+    """Unlocks achievements from gameplay events instead of polling the logs
+    
+    Activity counts live in achievement.current_progress and are bumped by
+    one UPDATE per event; thresholds are compared against a per-pet cache
+    of the still-locked achievements, so an event costs O(1) regardless of
+    how large activity_logs grows.
+    """
+    
+    def __init__(self):
+        self._locked = {}  # pet_id -> list of locked achievement dicts
+        self._lock = threading.Lock()
+    
+    def reset(self, pet_id=None):
+        """Drop cached achievements for one pet, or for every pet"""
+        with self._lock:
+            if pet_id is None:
+                self._locked.clear()
+            else:
+                self._locked.pop(pet_id, None)
+    
+    def locked_achievements(self, database, pet_id):
+        """Return the pet's locked achievements, loading them on first use"""
+        with self._lock:
+            locked = self._locked.get(pet_id)
+        if locked is None:
+            rows = database.execute_query(
+                """SELECT id, achievement_name, requirement_type, requirement_value, current_progress 
+                   FROM achievement WHERE pet_id = ? AND is_unlocked = 0""",
+                (pet_id,), fetch=True
+            ) or []
+            locked = [dict(row) for row in rows]
+            with self._lock:
+                self._locked[pet_id] = locked
+        return locked
+    
+    def on_activity_performed(self, database, pet_id, activity, pet=None, **_):
+        """Count the activity towards its achievements, then check thresholds"""
+        locked = self.locked_achievements(database, pet_id)
+        for requirement_type, activity_name in ACTIVITY_REQUIREMENTS.items():
+            if activity['name'] != activity_name:
+                continue
+            counters = [a for a in locked if a['requirement_type'] == requirement_type]
+            if not counters:
+                continue
+            database.execute_query(
+                """UPDATE achievement SET current_progress = current_progress + 1 
+                   WHERE pet_id = ? AND requirement_type = ? AND is_unlocked = 0""",
+                (pet_id, requirement_type)
+            )
+            for achievement in counters:
+                achievement['current_progress'] += 1
+        
+        if pet is not None:
+            return self.evaluate(database, pet_id, pet)
+        return []
+    
+    def on_pet_status_changed(self, database, pet_id, pet, **_):
+        """Check stat thresholds after a status update"""
+        return self.evaluate(database, pet_id, pet)
+    
+    def evaluate(self, database, pet_id, pet):
+        """Unlock every cached locked achievement whose requirement the pet meets"""
+        newly_unlocked = []
+        for achievement in self.locked_achievements(database, pet_id):
+            requirement_type = achievement['requirement_type']
+            requirement_value = achievement['requirement_value']
+            
+            if requirement_type in STAT_REQUIREMENTS:
+                should_unlock = pet[requirement_type] >= requirement_value
+            elif requirement_type in ACTIVITY_REQUIREMENTS:
+                should_unlock = achievement['current_progress'] >= requirement_value
+            elif requirement_type == 'days_alive':
+                # Calculate days since creation
+                created_at = datetime.fromisoformat(pet['created_at'].replace('Z', '+00:00'))
+                days_alive = (datetime.now() - created_at).days
+                should_unlock = days_alive >= requirement_value
+            else:
+                should_unlock = False
+            
+            if should_unlock and self._unlock(database, pet_id, achievement):
+                newly_unlocked.append(achievement)
+        return newly_unlocked
+    
+    def evaluate_streaks(self, database, pet_id):
+        """Unlock the pet's streak achievements its daily rollups now satisfy"""
+        newly_unlocked = []
+        for achievement in self.locked_achievements(database, pet_id):
+            streak = STREAK_REQUIREMENTS.get(achievement['requirement_type'])
+            if streak is None:
+                continue
+            stat, threshold = streak
+            longest = get_stat_streak(pet_id, stat, threshold, database=database)['longest']
+            if longest >= achievement['requirement_value'] and self._unlock(database, pet_id, achievement):
+                newly_unlocked.append(achievement)
+        return newly_unlocked
+    
+    def _unlock(self, database, pet_id, achievement):
+        """Mark an achievement unlocked; returns True if this call unlocked it"""
+        query = """UPDATE achievement SET is_unlocked = 1, unlocked_at = CURRENT_TIMESTAMP 
+                   WHERE id = ? AND is_unlocked = 0"""
+        if achievement['requirement_type'] in ACTIVITY_REQUIREMENTS:
+            # The stored counter is authoritative, not our cached copy
+            query += " AND current_progress >= requirement_value"
+        
+        unlocked = database.execute_query(query, (achievement['id'],), rowcount=True)
+        if unlocked:
+            with self._lock:
+                locked = self._locked.get(pet_id)
+                if locked is not None:
+                    self._locked[pet_id] = [a for a in locked if a['id'] != achievement['id']]
+            return True
+        
+        # The cache disagrees with the table, so reload it on the next event
+        self.reset(pet_id)
+        return False
+
+achievement_engine = AchievementEngine()
+subscribe('activity_performed', achievement_engine.on_activity_performed)
+subscribe('pet_status_changed', achievement_engine.on_pet_status_changed)
+subscribe('activity_performed', pet_state_cache.on_pet_changed)
+subscribe('pet_status_changed', pet_state_cache.on_pet_changed)
+
+@_routed
+def check_achievements(pet_id=None, pet=None):
+    """Check and unlock achievements
+    
+    Gameplay calls don't need this (the achievement engine reacts to their
+    events); it re-reads the pet's locked achievements and evaluates them.
+    Pass the pet's current row as pet to skip reloading it.
+    """
     if pet_id is None:
         pet = get_or_create_pet()
         pet_id = pet['id']
@@ -610,62 +2451,55 @@ def check_achievements(pet_id=None):
     database = get_database()
     
     # Get pet stats
-    pet = database.execute_query("SELECT * FROM pet WHERE id = ?", (pet_id,), fetch=True)
-    if not pet:
-        return
-    
-    pet = dict(pet[0])
+    if pet is None:
+        pet = database.execute_query("SELECT * FROM pet WHERE id = ?", (pet_id,), fetch=True)
+        if not pet:
+            return
+        
+        pet = dict(pet[0])
     
-    # Get unlockable achievements
-    achievements = database.execute_query(
-        "SELECT * FROM achievement WHERE pet_id = ? AND is_unlocked = 0",
-        (pet_id,), fetch=True
-    )
+    achievement_engine.reset(pet_id)
     
-    newly_unlocked = []
-    
-    for achievement in achievements:
-        achievement = dict(achievement)
-        requirement_type = achievement['requirement_type']
-        requirement_value = achievement['requirement_value']
-        should_unlock = False
-        
-        if requirement_type == 'level':
-            should_unlock = pet['level'] >= requirement_value
-        elif requirement_type == 'happiness':
-            should_unlock = pet['happiness'] >= requirement_value
-        elif requirement_type == 'health':
-            should_unlock = pet['health'] >= requirement_value
-        elif requirement_type == 'days_alive':
-            # Calculate days since creation
-            created_at = datetime.fromisoformat(pet['created_at'].replace('Z', '+00:00'))
-            days_alive = (datetime.now() - created_at).days
-            should_unlock = days_alive >= requirement_value
-        elif requirement_type in ['play_count', 'feed_count']:
-            # Count activities
-            activity_name = 'Play with Pet' if requirement_type == 'play_count' else 'Feed Pet'
-            activity = database.execute_query(
-                "SELECT id FROM activities WHERE name = ?", (activity_name,), fetch=True
-            )
-            if activity:
-                count = database.execute_query(
-                    "SELECT COUNT(*) as count FROM activity_logs WHERE pet_id = ? AND activity_id = ?",
-                    (pet_id, activity[0]['id']), fetch=True
-                )
-                should_unlock = count[0]['count'] >= requirement_value if count else False
-        
-        if should_unlock:
-            # Unlock achievement
+    # All unlocks from one check are committed together
+    with database.transaction():
+        return achievement_engine.evaluate(database, pet_id, pet)
+
+def backfill_achievement_progress(database=None):
+    """One-off job: rebuild achievement.current_progress from pet_activity_counters
+    
+    Returns the number of achievements unlocked by the rebuilt counters.
+    """
+    database = database or get_database()
+    catalog = get_activity_catalog(database)
+    
+    with database.transaction():
+        for requirement_type, activity_name in ACTIVITY_REQUIREMENTS.items():
+            activity = catalog.by_name.get(activity_name)
+            if not activity:
+                continue
             database.execute_query(
-                "UPDATE achievement SET is_unlocked = 1, unlocked_at = CURRENT_TIMESTAMP WHERE id = ?",
-                (achievement['id'],)
+                """UPDATE achievement SET current_progress = COALESCE((
+                       SELECT count FROM pet_activity_counters 
+                       WHERE pet_activity_counters.pet_id = achievement.pet_id 
+                       AND pet_activity_counters.activity_id = ?
+                   ), 0) WHERE requirement_type = ?""",
+                (activity['id'], requirement_type)
             )
-            newly_unlocked.append(achievement)
+        
+        placeholders = ', '.join('?' for _ in ACTIVITY_REQUIREMENTS)
+        unlocked = database.execute_query(
+            f"""UPDATE achievement SET is_unlocked = 1, unlocked_at = CURRENT_TIMESTAMP 
+                WHERE is_unlocked = 0 AND requirement_type IN ({placeholders}) 
+                AND current_progress >= requirement_value""",
+            tuple(ACTIVITY_REQUIREMENTS), rowcount=True
+        )
     
-    return newly_unlocked
+    achievement_engine.reset()
+    return unlocked
 
-def get_pet_achievements(pet_id=None, unlocked_only=False):
-    """Get pet achievements"""
+@_routed
+def get_pet_achievements(pet_id=None, unlocked_only=False, records=False):
+    """Get pet achievements (as Record tuples when records=True)"""
     if pet_id is None:
         pet = get_or_create_pet()
         pet_id = pet['id']
@@ -680,10 +2514,27 @@ def get_pet_achievements(pet_id=None, unlocked_only=False):
     
     query += " ORDER BY unlocked_at DESC, achievement_name"
     
-    achievements = database.execute_query(query, params, fetch=True)
+    achievements = database.execute_query(query, params, fetch=True, records=records)
+    if records:
+        return achievements or []
     return [dict(achievement) for achievement in achievements] if achievements else []
 
+@_routed
+def iter_pet_achievements(pet_id=None, unlocked_only=False, chunk_size=500, records=False):
+    """Stream pet achievements in the same order as get_pet_achievements"""
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    query = "SELECT * FROM achievement WHERE pet_id = ?"
+    if unlocked_only:
+        query += " AND is_unlocked = 1"
+    query += " ORDER BY unlocked_at DESC, achievement_name"
+    
+    return get_database().iter_query(query, (pet_id,), chunk_size=chunk_size, records=records)
+
 # Appointment functions
+@_routed
 def add_appointment(pet_id, appointment_type, appointment_date, veterinarian=None, clinic_name=None, notes=None):
     """Add a new appointment"""
     database = get_database()
@@ -696,8 +2547,9 @@ def add_appointment(pet_id, appointment_type, appointment_date, veterinarian=Non
     
     return appointment_id
 
-def get_upcoming_appointments(pet_id=None, days_ahead=30):
-    """Get upcoming appointments"""
+@_routed
+def get_upcoming_appointments(pet_id=None, days_ahead=30, records=False):
+    """Get upcoming appointments (as Record tuples when records=True)"""
     if pet_id is None:
         pet = get_or_create_pet()
         pet_id = pet['id']
@@ -710,12 +2562,15 @@ def get_upcoming_appointments(pet_id=None, days_ahead=30):
     appointments = database.execute_query(
         """SELECT * FROM appointments WHERE pet_id = ? AND appointment_date > datetime('now') 
            AND appointment_date <= ? AND status != 'cancelled' ORDER BY appointment_date""",
-        (pet_id, future_date.isoformat()), fetch=True
+        (pet_id, future_date.isoformat()), fetch=True, records=records
     )
     
+    if records:
+        return appointments or []
     return [dict(appointment) for appointment in appointments] if appointments else []
 
 # Medical records functions
+@_routed
 def add_medical_record(pet_id, record_type, diagnosis=None, treatment=None, medications=None, 
                       veterinarian=None, visit_date=None, notes=None):
     """Add a new medical record"""
@@ -733,22 +2588,66 @@ def add_medical_record(pet_id, record_type, diagnosis=None, treatment=None, medi
     
     return record_id
 
-def get_medical_history(pet_id=None, limit=20):
-    """Get pet medical history"""
+@_routed
+def get_medical_history(pet_id=None, limit=20, records=False):
+    """Get pet medical history (as Record tuples when records=True)"""
     if pet_id is None:
         pet = get_or_create_pet()
         pet_id = pet['id']
     
     database = get_database()
     
-    records = database.execute_query(
+    history = database.execute_query(
         "SELECT * FROM medical_records WHERE pet_id = ? ORDER BY visit_date DESC LIMIT ?",
-        (pet_id, limit), fetch=True
+        (pet_id, limit), fetch=True, records=records
+    )
+    
+    if records:
+        return history or []
+    return [dict(record) for record in history] if history else []
+
+@_routed
+def iter_medical_history(pet_id=None, chunk_size=500, records=False):
+    """Stream pet medical history, most recent visit first"""
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    return get_database().iter_query(
+        "SELECT * FROM medical_records WHERE pet_id = ? ORDER BY visit_date DESC",
+        (pet_id,), chunk_size=chunk_size, records=records
     )
+
+@_routed
+def iter_activity_logs(pet_id=None, chunk_size=500, records=False):
+    """Stream a pet's activity log in the order the activities happened"""
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
     
-    return [dict(record) for record in records] if records else []
+    database = get_database()
+    return database.iter_query(
+        f"SELECT * FROM {_history_source(database, 'activity_logs')} WHERE pet_id = ? ORDER BY id",
+        (pet_id,), chunk_size=chunk_size, records=records
+    )
+
+def export_table_csv(table, path, chunk_size=1000):
+    """Write every row of a table to a CSV file; returns the number of rows written"""
+    import csv
+    
+    rows = get_database().iter_query(f"SELECT * FROM {_check_identifier(table)}", chunk_size=chunk_size, records=True)
+    written = 0
+    with open(path, 'w', newline='', encoding='utf-8') as output:
+        writer = csv.writer(output)
+        for row in rows:
+            if written == 0:
+                writer.writerow(row.keys())
+            writer.writerow(row)
+            written += 1
+    return written
 
 # Reminder functions
+@_routed
 def add_reminder(pet_id, user_id, title, description, due_date, reminder_type, repeat_interval=None):
     """Add a new reminder"""
     database = get_database()
@@ -761,8 +2660,9 @@ def add_reminder(pet_id, user_id, title, description, due_date, reminder_type, r
     
     return reminder_id
 
-def get_active_reminders(pet_id=None, user_id=1):
-    """Get active reminders"""
+@_routed
+def get_active_reminders(pet_id=None, user_id=1, records=False):
+    """Get active reminders (as Record tuples when records=True)"""
     if pet_id is None:
         pet = get_or_create_pet()
         pet_id = pet['id']
@@ -772,31 +2672,435 @@ def get_active_reminders(pet_id=None, user_id=1):
     reminders = database.execute_query(
         """SELECT * FROM reminders WHERE pet_id = ? AND user_id = ? 
            AND is_active = 1 AND is_completed = 0 ORDER BY due_date""",
-        (pet_id, user_id), fetch=True
+        (pet_id, user_id), fetch=True, records=records
     )
     
+    if records:
+        return reminders or []
     return [dict(reminder) for reminder in reminders] if reminders else []
 
+# Paged history: table -> column the pages are ordered by (newest first).
+# Each is backed by a (pet_id, <column>) index; the rowid breaks ties.
+HISTORY_PAGE_COLUMNS = {
+    'ai_chathistory': 'timestamp',
+    'medical_records': 'visit_date',
+    'activity_logs': 'performed_at',
+    'appointments': 'appointment_date',
+}
+
+def _history_source(database, table):
+    """table, or its hot+archive view once any of it has been archived"""
+    if table in ARCHIVE_TABLES and database.archive_horizon(table) is not None:
+        return f"{table}_all"
+    return table
+
+def _reaches_archive(database, table, rows, limit, pet_id, before=None):
+    """Whether a newest-first read of up to limit hot rows of a pet may be missing archived ones
+    
+    Archived rows are all older than the horizon, so a full page of hot rows
+    ending at or after it is complete without touching the archive. Otherwise
+    one seek on the archive's (pet_id, age) index tells whether any archived
+    row of the pet falls in the page, so pets without archived history never
+    pay for a read of the hot+archive view.
+    """
+    if table not in ARCHIVE_TABLES:
+        return False
+    horizon = database.archive_horizon(table)
+    if horizon is None:
+        return False
+    age_column = ARCHIVE_TABLES[table]
+    full = len(rows) == limit
+    if full and rows[-1][age_column] >= horizon:
+        return False
+    
+    query = f"SELECT 1 FROM archive.{table} WHERE pet_id = ?"
+    params = [pet_id]
+    if before is not None:
+        query += f" AND {age_column} <= ?"
+        params.append(before)
+    if full:
+        query += f" AND {age_column} >= ?"
+        params.append(rows[-1][age_column])
+    return bool(database.execute_query(query + " LIMIT 1", params, fetch=True))
+
+def _history_page(table, pet_id, before_timestamp, before_id, page_size, records):
+    """Fetch one keyset page of a pet's history; see get_chat_page"""
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    order_column = HISTORY_PAGE_COLUMNS[table]
+    database = get_database()
+    
+    # A bare before_id continues from that row's position
+    if before_id is not None and before_timestamp is None:
+        anchor = database.execute_query(
+            f"SELECT {order_column} FROM {_history_source(database, table)} WHERE id = ?", (before_id,), fetch=True
+        )
+        if not anchor:
+            return [], None
+        before_timestamp = anchor[0][0]
+    
+    query = "SELECT * FROM {} WHERE pet_id = ?"
+    params = [pet_id]
+    if before_id is not None:
+        # Row-value comparison seeks straight to the cursor, whatever the depth
+        query += f" AND ({order_column}, id) < (?, ?)"
+        params += [before_timestamp, before_id]
+    elif before_timestamp is not None:
+        query += f" AND {order_column} < ?"
+        params.append(before_timestamp)
+    query += f" ORDER BY {order_column} DESC, id DESC LIMIT ?"
+    params.append(page_size)
+    
+    rows = database.execute_query(query.format(table), params, fetch=True, records=records) or []
+    if _reaches_archive(database, table, rows, page_size, pet_id, before_timestamp):
+        rows = database.execute_query(query.format(f"{table}_all"), params, fetch=True, records=records) or []
+    if not records:
+        rows = [dict(row) for row in rows]
+    
+    next_cursor = None
+    if len(rows) == page_size:
+        last = rows[-1]
+        next_cursor = {'before_timestamp': last[order_column], 'before_id': last['id']}
+    return rows, next_cursor
+
+@_routed
+def get_chat_page(pet_id=None, before_timestamp=None, before_id=None, page_size=50, records=False):
+    """Get one page of chat history, newest first
+    
+    Returns (rows, next_cursor). Pass next_cursor back as keyword
+    arguments (get_chat_page(pet_id, **next_cursor)) for the next page;
+    it is None once the history is exhausted.
+    """
+    return _history_page('ai_chathistory', pet_id, before_timestamp, before_id, page_size, records)
+
+@_routed
+def get_medical_page(pet_id=None, before_timestamp=None, before_id=None, page_size=50, records=False):
+    """Get one page of medical records, most recent visit first; see get_chat_page"""
+    return _history_page('medical_records', pet_id, before_timestamp, before_id, page_size, records)
+
+@_routed
+def get_activity_log_page(pet_id=None, before_timestamp=None, before_id=None, page_size=50, records=False):
+    """Get one page of the activity log, newest first; see get_chat_page"""
+    return _history_page('activity_logs', pet_id, before_timestamp, before_id, page_size, records)
+
+@_routed
+def get_appointment_page(pet_id=None, before_timestamp=None, before_id=None, page_size=50, records=False):
+    """Get one page of appointments, latest appointment date first; see get_chat_page"""
+    return _history_page('appointments', pet_id, before_timestamp, before_id, page_size, records)
+
+# Query plans for the lookups the helpers above issue, checked by `db.py explain`
+EXPLAIN_QUERIES = [
+    ('get_or_create_pet', "SELECT * FROM pet WHERE user_id = ? LIMIT 1", (1,)),
+    ('save_chat_message', "SELECT mood FROM pet WHERE id = ?", (1,)),
+    ('get_recent_chats', 
+     "SELECT * FROM ai_chathistory WHERE pet_id = ? ORDER BY timestamp DESC LIMIT ?", (1, 10)),
+    ('get_current_scene', 
+     """SELECT * FROM scenes WHERE mood_requirement = ? AND unlock_level <= ? AND is_active = 1 
+        ORDER BY unlock_level DESC LIMIT 1""", ('happy', 1)),
+    ('get_available_scenes', 
+     "SELECT * FROM scenes WHERE unlock_level <= ? AND is_active = 1 ORDER BY unlock_level", (1,)),
+    ('check_achievements', 
+     """SELECT id, achievement_name, requirement_type, requirement_value, current_progress 
+        FROM achievement WHERE pet_id = ? AND is_unlocked = 0""", (1,)),
+    ('get_activity_counts', 
+     "SELECT activity_id, count, last_performed_at FROM pet_activity_counters WHERE pet_id = ?", (1,)),
+    ('get_pet_achievements', 
+     "SELECT * FROM achievement WHERE pet_id = ? ORDER BY unlocked_at DESC, achievement_name", (1,)),
+    ('get_upcoming_appointments', 
+     """SELECT * FROM appointments WHERE pet_id = ? AND appointment_date > datetime('now') 
+        AND appointment_date <= ? AND status != 'cancelled' ORDER BY appointment_date""",
+     (1, '2100-01-01')),
+    ('get_chat_page', 
+     """SELECT * FROM ai_chathistory WHERE pet_id = ? AND (timestamp, id) < (?, ?) 
+        ORDER BY timestamp DESC, id DESC LIMIT ?""", (1, '2100-01-01', 1, 50)),
+    ('get_activity_log_page', 
+     """SELECT * FROM activity_logs WHERE pet_id = ? AND (performed_at, id) < (?, ?) 
+        ORDER BY performed_at DESC, id DESC LIMIT ?""", (1, '2100-01-01', 1, 50)),
+    ('get_medical_history', 
+     "SELECT * FROM medical_records WHERE pet_id = ? ORDER BY visit_date DESC LIMIT ?", (1, 20)),
+    ('get_active_reminders', 
+     """SELECT * FROM reminders WHERE pet_id = ? AND user_id = ? 
+        AND is_active = 1 AND is_completed = 0 ORDER BY due_date""", (1, 1)),
+]
+
+def explain_query_plans():
+    """Return (helper, plan lines, full_scan) for every query in EXPLAIN_QUERIES"""
+    database = get_database()
+    plans = []
+    for helper, query, params in EXPLAIN_QUERIES:
+        rows = database.execute_query(f"EXPLAIN QUERY PLAN {query}", params, fetch=True) or []
+        details = [row['detail'] for row in rows]
+        full_scan = any(detail.startswith('SCAN') for detail in details)
+        plans.append((helper, details, full_scan))
+    return plans
+
 # Utility functions
 def close_database():
     """Close database connection"""
-    global db
+    global db, shard_router
+    pet_state_cache.stop()
     if db:
-        db.close()
+        pet_state_cache.flush()
+        if shard_router is not None:
+            shard_router.close()
+            shard_router = None
+        else:
+            db.close()
         db = None
+    pet_state_cache.clear()
+    achievement_engine.reset()
+
+def backup_database(target, pages=BACKUP_PAGES, sleep=BACKUP_SLEEP, progress=None):
+    """Hot-copy the current database to target; see DatabaseManager.backup()"""
+    return get_database().backup(target, pages=pages, sleep=sleep, progress=progress)
+
+def archive_history(older_than_days=ARCHIVE_AFTER_DAYS, chunk_size=5000, database=None, vacuum=False):
+    """Move chat and activity-log rows older than older_than_days into the archive tier
+    
+    Works oldest id first, one chunk per transaction, and stops at the first
+    chunk with nothing old enough. Rows keep their ids, so a chunk that was
+    copied but not deleted (the two files commit separately in WAL mode)
+    is simply copied again next time. Returns {table: rows moved}.
+    """
+    database = database or get_database()
+    if database.archive_path is None:
+        print("No archive attached; open the database with archive_path=...")
+        return {}
+    cutoff = database.execute_query("SELECT datetime('now', ?)", (f"-{older_than_days} days",), fetch=True)[0][0]
+    
+    moved = {}
+    for table, age_column in ARCHIVE_TABLES.items():
+        columns = ', '.join(column[1] for column in database.execute_query(f"PRAGMA main.table_info({table})", fetch=True))
+        moved[table] = 0
+        after_id = 0
+        while True:
+            with database.transaction():
+                window = database.execute_query(
+                    f"""SELECT MAX(id), SUM({age_column} < ?) FROM 
+                        (SELECT id, {age_column} FROM main.{table} WHERE id > ? ORDER BY id LIMIT ?)""",
+                    (cutoff, after_id, chunk_size), fetch=True
+                )
+                last_id, old = window[0]
+                if last_id is None or not old:
+                    break
+                
+                # Raise the horizon first, so readers know to look in the archive
+                database.execute_query(
+                    """INSERT INTO archive.archive_state (table_name, archived_before) VALUES (?, ?)
+                       ON CONFLICT (table_name) DO UPDATE SET archived_before = MAX(archived_before, excluded.archived_before)""",
+                    (table, cutoff)
+                )
+                chunk = (after_id, last_id, cutoff)
+                database.execute_query(
+                    f"""INSERT OR REPLACE INTO archive.{table} ({columns}) SELECT {columns} FROM main.{table} 
+                        WHERE id > ? AND id <= ? AND {age_column} < ?""",
+                    chunk
+                )
+                database.execute_query(f"DELETE FROM main.{table} WHERE id > ? AND id <= ? AND {age_column} < ?", chunk)
+            moved[table] += old
+            after_id = last_id
+    
+    if vacuum and any(moved.values()):
+        # Give the freed pages back so the hot file actually shrinks
+        database.execute_query("VACUUM main")
+    return moved
+
+def _rollup_queries(source):
+    """The stat and activity upserts folding source rows with id in (?, ?] into the rollups"""
+    stat_columns = ', '.join(f"min_{stat}, sum_{stat}, max_{stat}" for stat in PET_STATS)
+    stat_values = ', '.join(f"MIN(after_{stat}), SUM(after_{stat}), MAX(after_{stat})" for stat in PET_STATS)
+    stat_updates = ', '.join(
+        f"min_{stat} = MIN(min_{stat}, excluded.min_{stat}), sum_{stat} = sum_{stat} + excluded.sum_{stat}, "
+        f"max_{stat} = MAX(max_{stat}, excluded.max_{stat})" for stat in PET_STATS
+    )
+    stats = f"""
+        INSERT INTO pet_stat_rollups (pet_id, granularity, bucket, samples, {stat_columns}) 
+        SELECT pet_id, ?, strftime(?, performed_at), COUNT(*), {stat_values} FROM {source} 
+        WHERE id > ? AND id <= ? AND after_health IS NOT NULL GROUP BY 1, 3 
+        ON CONFLICT (pet_id, granularity, bucket) DO UPDATE SET samples = samples + excluded.samples, {stat_updates}"""
+    activities = f"""
+        INSERT INTO pet_activity_rollups (pet_id, granularity, bucket, activity_id, count, experience) 
+        SELECT pet_id, ?, strftime(?, performed_at), activity_id, COUNT(*), COALESCE(SUM(experience_gained), 0) 
+        FROM {source} WHERE id > ? AND id <= ? GROUP BY 1, 3, 4 
+        ON CONFLICT (pet_id, granularity, bucket, activity_id) DO UPDATE SET 
+            count = count + excluded.count, experience = experience + excluded.experience"""
+    return stats, activities
+
+def refresh_rollups(database=None, chunk_size=10000):
+    """Fold activity log rows newer than the high-water mark into the hourly/daily rollups
+    
+    Each chunk and its high-water mark commit together, so every row is
+    counted exactly once however often this runs. Streak achievements of
+    the pets involved are checked afterwards. Returns the rows processed.
+    """
+    database = database or get_database()
+    # Rows already moved to the archive tier but not yet rolled up are still included
+    source = _history_source(database, 'activity_logs')
+    stats, activities = _rollup_queries(source)
+    processed = 0
+    pets = set()
+    while True:
+        with database.transaction():
+            state = database.execute_query("SELECT last_id FROM rollup_state WHERE source = 'activity_logs'", fetch=True)
+            last_id = state[0][0] if state else 0
+            window = database.execute_query(
+                f"SELECT MAX(id), COUNT(*) FROM (SELECT id FROM {source} WHERE id > ? ORDER BY id LIMIT ?)",
+                (last_id, chunk_size), fetch=True
+            )
+            high_id, rows = window[0]
+            if high_id is None:
+                break
+            for granularity, bucket_format in ROLLUP_GRANULARITIES.items():
+                database.execute_query(stats, (granularity, bucket_format, last_id, high_id))
+                database.execute_query(activities, (granularity, bucket_format, last_id, high_id))
+            pets.update(row[0] for row in database.execute_query(
+                f"SELECT DISTINCT pet_id FROM {source} WHERE id > ? AND id <= ?", (last_id, high_id), fetch=True
+            ))
+            database.execute_query(
+                """INSERT INTO rollup_state (source, last_id) VALUES ('activity_logs', ?) 
+                   ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id""",
+                (high_id,)
+            )
+        processed += rows
+    
+    for pet_id in pets:
+        achievement_engine.evaluate_streaks(database, pet_id)
+    return processed
+
+def prune_activity_logs(keep_days=RAW_LOG_RETENTION_DAYS, chunk_size=5000, database=None):
+    """Delete raw activity logs older than keep_days that the rollups already hold
+    
+    Only rows at or below the rollup high-water mark are touched, in the
+    hot table and the archive tier alike. Activity counters are lifetime
+    totals and are not lowered; rebuild_activity_counters() counts pruned
+    rows from the rollups. Returns the rows deleted.
+    """
+    if keep_days is None:
+        return 0
+    database = database or get_database()
+    state = database.execute_query("SELECT last_id FROM rollup_state WHERE source = 'activity_logs'", fetch=True)
+    if not state:
+        return 0
+    last_id = state[0][0]
+    cutoff = database.execute_query("SELECT datetime('now', ?)", (f"-{keep_days} days",), fetch=True)[0][0]
+    
+    tables = ['main.activity_logs']
+    if database.archive_horizon('activity_logs') is not None:
+        tables.append('archive.activity_logs')
+    deleted = 0
+    for table in tables:
+        after_id = 0
+        while True:
+            with database.transaction():
+                high_id = database.execute_query(
+                    f"SELECT MAX(id) FROM (SELECT id FROM {table} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?)",
+                    (after_id, last_id, chunk_size), fetch=True
+                )[0][0]
+                if high_id is None:
+                    break
+                removed = database.execute_query(
+                    f"SELECT COUNT(*) FROM {table} WHERE id > ? AND id <= ? AND performed_at < ?",
+                    (after_id, high_id, cutoff), fetch=True
+                )[0][0]
+                database.execute_query(
+                    f"DELETE FROM {table} WHERE id > ? AND id <= ? AND performed_at < ?", (after_id, high_id, cutoff)
+                )
+            deleted += removed
+            after_id = high_id
+    return deleted
+
+@_routed
+def get_stat_rollups(pet_id=None, granularity='day', since=None, records=False):
+    """Per-bucket min/avg/max of each pet stat, oldest bucket first
+    
+    since limits the result to buckets at or after that timestamp.
+    """
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    stat_columns = ', '.join(
+        f"min_{stat}, ROUND(sum_{stat} * 1.0 / samples, 1) AS avg_{stat}, max_{stat}" for stat in PET_STATS
+    )
+    rows = get_database().execute_query(
+        f"""SELECT bucket, samples, {stat_columns} FROM pet_stat_rollups 
+            WHERE pet_id = ? AND granularity = ? AND bucket >= ? ORDER BY bucket""",
+        (pet_id, granularity, since or ''), fetch=True, records=records
+    )
+    
+    if records:
+        return rows or []
+    return [dict(row) for row in rows] if rows else []
+
+@_routed
+def get_activity_rollups(pet_id=None, granularity='day', since=None, records=False):
+    """Per-bucket activity counts and experience gained, oldest bucket first"""
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    rows = get_database().execute_query(
+        """SELECT r.bucket, a.name AS activity, r.count, r.experience 
+           FROM pet_activity_rollups r JOIN activities a ON a.id = r.activity_id 
+           WHERE r.pet_id = ? AND r.granularity = ? AND r.bucket >= ? ORDER BY r.bucket, a.name""",
+        (pet_id, granularity, since or ''), fetch=True, records=records
+    )
+    
+    if records:
+        return rows or []
+    return [dict(row) for row in rows] if rows else []
+
+@_routed
+def get_stat_streak(pet_id=None, stat='health', threshold=90, database=None):
+    """Consecutive days a stat stayed at or above threshold: {'current': days, 'longest': days}
+    
+    Read from the daily rollups; a day without any logged activity breaks
+    the streak. 'current' counts back from the most recent logged day.
+    """
+    if stat not in PET_STATS:
+        raise ValueError(f"Unknown pet stat: {stat!r}")
+    if pet_id is None:
+        pet = get_or_create_pet()
+        pet_id = pet['id']
+    
+    database = database or get_database()
+    days = database.execute_query(
+        f"""SELECT julianday(bucket), min_{stat} >= ? FROM pet_stat_rollups 
+            WHERE pet_id = ? AND granularity = 'day' ORDER BY bucket""",
+        (threshold, pet_id), fetch=True
+    ) or []
+    
+    current = longest = 0
+    previous = None
+    for day, kept in days:
+        if not kept:
+            current = 0
+        elif previous is not None and day - previous == 1 and current:
+            current += 1
+        else:
+            current = 1
+        longest = max(longest, current)
+        previous = day
+    return {'current': current, 'longest': longest}
 
 def reset_database():
     """Reset database (delete and recreate)"""
     global db
+    pet_state_cache.stop()
+    pet_state_cache.clear()
     if db:
         db.close()
     
-    # Delete database file
-    try:
-        os.remove("petpal_game.db")
-        print("Database file deleted")
-    except FileNotFoundError:
-        pass
+    # Delete database file (and the WAL sidecar files, if any are left over)
+    for path in ("petpal_game.db", "petpal_game.db-wal", "petpal_game.db-shm", 
+                 "petpal_game.archive.db", "petpal_game.archive.db-wal", "petpal_game.archive.db-shm"):
+        try:
+            os.remove(path)
+            print(f"Deleted {path}")
+        except FileNotFoundError:
+            pass
     
     # Reinitialize
     db = init_database()
@@ -811,6 +3115,94 @@ if __name__ == '__main__':
             print("Initializing database...")
             init_database()
             print("Database initialization complete")
+        elif sys.argv[1] == 'migrate':
+            database = init_database()
+            print(f"Schema version: {database.schema_version()}")
+        elif sys.argv[1] == 'profile':
+            # python db.py profile [name] - show the pragmas a profile results in
+            profile = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_PROFILE
+            database = init_database(profile=profile)
+            print(f"Active profile: {database.profile}")
+            for pragma, value in database.active_pragmas().items():
+                print(f"  {pragma} = {value}")
+        elif sys.argv[1] == 'rebuild-counters':
+            init_database()
+            rows = rebuild_activity_counters()
+            print(f"Activity counters rebuilt: {rows} pet/activity pairs")
+        elif sys.argv[1] == 'compact-logs':
+            init_database()
+            converted = compact_activity_logs()
+            print(f"Activity log rows converted to compact snapshots: {converted}")
+        elif sys.argv[1] == 'export':
+            if len(sys.argv) < 3:
+                print("Usage: python db.py export <table> [file.csv]")
+                sys.exit(1)
+            table = sys.argv[2]
+            path = sys.argv[3] if len(sys.argv) > 3 else f"{table}.csv"
+            init_database()
+            written = export_table_csv(table, path)
+            print(f"Exported {written} rows from {table} to {path}")
+        elif sys.argv[1] == 'backfill-achievements':
+            init_database()
+            unlocked = backfill_achievement_progress()
+            print(f"Achievement progress rebuilt, {unlocked} achievements unlocked")
+        elif sys.argv[1] == 'rebuild-search':
+            init_database()
+            if HAS_FTS5:
+                print(f"Chat search index rebuilt: {rebuild_chat_search()} chats")
+            else:
+                print("SQLite built without FTS5; chat search uses LIKE scans")
+        elif sys.argv[1] == 'rollups':
+            # python db.py rollups [--prune DAYS]
+            init_database()
+            print(f"Activity log rows rolled up: {refresh_rollups()}")
+            if '--prune' in sys.argv:
+                keep_days = int(sys.argv[sys.argv.index('--prune') + 1])
+                print(f"Raw activity log rows pruned: {prune_activity_logs(keep_days)}")
+            elif RAW_LOG_RETENTION_DAYS is not None:
+                print(f"Raw activity log rows pruned: {prune_activity_logs()}")
+        elif sys.argv[1] == 'archive':
+            # python db.py archive [days] [--vacuum]
+            days = int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2].isdigit() else ARCHIVE_AFTER_DAYS
+            init_database(archive_path=Path("petpal_game.db").with_suffix('.archive.db'))
+            for table, rows in archive_history(days, vacuum='--vacuum' in sys.argv).items():
+                print(f"Archived {rows} {table} rows older than {days} days")
+        elif sys.argv[1] == 'backup':
+            # python db.py backup <dest> [pages per step]
+            if len(sys.argv) < 3:
+                print("Usage: python db.py backup <dest> [pages]")
+                sys.exit(1)
+            pages = int(sys.argv[3]) if len(sys.argv) > 3 else BACKUP_PAGES
+            init_database()
+            if backup_database(sys.argv[2], pages=pages):
+                print(f"Backed up to {sys.argv[2]}")
+        elif sys.argv[1] == 'explain':
+            init_database()
+            full_scans = 0
+            for helper, details, full_scan in explain_query_plans():
+                full_scans += full_scan
+                print(f"\n{helper}{'  <-- FULL SCAN' if full_scan else ''}")
+                for detail in details:
+                    print(f"  {detail}")
+            print(f"\n{full_scans} quer{'y' if full_scans == 1 else 'ies'} with a full table scan")
+        elif sys.argv[1] == 'shards':
+            # python db.py shards <directory> <command> [shards]
+            commands = ('status', 'rebalance') + tuple(SHARD_MAINTENANCE)
+            if len(sys.argv) < 4 or sys.argv[3] not in commands:
+                print(f"Usage: python db.py shards <directory> <{'|'.join(commands)}> [shards]")
+                sys.exit(1)
+            command = sys.argv[3]
+            shards = int(sys.argv[4]) if len(sys.argv) > 4 else 4
+            router = init_sharded_database(sys.argv[2], shards=shards)
+            if command == 'rebalance':
+                for user_id, source, target in router.rebalance(shards):
+                    print(f"Moved user {user_id}: shard {source} -> shard {target}")
+            elif command != 'status':
+                for index, result in enumerate(router.map_shards(SHARD_MAINTENANCE[command])):
+                    print(f"shard {index}: {command} -> {result}")
+            for size in router.shard_sizes():
+                print(f"shard {size['shard']}: {size['users']} users, {size['pets']} pets")
+            close_database()
         elif sys.argv[1] == 'reset':
             print("Resetting database...")
             reset_database()
@@ -832,6 +3224,24 @@ if __name__ == '__main__':
             if result:
                 print(f"Activity completed. New hunger: {result['hunger']}")
             
+            # Test concurrent activities on one pet
+            before = get_or_create_pet()
+            feeders = [threading.Thread(target=perform_activity, args=("Feed Pet", pet['id'])) for _ in range(20)]
+            for feeder in feeders:
+                feeder.start()
+            for feeder in feeders:
+                feeder.join()
+            after = get_or_create_pet()
+            print(f"No lost updates under concurrent callers: {after['experience'] - before['experience'] == 20 * 10}")
+            
+            # Test activity catalog cache
+            catalog = get_activity_catalog()
+            print(f"Catalog cached: {get_activity_catalog() is catalog}")
+            get_database().execute_query(
+                "UPDATE activities SET description = description WHERE name = ?", ('Feed Pet',)
+            )
+            print(f"Catalog reloaded after activities changed: {get_activity_catalog() is not catalog}")
+            
             # Test chat
             print("\n--- Testing Chat ---")
             chat_id = save_chat_message("Hello!", "Woof! Hello there!", pet['id'])
@@ -839,6 +3249,24 @@ if __name__ == '__main__':
             
             recent_chats = get_recent_chats(pet['id'])
             print(f"Recent chats: {len(recent_chats)} found")
+            chat_records = get_recent_chats(pet['id'], records=True)
+            latest = chat_records[0]
+            assert latest['user_message'] == latest.user_message == latest.get('user_message') == "Hello!"
+            assert latest.to_dict() == dict(latest) == recent_chats[0]
+            print(f"Chat records match dict rows: {latest.id}")
+            
+            # Test chat search
+            save_chat_message("Let's go for a walk in the park", "Woof! I love walks!", pet['id'])
+            save_chat_message("Time for your bath", "Oh no, not the bath...", pet['id'])
+            found = search_chats(pet['id'], "walking park")
+            print(f"Chat search ({'FTS5' if _has_chat_index(get_database()) else 'LIKE'}): "
+                  f"{len(found)} match, snippets: {found[0]['message_snippet']} / {found[0]['response_snippet']}")
+            unbalanced = search_chats(pet['id'], '"bath* (')
+            print(f"Search ignores query syntax: {len(unbalanced) == 1}")
+            get_database().execute_query(
+                "UPDATE ai_chathistory SET user_message = 'Time for a nap' WHERE id = ?", (found[0]['id'] if found else 0,)
+            )
+            print(f"Index follows edits: {search_chats(pet['id'], 'nap')[0]['id'] == found[0]['id']}")
             
             # Test achievements
             print("\n--- Testing Achievements ---")
@@ -846,6 +3274,21 @@ if __name__ == '__main__':
             print(f"Total achievements: {len(achievements)}")
             unlocked = [a for a in achievements if a['is_unlocked']]
             print(f"Unlocked achievements: {len(unlocked)}")
+            chef = next(a for a in achievements if a['requirement_type'] == 'feed_count')
+            feed = get_activity_catalog().by_name['Feed Pet']
+            logged = get_database().execute_query(
+                "SELECT COUNT(*) AS count FROM activity_logs WHERE pet_id = ? AND activity_id = ?",
+                (pet['id'], feed['id']), fetch=True
+            )[0]['count']
+            print(f"Feed progress tracked by events: {chef['current_progress']} (logged: {logged})")
+            backfill_achievement_progress()
+            chef = next(a for a in get_pet_achievements(pet['id']) if a['requirement_type'] == 'feed_count')
+            print(f"Feed progress after backfill: {chef['current_progress']}")
+            last_log = get_database().execute_query(
+                "SELECT * FROM activity_logs WHERE pet_id = ? ORDER BY id DESC LIMIT 1", (pet['id'],), fetch=True
+            )
+            status_before, status_after = decode_status_snapshots(last_log[0])
+            print(f"Last activity snapshot: hunger {status_before['hunger']} -> {status_after['hunger']}")
             
             # Test appointments
             print("\n--- Testing Appointments ---")
@@ -870,6 +3313,19 @@ if __name__ == '__main__':
             
             history = get_medical_history(pet['id'])
             print(f"Medical records: {len(history)}")
+            streamed = [dict(record) for record in iter_medical_history(pet['id'], chunk_size=1)]
+            assert streamed == history[:len(streamed)] and len(streamed) >= len(history)
+            logged = sum(1 for _ in iter_activity_logs(pet['id'], chunk_size=7, records=True))
+            print(f"Streamed medical records: {len(streamed)}, activity logs: {logged}")
+            
+            paged_ids = []
+            cursor = {}
+            while cursor is not None:
+                page, cursor = get_activity_log_page(pet['id'], page_size=4, records=True, **cursor)
+                paged_ids.extend(row['id'] for row in page)
+            expected = sorted(iter_activity_logs(pet['id']), key=lambda row: (row['performed_at'], row['id']), reverse=True)
+            assert paged_ids == [row['id'] for row in expected]
+            print(f"Paged activity logs: {len(paged_ids)} rows in pages of 4")
             
             # Test reminders
             print("\n--- Testing Reminders ---")
@@ -883,13 +3339,232 @@ if __name__ == '__main__':
             active_reminders = get_active_reminders(pet['id'])
             print(f"Active reminders: {len(active_reminders)}")
             
+            # Test bulk writes
+            print("\n--- Testing Bulk Writes ---")
+            feed = get_database().execute_query("SELECT id FROM activities WHERE name = 'Feed Pet'", fetch=True)
+            ingested = ingest_activity_logs(
+                {'pet_id': pet['id'], 'activity_id': feed[0]['id'], 'experience_gained': 0}
+                for _ in range(250)
+            )
+            print(f"Activity logs ingested: {ingested}")
+            counted = get_activity_counts(pet['id'])['Feed Pet']['count']
+            rebuild_activity_counters()
+            print(f"Trigger-maintained counters match a rebuild: {counted == get_activity_counts(pet['id'])['Feed Pet']['count']}")
+            print(f"Duplicate activities skipped: {get_database().bulk_insert('activities', [{'name': 'Feed Pet'}], on_conflict='ignore') == 0}")
+            
+            # Test the write-behind pet state cache
+            print("\n--- Testing Pet State Cache ---")
+            state = pet_state_cache.load(pet['id'])
+            stored = get_database().execute_query("SELECT hunger FROM pet WHERE id = ?", (pet['id'],), fetch=True)
+            for _ in range(50):
+                state['hunger'] = max(0, state['hunger'] - 1)
+            unchanged = get_database().execute_query("SELECT hunger FROM pet WHERE id = ?", (pet['id'],), fetch=True)
+            assert unchanged[0]['hunger'] == stored[0]['hunger']
+            written = pet_state_cache.flush()
+            flushed = get_database().execute_query("SELECT hunger FROM pet WHERE id = ?", (pet['id'],), fetch=True)
+            assert flushed[0]['hunger'] == state['hunger']
+            print(f"50 ticks, {written} pet written on flush: hunger {stored[0]['hunger']} -> {state['hunger']}")
+            fed = perform_activity("Feed Pet", pet['id'])
+            assert state['hunger'] == fed['hunger'] and not state.dirty
+            print(f"Cache synced after activity: hunger {state['hunger']}")
+            pet_state_cache.evict(pet['id'])
+            
+            # Test offline decay catch-up against the tick-by-tick loop
+            print("\n--- Testing Offline Decay ---")
+            import random
+            rng = random.Random(17)
+            for _ in range(500):
+                stats = {stat: rng.randint(0, 100) for stat in DECAYING_STATS + ('health',)}
+                stats['neglect_timer'] = rng.choice([0, 0, 5, 30, 55, 60, 200])
+                ticks = rng.randint(0, 300)
+                looped = stats
+                for _ in range(ticks):
+                    looped = decay_tick(looped)
+                assert decay_pet_stats(stats, ticks) == looped, (stats, ticks)
+            week = decay_pet_stats(dict(state, neglect_timer=0), 7 * 24 * 3600)
+            print(f"Closed form matches 500 tick loops; a week alone leaves health {week['health']}")
+            
+            get_database().execute_query(
+                "UPDATE pet SET updated_at = datetime('now', '-90 seconds') WHERE id = ?", (pet['id'],)
+            )
+            stored = get_database().execute_query("SELECT * FROM pet WHERE id = ?", (pet['id'],), fetch=True)
+            expected = decay_pet_stats(dict(stored[0]), 90)
+            caught_up = advance_pet_to_now(pet['id'])
+            assert all(caught_up[field] == expected[field] for field in DECAYING_STATS + ('health', 'neglect_timer'))
+            print(f"90s offline: hunger {stored[0]['hunger']} -> {caught_up['hunger']}, "
+                  f"health {stored[0]['health']} -> {caught_up['health']}")
+            
+            # Test transactions
+            print("\n--- Testing Transactions ---")
+            database = get_database()
+            try:
+                with database.transaction():
+                    save_chat_message("Rolled back", "Never saved", pet['id'])
+                    raise RuntimeError("abort")
+            except RuntimeError:
+                pass
+            with database.transaction():
+                save_chat_message("Outer", "Kept", pet['id'])
+                try:
+                    with database.transaction():
+                        save_chat_message("Inner", "Rolled back to savepoint", pet['id'])
+                        raise RuntimeError("abort inner")
+                except RuntimeError:
+                    pass
+            messages = [chat['user_message'] for chat in get_recent_chats(pet['id'], limit=50)]
+            print(f"Rollback discarded writes: {'Rolled back' not in messages}")
+            print(f"Savepoint kept outer write only: {'Outer' in messages and 'Inner' not in messages}")
+            
+            # Test pooled connections
+            print("\n--- Testing Connection Pool ---")
+            pooled = DatabaseManager(db.db_path, pool_size=4)
+            counts = []
+            
+            def read_chats():
+                rows = pooled.execute_query(
+                    "SELECT COUNT(*) AS count FROM ai_chathistory WHERE pet_id = ?",
+                    (pet['id'],), fetch=True
+                )
+                counts.append(rows[0]['count'])
+            
+            workers = [threading.Thread(target=read_chats) for _ in range(8)]
+            for worker in workers:
+                worker.start()
+            pooled.execute_query(
+                """INSERT INTO ai_chathistory (pet_id, user_id, user_message, ai_response) 
+                   VALUES (?, ?, ?, ?)""",
+                (pet['id'], 1, "Are you there?", "Woof!")
+            )
+            for worker in workers:
+                worker.join()
+            print(f"Concurrent reads: {len(counts)}, pooled connections: {len(pooled.read_pool._connections)}")
+            pooled.close()
+            
+            # Test rollups
+            print("\n--- Testing Rollups ---")
+            feed_id = get_activity_catalog().by_name['Feed Pet']['id']
+            healthy = dict(health=95, hunger=70, happiness=80, energy=70, cleanliness=85, experience=0)
+            ingest_activity_logs([
+                {'pet_id': pet['id'], 'activity_id': feed_id, 'experience_gained': 10,
+                 'performed_at': f"{datetime.fromordinal(datetime.now(timezone.utc).toordinal() - days_ago):%Y-%m-%d} {hour:02d}:00:00",
+                 'status_before': healthy, 'status_after': healthy}
+                for days_ago in range(30, 22, -1) for hour in (9, 18)
+            ])
+            processed = refresh_rollups()
+            print(f"Rows rolled up: {processed}, second pass: {refresh_rollups()}")
+            daily = get_stat_rollups(pet['id'], since='2000-01-01')
+            print(f"Daily buckets: {len(daily)}, first day: min/avg/max health "
+                  f"{daily[0]['min_health']}/{daily[0]['avg_health']}/{daily[0]['max_health']} over {daily[0]['samples']} samples")
+            hourly_feeds = sum(row['count'] for row in get_activity_rollups(pet['id'], granularity='hour') 
+                               if row['activity'] == 'Feed Pet')
+            print(f"Hourly rollups count every feed: {hourly_feeds == get_activity_counts(pet['id'])['Feed Pet']['count']}")
+            print(f"Health streak: {get_stat_streak(pet['id'], 'health', 90)}")
+            streaks = {a['achievement_name']: a['is_unlocked'] for a in get_pet_achievements(pet['id'])}
+            print(f"Streak achievements unlocked: Healthy Pet {bool(streaks['Healthy Pet'])}, Clean Freak {bool(streaks['Clean Freak'])}")
+            pruned = prune_activity_logs(keep_days=20)
+            print(f"Raw logs pruned: {pruned}, daily rollups kept: {len(get_stat_rollups(pet['id'])) == len(daily)}")
+            
+            # Test online backup while another thread keeps writing
+            print("\n--- Testing Backup ---")
+            import tempfile
+            with tempfile.TemporaryDirectory() as backup_dir:
+                writing = threading.Event()
+                writing.set()
+                
+                def keep_feeding():
+                    while writing.is_set():
+                        perform_activity("Feed Pet", pet['id'])
+                
+                feeder = threading.Thread(target=keep_feeding)
+                feeder.start()
+                steps = []
+                backup_path = backup_database(Path(backup_dir) / "backup.db", pages=4, 
+                                              progress=lambda status, remaining, total: steps.append(remaining))
+                writing.clear()
+                feeder.join()
+                print(f"Backup written in {len(steps)} steps: {backup_path is not None}")
+                
+                snapshot = get_database().snapshot(Path(backup_dir) / "snapshot.db")
+                live_logs = get_database().execute_query("SELECT COUNT(*) FROM activity_logs", fetch=True)[0][0]
+                snapshot_logs = snapshot.execute("SELECT COUNT(*) FROM activity_logs").fetchone()[0]
+                print(f"Snapshot matches live database: {snapshot_logs == live_logs}")
+                print(f"Snapshot integrity: {snapshot.execute('PRAGMA quick_check').fetchone()[0]}")
+                try:
+                    snapshot.execute("DELETE FROM activity_logs")
+                    print("Snapshot is read-only: False")
+                except sqlite3.Error:
+                    print("Snapshot is read-only: True")
+                snapshot.close()
+            
+            # Test the archive tier
+            print("\n--- Testing Archive Tier ---")
+            close_database()
+            with tempfile.TemporaryDirectory() as archive_dir:
+                init_database(Path(archive_dir) / "petpal.db", archive_path=Path(archive_dir) / "petpal.archive.db")
+                archived_pet = get_or_create_pet()
+                for days_ago in (400, 300, 200, 100, 10, 1):
+                    get_database().execute_query(
+                        """INSERT INTO ai_chathistory (pet_id, user_id, user_message, ai_response, timestamp) 
+                           VALUES (?, 1, ?, 'Woof!', datetime('now', ?))""",
+                        (archived_pet['id'], f"{days_ago} days ago", f"-{days_ago} days")
+                    )
+                moved = archive_history(90)
+                hot = get_database().execute_query("SELECT COUNT(*) FROM main.ai_chathistory", fetch=True)[0][0]
+                print(f"Archived: {moved}, hot rows left: {hot}")
+                recent = [chat['user_message'] for chat in get_recent_chats(archived_pet['id'], limit=2)]
+                print(f"Recent chats stay in the hot table: {recent == ['1 days ago', '10 days ago']}")
+                everything = [chat['user_message'] for chat in get_recent_chats(archived_pet['id'], limit=10)]
+                print(f"Older chats read through the archive: {len(everything) == 6 and everything[-1] == '400 days ago'}")
+                paged = []
+                cursor = {}
+                while cursor is not None:
+                    page, cursor = get_chat_page(archived_pet['id'], page_size=4, **cursor)
+                    paged += [chat['user_message'] for chat in page]
+                print(f"Pages cross into the archive: {paged == everything}")
+                print(f"Streamed history includes the archive: {len(list(iter_chat_history(archived_pet['id']))) == 6}")
+                close_database()
+            
+            # Test sharded mode
+            print("\n--- Testing Sharded Mode ---")
+            with tempfile.TemporaryDirectory() as shard_dir:
+                router = init_sharded_database(shard_dir, shards=2)
+                sharded_pets = {user_id: get_or_create_pet(user_id) for user_id in range(1, 6)}
+                for user_id, sharded_pet in sharded_pets.items():
+                    save_chat_message(f"Hi from user {user_id}", "Woof!", pet_id=sharded_pet['id'], user_id=user_id)
+                    perform_activity("Feed Pet", sharded_pet['id'])
+                print(f"Pet ids unique across shards: {len({p['id'] for p in sharded_pets.values()}) == 5}")
+                print(f"Shard sizes: {[size['pets'] for size in router.shard_sizes()]}")
+                
+                moves = router.rebalance(3)
+                print(f"Rebalanced onto 3 shards: {len(moves)} users moved, sizes {[size['pets'] for size in router.shard_sizes()]}")
+                resolved = all(
+                    get_recent_chats(sharded_pet['id'])[0]['user_message'] == f"Hi from user {user_id}"
+                    and get_activity_counts(sharded_pet['id'])['Feed Pet']['count'] == 1
+                    for user_id, sharded_pet in sharded_pets.items()
+                )
+                print(f"Chats and counters follow moved pets: {resolved}")
+                print(f"Shard integrity: {router.map_shards(SHARD_MAINTENANCE['integrity'])}")
+                close_database()
+            
             print("\n--- Database Test Complete ---")
             
         else:
-            print("Usage: python db.py [init|reset|test]")
+            print("Usage: python db.py [init|migrate|profile|explain|rebuild-counters|compact-logs|export|backfill-achievements|rebuild-search|rollups|archive|backup|shards|reset|test]")
     else:
         print("Database module loaded.")
         print("Commands:")
         print("  python db.py init  - Initialize database")
+        print("  python db.py migrate - Apply pending schema migrations")
+        print("  python db.py profile [name] - Show the active performance profile")
+        print("  python db.py explain - Show query plans for the helper lookups")
+        print("  python db.py rebuild-counters - Recompute per-pet activity counters from the logs")
+        print("  python db.py compact-logs - Convert legacy JSON activity snapshots to compact columns")
+        print("  python db.py export <table> [file.csv] - Stream a table to a CSV file")
+        print("  python db.py backfill-achievements - Rebuild achievement progress from the counters")
+        print("  python db.py rebuild-search - Rebuild the full-text chat search index")
+        print("  python db.py rollups [--prune DAYS] - Update hourly/daily stat rollups, optionally pruning raw logs")
+        print("  python db.py archive [days] [--vacuum] - Move old chats and activity logs to the archive tier")
+        print("  python db.py backup <dest> [pages] - Copy the live database without blocking writers")
+        print("  python db.py shards <directory> <command> [shards] - Sharded-mode status, parallel maintenance and rebalancing")
         print("  python db.py reset - Reset database")
         print("  python db.py test  - Test database operations")
\ No newline at end of file
@@ -1,60 +1,45 @@
 import sqlite3
 
-# Connect to both databases
-main_conn = sqlite3.connect("petpal_game.db")
-secondary_conn = sqlite3.connect("appointments_medical.db")
+from db import DatabaseManager
 
-main_cursor = main_conn.cursor()
-secondary_cursor = secondary_conn.cursor()
-
-# --- Ensure tables exist in main DB (create if needed)
-main_cursor.execute("""
-CREATE TABLE IF NOT EXISTS appointments (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    pet_id INTEGER,
-    appointment_type TEXT,
-    date TEXT,
-    notes TEXT
-)
-""")
-
-main_cursor.execute("""
-CREATE TABLE IF NOT EXISTS medical_records (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    pet_id INTEGER NOT NULL,
-    record_type TEXT NOT NULL,
-    diagnosis TEXT,
-    treatment TEXT,
-    medications TEXT,
-    veterinarian TEXT,
-    visit_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    follow_up_date TIMESTAMP,
-    notes TEXT,
-    attachments TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    FOREIGN KEY (pet_id) REFERENCES pet (id)
-)
-""")
+# Connect to both databases (DatabaseManager creates any missing tables in the main DB)
+main_db = DatabaseManager("petpal_game.db")
+secondary_conn = sqlite3.connect("appointments_medical.db")
+secondary_conn.row_factory = sqlite3.Row
+
+# Older appointment exports used 'date' instead of 'appointment_date'
+COLUMN_RENAMES = {
+    "appointments": {"date": "appointment_date"},
+    "medical_records": {},
+}
+
+def merge_table(table, batch_size=1000):
+    """Copy every row of a table from the secondary DB into the main DB"""
+    cursor = secondary_conn.execute(f"SELECT * FROM {table}")
+    renames = COLUMN_RENAMES[table]
+    # Let the main DB assign fresh ids so merged rows can't collide with existing ones
+    columns = [renames.get(col[0], col[0]) for col in cursor.description if col[0] != "id"]
+
+    merged = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        batch = [
+            {renames.get(key, key): row[key] for key in row.keys() if key != "id"}
+            for row in rows
+        ]
+        count = main_db.bulk_insert(table, batch, columns=columns, batch_size=batch_size)
+        if count is None:
+            raise RuntimeError(f"Could not merge {table}")
+        merged += count
+    return merged
 
 # --- Copy data over
-secondary_cursor.execute("SELECT * FROM appointments")
-appointments = secondary_cursor.fetchall()
-
-secondary_cursor.execute("SELECT * FROM medical_records")
-medical = secondary_cursor.fetchall()
-
-# Insert into main DB
-if appointments:
-    main_cursor.executemany("INSERT INTO appointments VALUES (?, ?, ?, ?, ?)", appointments)
-
-if medical:
-    main_cursor.executemany("""
-        INSERT INTO medical_records 
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    """, medical)
+appointments = merge_table("appointments")
+medical = merge_table("medical_records")
 
-main_conn.commit()
-print("✅ Data merged successfully!")
+print(f"✅ Data merged successfully! ({appointments} appointments, {medical} medical records)")
 
-main_conn.close()
+main_db.close()
 secondary_conn.close()
@@ -0,0 +1,161 @@
+"""
+Vectorized decay for every pet in the database.
+
+PetPopulation keeps the decaying stats of many pets in contiguous NumPy
+arrays and applies the pet_simulation rules to all of them in one step:
+
+    population = PetPopulation.load()
+    events = population.step(60)      # one simulated minute for every pet
+    population.flush()                # write changed pets back
+
+load() first catches every pet up on the decay owed since its updated_at,
+and the population keeps a simulated clock that step() advances; flush()
+stamps the rows with that clock, so the app's advance_pet_to_now neither
+repeats nor skips the simulated time.
+
+NumPy is only needed by this module; the game and db.py run without it.
+Pets that are also held by db.pet_state_cache (i.e. on screen in the app)
+are best left to the cache, since both write the same rows.
+"""
+
+import time
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed for server-side ticking
+    np = None
+
+import db
+from pet_simulation import (
+    DECAY_TICK_SECONDS, DECAYING_STATS, FRESH_STATS, NEGLECT_DAMAGE, NEGLECT_GRACE, NEGLECT_STEP,
+    NEGLECT_THRESHOLD, RECOVERY, SICK_HEALTH,
+)
+
+# Columns held per pet, in array row order
+POPULATION_FIELDS = DECAYING_STATS + ('health', 'neglect_timer')
+
+
+class PetPopulation:
+    """Stats of many pets as one (field x pet) int64 array, stepped all at once"""
+
+    def __init__(self, ids, stats, clock=None):
+        if np is None:
+            raise ImportError("PetPopulation requires numpy (pip install numpy)")
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.stats = np.ascontiguousarray(stats, dtype=np.int64).reshape(len(POPULATION_FIELDS), len(self.ids))
+        # Values as last read from / written to the database, for flush()
+        self._stored = self.stats.copy()
+        # Unix time the stats are current as of; written back as updated_at
+        self.clock = int(time.time()) if clock is None else clock
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, field):
+        """The array of one field for every pet (a view; writes go into the population)"""
+        return self.stats[POPULATION_FIELDS.index(field)]
+
+    @classmethod
+    def load(cls, database=None, chunk_size=50000, now=None):
+        """Read every pet's stats, streaming the pet table chunk by chunk
+
+        Each pet is caught up to now (any SQLite time value, default the
+        current time) on the decay owed since its row was last written.
+        """
+        database = database or db.get_database()
+        clock = database.execute_query("SELECT CAST(strftime('%s', COALESCE(?, 'now')) AS INTEGER)",
+                                       (now,), fetch=True)[0][0]
+        columns = ', '.join(f"COALESCE({field}, 0)" for field in POPULATION_FIELDS)
+        chunks = []
+        rows = []
+        for row in database.iter_query(
+                f"""SELECT id, {columns},
+                           MAX(0, COALESCE(? - CAST(strftime('%s', updated_at) AS INTEGER), 0))
+                    FROM pet ORDER BY id""",
+                (clock,), chunk_size=chunk_size, records=True):
+            rows.append(row)
+            if len(rows) == chunk_size:
+                chunks.append(np.array(rows, dtype=np.int64))
+                rows = []
+        if rows or not chunks:
+            chunks.append(np.array(rows, dtype=np.int64).reshape(-1, len(POPULATION_FIELDS) + 2))
+        table = np.concatenate(chunks)
+        population = cls(table[:, 0], table[:, 1:-1].T, clock=clock)
+        # _stored keeps the row values, so flush() writes the caught-up pets
+        population.catch_up(table[:, -1])
+        return population
+
+    def catch_up(self, elapsed):
+        """Apply the decay owed for elapsed seconds (one value per pet) without moving the clock"""
+        self._decay(np.asarray(elapsed, dtype=np.int64) // DECAY_TICK_SECONDS)
+
+    def step(self, ticks=1, reset_dead=False):
+        """Advance every pet by `ticks` decay ticks; returns {'sick': ids, 'game_over': ids}
+
+        Vectorized form of pet_simulation.decay_pet_stats, so the cost
+        depends on the number of pets, not on the number of ticks.
+        """
+        self.clock += ticks * DECAY_TICK_SECONDS
+        return self._decay(ticks, reset_dead)
+
+    def _decay(self, ticks, reset_dead=False):
+        """step() without moving the clock; ticks may be one count per pet"""
+        decaying = self.stats[:len(DECAYING_STATS)]
+        health = self['health']
+        timer = self['neglect_timer']
+
+        lowest = decaying.min(axis=0)
+        cared = np.clip(lowest - NEGLECT_THRESHOLD, 0, ticks)
+        neglected = ticks - cared
+
+        np.subtract(decaying, ticks, out=decaying)
+        np.maximum(decaying, 0, out=decaying)
+
+        was_cared = cared > 0
+        timer[was_cared] = 0
+        health[:] = np.where(was_cared, np.minimum(100, health + RECOVERY * cared), health)
+
+        # Neglected tick j (from 1) leaves the timer at timer + j * NEGLECT_STEP
+        first_damaging = np.maximum(1, -((timer - NEGLECT_GRACE) // NEGLECT_STEP))
+        damaging = np.maximum(0, neglected - first_damaging + 1)
+        np.maximum(health - NEGLECT_DAMAGE * damaging, 0, out=health)
+        timer += NEGLECT_STEP * neglected
+
+        dead = health <= 0
+        events = {
+            'sick': self.ids[(health < SICK_HEALTH) & ~dead],
+            'game_over': self.ids[dead],
+        }
+        if reset_dead and dead.any():
+            for index, field in enumerate(POPULATION_FIELDS):
+                self.stats[index, dead] = FRESH_STATS[field]
+        return events
+
+    def flush(self, database=None, batch_size=10000):
+        """Write pets whose stats changed since the last load/flush; returns the number written"""
+        database = database or db.get_database()
+        changed = self.changed()
+        if not len(changed):
+            return 0
+
+        query = f"""UPDATE pet SET {', '.join(f'{field} = ?' for field in POPULATION_FIELDS)},
+                    updated_at = datetime(?, 'unixepoch') WHERE id = ?"""
+        written = 0
+        with database.transaction():
+            for start in range(0, len(changed), batch_size):
+                batch = changed[start:start + batch_size]
+                # tolist() turns numpy integers into Python ints sqlite3 can bind
+                clock = np.full(len(batch), self.clock, dtype=np.int64)
+                params = np.vstack([self.stats[:, batch], clock, self.ids[batch]]).T.tolist()
+                database.execute_many(query, params)
+                written += len(batch)
+        self.mark_written(changed)
+        return written
+
+    def changed(self):
+        """Indexes of the pets whose stats changed since the last load/flush"""
+        return np.flatnonzero((self.stats != self._stored).any(axis=0))
+
+    def mark_written(self, indexes):
+        """Record that the pets at indexes now match their database rows"""
+        self._stored[:, indexes] = self.stats[:, indexes]
@@ -0,0 +1,198 @@
+"""
+Headless PetPal gameplay rules.
+
+PetSimulation holds a pet's stats and applies the same decay, neglect and
+action rules as the Tk game, with no display or database required:
+
+    sim = PetSimulation(auto_reset=True)
+    sim.apply_action("Feed")
+    sim.step(3600)   # one simulated hour, in O(1)
+
+db.py uses decay_tick/decay_pet_stats to catch pets up on offline time,
+and PetCareApp is a view over a PetSimulation.
+"""
+
+# Decay rules of the gameplay loop, which runs one tick per second
+DECAY_TICK_SECONDS = 1
+DECAYING_STATS = ('hunger', 'energy', 'cleanliness', 'happiness')
+NEGLECT_THRESHOLD = 50  # any decaying stat below this means the pet is neglected
+NEGLECT_STEP = 5        # neglect_timer increase per neglected tick
+NEGLECT_GRACE = 60      # neglect_timer value from which health starts dropping
+NEGLECT_DAMAGE = 5      # health lost per neglected tick past the grace period
+RECOVERY = 1            # health regained per cared-for tick
+
+# Stats of a brand new (or restarted) pet
+FRESH_STATS = {
+    'health': 100,
+    'hunger': 100,
+    'happiness': 100,
+    'energy': 100,
+    'cleanliness': 100,
+    'neglect_timer': 0,
+}
+
+# Care actions, matched by keyword in the action label: stat changes and
+# the scene shown while the action plays
+ACTIONS = {
+    'Feed': {'add': {'hunger': 20}, 'scene': 'eating'},
+    'Play': {'add': {'happiness': 15, 'energy': -10}, 'scene': 'playing'},
+    'Clean': {'set': {'cleanliness': 100}, 'scene': 'showering'},
+    'Sleep': {'set': {'energy': 100}, 'scene': 'sleeping'},
+}
+
+SICK_HEALTH = 50  # below this the pet shows as sick
+
+def decay_tick(stats):
+    """Apply one gameplay-loop decay tick to a stats dict; returns a new dict"""
+    result = dict(stats)
+    for stat in DECAYING_STATS:
+        result[stat] = max(0, stats[stat] - 1)
+
+    timer = stats.get('neglect_timer') or 0
+    health = stats['health']
+    if any(result[stat] < NEGLECT_THRESHOLD for stat in DECAYING_STATS):
+        timer += NEGLECT_STEP
+        if timer >= NEGLECT_GRACE:
+            health = max(0, health - NEGLECT_DAMAGE)
+    else:
+        timer = 0
+        health = min(100, health + RECOVERY)
+
+    result['neglect_timer'] = timer
+    result['health'] = health
+    return result
+
+def decay_pet_stats(stats, ticks):
+    """Apply `ticks` decay ticks at once; same result as calling decay_tick that many times
+
+    All decaying stats drop by one per tick, so the pet is cared for while
+    the lowest of them stays at or above NEGLECT_THRESHOLD and neglected
+    from then on. Each phase is a straight line, giving an O(1) update.
+    """
+    result = dict(stats)
+    if ticks <= 0:
+        return result
+
+    lowest = min(stats[stat] for stat in DECAYING_STATS)
+    cared = max(0, min(ticks, lowest - NEGLECT_THRESHOLD))
+    neglected = ticks - cared
+
+    for stat in DECAYING_STATS:
+        result[stat] = max(0, stats[stat] - ticks)
+
+    timer = stats.get('neglect_timer') or 0
+    health = stats['health']
+    if cared:
+        timer = 0
+        health = min(100, health + RECOVERY * cared)
+    if neglected:
+        # Neglected tick j (from 1) leaves the timer at timer + j * NEGLECT_STEP
+        first_damaging = max(1, -(-(NEGLECT_GRACE - timer) // NEGLECT_STEP))
+        damaging = max(0, neglected - first_damaging + 1)
+        health = max(0, health - NEGLECT_DAMAGE * damaging)
+        timer += NEGLECT_STEP * neglected
+
+    result['neglect_timer'] = timer
+    result['health'] = health
+    return result
+
+def _ticks_until_dead(stats):
+    """Decay ticks until health reaches 0, or None if it is at 0 and can't recover first
+
+    Health rises while the pet is cared for, then falls linearly once the
+    neglect timer passes the grace period, so this is closed form too.
+    """
+    cared = max(0, min(stats[stat] for stat in DECAYING_STATS) - NEGLECT_THRESHOLD)
+    health = min(100, stats['health'] + RECOVERY * cared)
+    if health <= 0:
+        return None
+    timer = 0 if cared else (stats.get('neglect_timer') or 0)
+    first_damaging = max(1, -(-(NEGLECT_GRACE - timer) // NEGLECT_STEP))
+    return cared + first_damaging - 1 + -(-health // NEGLECT_DAMAGE)
+
+
+class PetSimulation:
+    """A pet's stats advanced on a fixed one-tick-per-second timestep
+
+    state is a plain dict (or anything dict-like, such as db.PetState) and
+    is updated in place, so views and caches sharing it see every change.
+    Listeners added with subscribe() are called as listener(event, sim)
+    for 'action', 'step', 'sick', 'game_over' and 'reset'. 'sick' and
+    'game_over' fire on the tick health drops below SICK_HEALTH or to 0.
+    """
+
+    def __init__(self, state=None, auto_reset=False):
+        self.state = state if state is not None else dict(FRESH_STATS)
+        self.auto_reset = auto_reset
+        self.clock = 0.0        # simulated seconds
+        self._remainder = 0.0   # time not yet covered by a whole tick
+        self._listeners = []
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, event):
+        for listener in self._listeners:
+            listener(event, self)
+
+    def step(self, dt):
+        """Advance by dt seconds; returns the events raised ('sick', 'game_over'), in order
+
+        Whole ticks are applied with the closed-form decay, so one large
+        step costs the same as a single tick and raises the same events as
+        that many one-tick steps. With auto_reset the pet restarts on the
+        tick it dies and keeps decaying. Leftover time carries over to the
+        next step.
+        """
+        self.clock += dt
+        self._remainder += dt
+        ticks = int(self._remainder // DECAY_TICK_SECONDS)
+        if ticks <= 0:
+            return []
+        self._remainder -= ticks * DECAY_TICK_SECONDS
+
+        events = []
+        while ticks > 0:
+            # Run up to the tick the pet dies, if it's restarted then
+            dead_in = _ticks_until_dead(self.state) if self.auto_reset else None
+            run = ticks if dead_in is None else min(ticks, dead_in)
+            ticks -= run
+
+            # Health peaks at the end of the cared-for phase, then only falls
+            cared = max(0, min(run, min(self.state[stat] for stat in DECAYING_STATS) - NEGLECT_THRESHOLD))
+            peak = min(100, self.state['health'] + RECOVERY * cared)
+            self.state.update(decay_pet_stats(self.state, run))
+            health = self.state['health']
+            if peak >= SICK_HEALTH > health:
+                events.append('sick')
+                self._notify('sick')
+            if peak > 0 >= health:
+                events.append('game_over')
+                self._notify('game_over')
+                if self.auto_reset:
+                    self.reset()
+        self._notify('step')
+        return events
+
+    def apply_action(self, name):
+        """Apply a care action by label (e.g. "Feed" or "🍖 Feed"); returns its scene or None"""
+        for keyword, action in ACTIONS.items():
+            if keyword in name:
+                for stat, change in action.get('add', {}).items():
+                    self.state[stat] = max(0, min(100, self.state[stat] + change))
+                self.state.update(action.get('set', {}))
+                self._notify('action')
+                return action['scene']
+        return None
+
+    def reset(self):
+        """Restart with fresh stats"""
+        self.state.update(FRESH_STATS)
+        self._notify('reset')
+
+    def is_sick(self):
+        return self.state['health'] < SICK_HEALTH
+
+    def idle_scene(self):
+        """Scene to show when the player has been idle"""
+        return 'happy' if self.state.get('happiness', 100) > 50 else 'sad'
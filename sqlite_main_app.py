@@ -15,6 +15,8 @@ import db
 import ai_client
 from db import get_database, get_or_create_pet, save_chat_message
 from db import init_database, close_database
+from async_db import AsyncDatabase, TkDispatcher
+from pet_simulation import PetSimulation
 
 db_instance = init_database()
 atexit.register(close_database)
@@ -27,7 +29,11 @@ class PetCareApp:
         self.root = root
         self.decay_job = None
         self.current_pet_id = None
+        self.current_user_id = None
         self.setup_database() 
+        # Database writes run on a background thread; results come back via root.after
+        self.async_db = AsyncDatabase()
+        self.db_results = TkDispatcher(self.root)
 
         import customtkinter as ctk
         import tkinter as tk
@@ -45,13 +51,16 @@ class PetCareApp:
 
         # --- CORE DATA ---
         self.pet_data = {"id": 1, "name": "Buddy"}
+        # Gameplay rules live in the headless simulation; this class only draws it
+        self.simulation = PetSimulation()
         self.pet_status = {
             "health": 100,
             "hunger": 100,
             "happiness": 100,
             "energy": 100,
             "cleanliness": 100,
-            "level": 1
+            "level": 1,
+            "neglect_timer": 0
         }
         self.status_bars = {}
 
@@ -101,6 +110,15 @@ class PetCareApp:
         self.show_frame("login")
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
+    @property
+    def pet_status(self):
+        """The simulated pet's stats (shared with db.pet_state_cache once logged in)"""
+        return self.simulation.state
+
+    @pet_status.setter
+    def pet_status(self, state):
+        self.simulation.state = state
+
     def setup_window(self):
         import platform
         self.root.title("PetPal AI")
@@ -704,6 +722,10 @@ class PetCareApp:
                 "Logout": "login"
             }
             frame = mapping.get(selection, "gameplay")
+            if selection == "Logout" and self.current_pet_id is not None:
+                db.pet_state_cache.evict(self.current_pet_id)
+                self.current_pet_id = None
+                self.current_user_id = None
             self.show_frame(frame)
 
     # === login/pet ===
@@ -740,12 +762,12 @@ class PetCareApp:
 
 
         # Save/update pet in database
-        db = get_database()
+        database = get_database()
 
         # hash the password
         password_hash = hashlib.sha256(password.encode()).hexdigest()
 
-        user = db.execute_query("SELECT * FROM users WHERE username = ?", (username,), fetch=True)
+        user = database.execute_query("SELECT * FROM users WHERE username = ?", (username,), fetch=True)
         password = self.password_entry.get().strip()
 
         if user:
@@ -765,24 +787,24 @@ class PetCareApp:
                 return  # stop here if password doesn't match
 
             # password correct → update last login
-            db.execute_query("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?", (user_id,))
+            database.execute_query("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?", (user_id,))
 
         else:
             # new user → create with hashed password
             hashed_pw = hashlib.sha256(password.encode()).hexdigest()
-            user_id = db.execute_query(
+            user_id = database.execute_query(
                 "INSERT INTO users (username, password_hash) VALUES (?, ?)", 
                 (username, hashed_pw)
             )
             
        
         # Save or create pet
-        pet = db.execute_query("SELECT * FROM pet WHERE user_id = ?", (user_id,), fetch=True)
+        pet = database.execute_query("SELECT * FROM pet WHERE user_id = ?", (user_id,), fetch=True)
         if pet:
             pet_id = pet[0]["id"]
-            db.execute_query("UPDATE pet SET name = ? WHERE id = ?", (petname, pet_id))
+            database.execute_query("UPDATE pet SET name = ? WHERE id = ?", (petname, pet_id))
         else:
-            pet_id = db.execute_query(
+            pet_id = database.execute_query(
                 """INSERT INTO pet (user_id, name, species, breed, mood, health, hunger, happiness, energy, cleanliness)
                 VALUES (?, ?, 'dog', 'mixed', 'happy', 100, 100, 100, 100, 100)""",
                 (user_id, petname)
@@ -791,6 +813,12 @@ class PetCareApp:
         self.pet_data["id"] = pet_id
         self.pet_data["name"] = petname
         self.current_pet_id = pet_id  
+        self.current_user_id = user_id
+
+        # Stats live in the write-behind cache: ticks mutate it in memory and
+        # it is flushed periodically, on logout and at exit (close_database)
+        self.pet_status = db.pet_state_cache.load(pet_id)
+        db.pet_state_cache.start()
         self.current_username = username
         self.current_pet_name = petname
 
@@ -887,6 +915,11 @@ class PetCareApp:
             # Show pet response bubble
             self._add_message_bubble("pet", response)
 
+            # Save the exchange without blocking the UI on the write
+            self.db_results.deliver(
+                self.async_db.save_chat_message_async(msg, response, self.pet_data["id"], self.current_user_id)
+            )
+
     #=====appointmnets helpers=====
     def book_appointment(self):
         new_appt = self.selected_appt.get()
@@ -976,35 +1009,15 @@ class PetCareApp:
         FROM medical_records
         ORDER BY visit_date DESC
         """
-        records = self.db.execute_query(query, fetch=True)
-
-        for rec in records:
-            # Convert sqlite3.Row → tuple of column values
+        # Stream the rows so a long history never sits in memory as one list
+        for rec in self.db.iter_query(query, chunk_size=200, records=True):
             self.medical_tree.insert("", "end", values=tuple(rec))
         db = get_database()
         
     def setup_database(self):
-        """Ensure medical_records table exists using the shared DatabaseManager."""
-        db = get_database()
-        db.execute_query("""
-            CREATE TABLE IF NOT EXISTS medical_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                pet_id INTEGER NOT NULL,
-                record_type TEXT NOT NULL,
-                diagnosis TEXT,
-                treatment TEXT,
-                medications TEXT,
-                veterinarian TEXT,
-                visit_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                follow_up_date TIMESTAMP,
-                notes TEXT,
-                attachments TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (pet_id) REFERENCES pet (id)
-            )
-        """)
+        """Use the shared DatabaseManager (its migrations create medical_records)."""
         # Store this for convenience
-        self.db = db
+        self.db = get_database()
 
     def on_close(self):
         if hasattr(self, "db_connection"):
@@ -1085,11 +1098,7 @@ class PetCareApp:
 
     def show_idle_scene(self):
         """Called after user is idle for 5 seconds"""
-        # Decide scene based on pet stats (example: happiness threshold)
-        if self.pet_status.get("happiness", 100) > 50:
-            idle_scene = "happy"
-        else:
-            idle_scene = "sad"
+        idle_scene = self.simulation.idle_scene()
 
         if idle_scene in self.scenes:
             self.current_scene = idle_scene
@@ -1105,21 +1114,7 @@ class PetCareApp:
         print(f"Action performed: {action}")  # debug output
 
         # --- Update status values ---
-        if "Feed" in action:
-            self.pet_status["hunger"] = min(100, self.pet_status["hunger"] + 20)
-            new_scene = "eating"
-        elif "Play" in action:
-            self.pet_status["happiness"] = min(100, self.pet_status["happiness"] + 15)
-            self.pet_status["energy"] = max(0, self.pet_status["energy"] - 10)
-            new_scene = "playing"
-        elif "Clean" in action:
-            self.pet_status["cleanliness"] = 100
-            new_scene = "showering"
-        elif "Sleep" in action:
-            self.pet_status["energy"] = 100
-            new_scene = "sleeping"
-        else:
-            new_scene = "happy"
+        new_scene = self.simulation.apply_action(action) or "happy"
 
         # --- YOUR TWEAK: randomly switch mood to happy or sad for fun ---
         if new_scene not in ["eating", "playing", "showering", "sleeping"]:
@@ -1138,14 +1133,8 @@ class PetCareApp:
 
     def reset_game(self):
         """Restart game with fresh stats"""
-        self.pet_status = {
-            "health": 100,
-            "hunger": 100,
-            "happiness": 100,
-            "energy": 100,
-            "cleanliness": 100
-        }
-        self.neglect_timer = 0
+        # Updates in place, so a cached pet's reset is flushed like any other change
+        self.simulation.reset()
         self.current_scene = "happy"
         self.change_scene("happy")
         self.update_status_bars()
@@ -1163,33 +1152,17 @@ class PetCareApp:
 
     def start_status_decay(self):
         """Decay loop with health logic"""
-        self.neglect_timer = getattr(self, "neglect_timer", 0)  # track seconds
 
         def decay():
-            # Passive decay
-            self.pet_status["hunger"] = max(0, self.pet_status["hunger"] - 1)
-            self.pet_status["energy"] = max(0, self.pet_status["energy"] - 1)
-            self.pet_status["cleanliness"] = max(0, self.pet_status["cleanliness"] - 1)
-            self.pet_status["happiness"] = max(0, self.pet_status["happiness"] - 1)
-
-            # Check neglect conditions
-            critical_stats = ["hunger", "energy", "cleanliness", "happiness"]
-            neglected = any(self.pet_status[s] < 50 for s in critical_stats)
-
-            if neglected:
-                self.neglect_timer += 5  # seconds
-                if self.neglect_timer >= 60:  # 1 min neglected
-                    self.pet_status["health"] = max(0, self.pet_status["health"] - 5)
-            else:
-                self.neglect_timer = 0  # reset timer if cared
-                self.pet_status["health"] = min(100, self.pet_status["health"] + 1)
+            # Passive decay and neglect: one simulated second per tick
+            events = self.simulation.step(1.0)
 
-            # Sick logic
-            if self.pet_status["health"] < 50:
+            # Sick logic: 'sick' only fires as health drops, the scene stays while it lasts
+            if self.simulation.is_sick():
                 self.change_scene("sick")
 
             # Game over
-            if self.pet_status["health"] <= 0:
+            if "game_over" in events:
                 messagebox.showinfo("Game Over", "Your pet got too sick! Restarting...")
                 self.reset_game()
 
@@ -1289,6 +1262,8 @@ def main():
         def on_closing():
             try:
                 print("Closing application...")
+                app.db_results.close()
+                app.async_db.close()  # let queued writes finish first
                 db.close_database()
                 root.destroy()
             except Exception as e:
@@ -0,0 +1,381 @@
+"""
+Regression tests for the db.py helpers, each against a throwaway database.
+
+The broader smoke run is still `python db.py test`.
+"""
+
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    # reset/archive helpers use paths relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    database = db.init_database(tmp_path / "petpal.db")
+    yield database
+    db.close_database()
+
+
+@pytest.fixture
+def pet(database):
+    return db.get_or_create_pet()
+
+
+def test_decode_snapshots_of_page_helper_rows(pet):
+    db.perform_activity("Feed Pet", pet["id"])
+    for records in (False, True):
+        rows, _ = db.get_activity_log_page(pet["id"], records=records)
+        before, after = db.decode_status_snapshots(rows[0])
+        assert set(before) == set(db.SNAPSHOT_FIELDS)
+        assert after["hunger"] >= before["hunger"]
+
+
+@pytest.fixture
+def archived_database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    database = db.init_database(tmp_path / "petpal.db", archive_path=tmp_path / "petpal.archive.db")
+    yield database
+    db.close_database()
+
+
+def _chef_progress(pet_id):
+    return next(a["current_progress"] for a in db.get_pet_achievements(pet_id) if a["requirement_type"] == "feed_count")
+
+
+def test_rebuilding_counters_after_archiving_keeps_lifetime_totals(archived_database):
+    pet = db.get_or_create_pet()
+    for _ in range(3):
+        db.perform_activity("Feed Pet", pet["id"])
+    archived_database.execute_query("UPDATE activity_logs SET performed_at = datetime('now', '-200 days')")
+    db.perform_activity("Feed Pet", pet["id"])
+
+    assert db.archive_history(90)["activity_logs"] == 3
+    db.rebuild_activity_counters()
+    db.backfill_achievement_progress()
+
+    assert db.get_activity_counts(pet["id"])["Feed Pet"]["count"] == 4
+    assert _chef_progress(pet["id"]) == 4
+
+
+def test_rebuilding_counters_after_pruning_uses_rollups(database, pet):
+    for _ in range(3):
+        db.perform_activity("Feed Pet", pet["id"])
+    database.execute_query("UPDATE activity_logs SET performed_at = datetime('now', '-200 days')")
+    db.refresh_rollups()
+    db.perform_activity("Feed Pet", pet["id"])
+
+    assert db.prune_activity_logs(keep_days=30) == 3
+    db.rebuild_activity_counters()
+    db.backfill_achievement_progress()
+
+    counts = db.get_activity_counts(pet["id"])["Feed Pet"]
+    latest = database.execute_query("SELECT MAX(performed_at) FROM activity_logs", fetch=True)[0][0]
+    assert counts["count"] == 4
+    assert counts["last_performed_at"] == latest
+    assert _chef_progress(pet["id"]) == 4
+
+
+def _backdate(database, pet_id, seconds):
+    database.execute_query(
+        "UPDATE pet SET updated_at = datetime('now', ?) WHERE id = ?", (f"-{seconds} seconds", pet_id)
+    )
+
+
+def test_stat_writes_apply_offline_decay_first(database, pet):
+    db.update_pet_status(pet["id"], hunger=90, energy=90, cleanliness=90, happiness=90)
+    _backdate(database, pet["id"], 20)
+
+    updated = db.update_pet_status(pet["id"], hunger=100)
+    assert updated["hunger"] == 100
+    # two seconds of slack for a slow run
+    assert 68 <= updated["energy"] <= 70
+
+    _backdate(database, pet["id"], 20)
+    fed = db.perform_activity("Feed Pet", pet["id"])
+    assert 48 <= fed["energy"] - db.get_activity_catalog().by_name["Feed Pet"]["energy_effect"] <= 50
+
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    yield db.init_sharded_database(tmp_path / "shards", shards=2)
+    db.close_database()
+
+
+def test_cache_flush_commits_on_each_pets_shard(sharded):
+    pets = [db.get_or_create_pet(user_id) for user_id in (1, 2)]
+    shards = [sharded.for_pet(pet["id"]) for pet in pets]
+    assert shards[0] is not shards[1]
+    # The second shard refuses the write
+    shards[1].execute_query("CREATE TRIGGER no_updates BEFORE UPDATE ON pet BEGIN SELECT RAISE(ABORT, 'read-only'); END")
+
+    states = [db.pet_state_cache.load(pet["id"]) for pet in pets]
+    for state in states:
+        state["hunger"] = 7
+    assert db.pet_state_cache.flush() == 1
+
+    assert shards[0].execute_query("SELECT hunger FROM pet WHERE id = ?", (pets[0]["id"],), fetch=True)[0][0] == 7
+    assert states[0].dirty == set()
+    assert states[1].dirty == {"hunger"}
+
+    shards[1].execute_query("DROP TRIGGER no_updates")
+    assert db.pet_state_cache.flush() == 1
+    assert shards[1].execute_query("SELECT hunger FROM pet WHERE id = ?", (pets[1]["id"],), fetch=True)[0][0] == 7
+
+
+def test_execute_query_reports_rowcount(database, pet):
+    assert database.execute_query("UPDATE pet SET mood = mood", rowcount=True) == 1
+    assert database.execute_query("UPDATE pet SET mood = mood WHERE id = -1", rowcount=True) == 0
+    assert db.rebuild_activity_counters() == 0
+    db.perform_activity("Feed Pet", pet["id"])
+    assert db.rebuild_activity_counters() == 1
+
+
+def test_query_inside_iter_query_reuses_the_held_pool_connection(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    database = db.init_database(tmp_path / "pooled.db", pool_size=1)
+    try:
+        database.read_pool.timeout = 1
+        names = [
+            database.execute_query("SELECT name FROM pet WHERE id = ?", (row["id"],), fetch=True)[0][0]
+            for row in database.iter_query("SELECT id FROM pet")
+        ]
+        assert names == [db.get_or_create_pet()["name"]]
+
+        # Waiting on an exhausted pool ends in a clear error, not a hang
+        connection = database.read_pool.acquire()
+        with pytest.raises(sqlite3.OperationalError):
+            database.read_pool.acquire(timeout=0.01)
+        database.read_pool.release(connection)
+    finally:
+        db.close_database()
+
+
+@pytest.mark.skipif(not db.HAS_FTS5, reason="SQLite built without FTS5")
+def test_chat_index_is_built_when_fts5_becomes_available(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    monkeypatch.setattr(db, "HAS_FTS5", False)
+    database = db.init_database(tmp_path / "petpal.db")
+    db.save_chat_message("Shall we go for walks?", "Woof!", pet_id=1)
+    assert database.execute_query("SELECT 1 FROM sqlite_master WHERE name = 'ai_chathistory_fts'", fetch=True) == []
+    db.close_database()
+
+    monkeypatch.setattr(db, "HAS_FTS5", True)
+    db.init_database(tmp_path / "petpal.db")
+    try:
+        results = db.search_chats(1, "walk")
+        assert len(results) == 1
+        assert results[0]["rank"] is not None
+    finally:
+        db.close_database()
+
+
+def _pet_rows(database, table, pet_id):
+    return [tuple(row) for row in database.execute_query(
+        f"SELECT * FROM {table} WHERE pet_id = ? ORDER BY 1, 2, 3", (pet_id,), fetch=True
+    )]
+
+
+def test_moving_a_user_after_pruning_keeps_counters_and_rollups(sharded):
+    pet = db.get_or_create_pet(2)
+    source = sharded.for_pet(pet["id"])
+    for _ in range(3):
+        db.perform_activity("Feed Pet", pet["id"])
+    source.execute_query("UPDATE activity_logs SET performed_at = datetime('now', '-200 days')")
+    db.refresh_rollups(source)
+    assert db.prune_activity_logs(keep_days=30, database=source) == 3
+    db.perform_activity("Feed Pet", pet["id"])
+
+    counts = db.get_activity_counts(pet["id"])
+    db.refresh_rollups(source)
+    rollups = {table: _pet_rows(source, table, pet["id"]) for table in db.PET_AGGREGATE_TABLES}
+    target = 1 - sharded.shard_for_user(2)
+    assert sharded.move_user(2, target) == 1
+    destination = sharded.shards[target]
+
+    assert db.get_activity_counts(pet["id"]) == counts
+    assert counts["Feed Pet"]["count"] == 4
+    # Refreshing the destination must not fold the copied logs in a second time
+    db.refresh_rollups(destination)
+    for table, rows in rollups.items():
+        assert _pet_rows(destination, table, pet["id"]) == rows
+        assert _pet_rows(source, table, pet["id"]) == []
+
+
+@pytest.fixture
+def sharded_archive(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    (tmp_path / "shards").mkdir()
+    for index in range(2):
+        # An existing <shard>.archive.db is attached when the shard opens
+        (tmp_path / "shards" / f"shard_{index}.archive.db").touch()
+    yield db.init_sharded_database(tmp_path / "shards", shards=2)
+    db.close_database()
+
+
+def test_moving_a_user_takes_their_archived_rows(sharded_archive):
+    pet = db.get_or_create_pet(2)
+    source = sharded_archive.for_pet(pet["id"])
+    db.save_chat_message("old", "Woof!", pet_id=pet["id"], user_id=2)
+    db.perform_activity("Feed Pet", pet["id"])
+    source.execute_query("UPDATE ai_chathistory SET timestamp = datetime('now', '-200 days')")
+    source.execute_query("UPDATE activity_logs SET performed_at = datetime('now', '-200 days')")
+    assert db.archive_history(database=source) == {"ai_chathistory": 1, "activity_logs": 1}
+    db.save_chat_message("new", "Woof!", pet_id=pet["id"], user_id=2)
+
+    target = 1 - sharded_archive.shard_for_user(2)
+    sharded_archive.move_user(2, target)
+    destination = sharded_archive.shards[target]
+
+    assert [chat["user_message"] for chat in db.get_recent_chats(pet["id"])] == ["new", "old"]
+    assert len(_pet_rows(destination, "archive.activity_logs", pet["id"])) == 1
+    for table in db.ARCHIVE_TABLES:
+        assert _pet_rows(source, f"archive.{table}", pet["id"]) == []
+    # Archived and hot rows never share an id in the destination's view
+    ids = [row[0] for row in destination.execute_query("SELECT id FROM ai_chathistory_all", fetch=True)]
+    assert len(ids) == len(set(ids)) == 2
+
+
+def _pet_history(pet_id):
+    return (
+        db.get_activity_counts(pet_id),
+        db.get_stat_streak(pet_id, stat="hunger", threshold=0),
+        [(chat["user_message"], chat["timestamp"]) for chat in db.get_recent_chats(pet_id)],
+    )
+
+
+def test_rebalance_after_pruning_and_archiving_keeps_every_pets_history(sharded_archive):
+    pets = [db.get_or_create_pet(user_id)["id"] for user_id in range(1, 5)]
+    for user_id, pet_id in enumerate(pets, start=1):
+        db.save_chat_message("old", "Woof!", pet_id=pet_id, user_id=user_id)
+        for _ in range(3):
+            db.perform_activity("Feed Pet", pet_id)
+    for shard in sharded_archive.shards:
+        # Three consecutive days of logs, long enough ago to be archived and pruned
+        shard.execute_query("UPDATE activity_logs SET performed_at = datetime('now', '-' || (200 + id % 3) || ' days')")
+        shard.execute_query("UPDATE ai_chathistory SET timestamp = datetime('now', '-200 days')")
+        db.refresh_rollups(shard)
+        db.archive_history(database=shard)
+        assert db.prune_activity_logs(keep_days=30, database=shard) > 0
+    for user_id, pet_id in enumerate(pets, start=1):
+        db.perform_activity("Feed Pet", pet_id)
+        db.save_chat_message("new", "Woof!", pet_id=pet_id, user_id=user_id)
+    # Streaks read the rollups, which a move refreshes
+    sharded_archive.map_shards(db.refresh_rollups)
+
+    before = {pet_id: _pet_history(pet_id) for pet_id in pets}
+    assert before[pets[0]][0]["Feed Pet"]["count"] == 4
+    assert before[pets[0]][1]["longest"] == 3
+    assert sharded_archive.rebalance(3)
+    assert {pet_id: _pet_history(pet_id) for pet_id in pets} == before
+
+
+def test_interleaved_iter_queries_keep_their_pooled_connection(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    database = db.init_database(tmp_path / "pooled.db", pool_size=2)
+    try:
+        database.read_pool.timeout = 1
+        first = database.iter_query("SELECT id FROM activities ORDER BY id", chunk_size=1)
+        second = database.iter_query("SELECT id FROM activities ORDER BY id", chunk_size=1)
+        next(first)
+        next(second)
+        shared = database.read_pool._held.connection
+        # The first generator finishing must not hand back the connection the second still reads
+        list(first)
+        other = []
+        worker = threading.Thread(target=lambda: other.append(database.read_pool.acquire(timeout=0.1)))
+        worker.start()
+        worker.join()
+        assert other and other[0] is not shared
+        database.read_pool.release(other[0])
+        assert len(list(second)) == len(database.execute_query("SELECT id FROM activities", fetch=True)) - 1
+        assert database.read_pool._idle.qsize() == 2
+    finally:
+        db.close_database()
+
+
+def test_iter_query_streams_an_in_memory_database():
+    database = db.DatabaseManager(":memory:")
+    try:
+        expected = [tuple(row) for row in database.execute_query("SELECT id, name FROM activities ORDER BY id", fetch=True)]
+        assert expected
+        streamed = database.iter_query("SELECT id, name FROM activities ORDER BY id", chunk_size=2, records=True)
+        assert [tuple(row) for row in streamed] == expected
+    finally:
+        database.close()
+
+
+def test_pooled_iter_query_leaves_writes_free_and_transactions_see_their_own_rows(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    database = db.init_database(tmp_path / "pooled.db", pool_size=1)
+    try:
+        total = len(database.execute_query("SELECT id FROM activities", fetch=True))
+        streamed = database.iter_query("SELECT id FROM activities ORDER BY id", chunk_size=1)
+        next(streamed)
+        # An open export reads a pooled snapshot and never holds the write lock
+        writer = threading.Thread(target=database.execute_query,
+                                  args=("UPDATE activities SET description = description",))
+        writer.start()
+        writer.join(timeout=1)
+        assert not writer.is_alive()
+        assert len(list(streamed)) == total - 1
+
+        with pytest.raises(RuntimeError), database.transaction():
+            database.execute_query("INSERT INTO activities (name, description) VALUES ('Streamed', 'uncommitted')")
+            names = [row["name"] for row in database.iter_query("SELECT name FROM activities", chunk_size=2)]
+            assert len(names) == total + 1 and "Streamed" in names
+            raise RuntimeError("roll back")
+        assert len(database.execute_query("SELECT id FROM activities", fetch=True)) == total
+    finally:
+        db.close_database()
+
+
+@pytest.mark.skipif(not db.HAS_FTS5, reason="SQLite built without FTS5")
+def test_searches_do_not_reread_the_schema(database, pet):
+    db.save_chat_message("Shall we go for walks?", "Woof!", pet_id=pet["id"])
+    statements = []
+    database.connection.set_trace_callback(statements.append)
+    try:
+        for _ in range(3):
+            assert len(db.search_chats(pet["id"], "walk")) == 1
+    finally:
+        database.connection.set_trace_callback(None)
+    assert statements and not any("sqlite_master" in statement for statement in statements)
+
+
+def test_pets_without_archived_rows_skip_the_archive_view(archived_database):
+    old_pet = db.get_or_create_pet()
+    db.save_chat_message("old", "Woof!", pet_id=old_pet["id"])
+    archived_database.execute_query("UPDATE ai_chathistory SET timestamp = datetime('now', '-200 days')")
+    assert db.archive_history(database=archived_database)["ai_chathistory"] == 1
+    new_pet = db.get_or_create_pet(2)
+    db.save_chat_message("new", "Woof!", pet_id=new_pet["id"], user_id=2)
+
+    statements = []
+    archived_database.connection.set_trace_callback(statements.append)
+    try:
+        assert [chat["user_message"] for chat in db.get_recent_chats(new_pet["id"])] == ["new"]
+        assert [chat["user_message"] for chat in db.get_chat_page(new_pet["id"])[0]] == ["new"]
+    finally:
+        archived_database.connection.set_trace_callback(None)
+    assert not any("ai_chathistory_all" in statement for statement in statements)
+
+    assert [chat["user_message"] for chat in db.get_recent_chats(old_pet["id"])] == ["old"]
+    assert [chat["user_message"] for chat in db.get_chat_page(old_pet["id"])[0]] == ["old"]
@@ -0,0 +1,43 @@
+"""
+PetPopulation against a throwaway database; skipped without numpy.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import db  # noqa: E402
+from pet_population import PetPopulation  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    database = db.init_database(tmp_path / "petpal.db")
+    yield database
+    db.close_database()
+
+
+def test_load_catches_up_and_flush_stamps_the_simulated_clock(database):
+    database.execute_query(
+        "UPDATE pet SET hunger = 90, energy = 90, cleanliness = 90, happiness = 90, "
+        "updated_at = '2026-01-01 11:59:30' WHERE id = 1"
+    )
+    now = "2026-01-01 12:00:00"
+
+    population = PetPopulation.load(now=now)
+    assert population["hunger"].tolist() == [60]
+
+    population.step(10)
+    assert population.flush() == 1
+    row = database.execute_query("SELECT hunger, updated_at FROM pet WHERE id = 1", fetch=True)[0]
+    assert tuple(row) == (50, "2026-01-01 12:00:10")
+
+    # Reloading at the stamped time owes nothing more
+    assert PetPopulation.load(now="2026-01-01 12:00:10")["hunger"].tolist() == [50]
@@ -0,0 +1,50 @@
+"""
+PetSimulation: one large step must behave like that many one-tick steps.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from pet_simulation import FRESH_STATS, PetSimulation, decay_tick  # noqa: E402
+
+STARTS = [
+    dict(FRESH_STATS),
+    dict(FRESH_STATS, hunger=40, health=55, neglect_timer=50),
+    dict(FRESH_STATS, hunger=70, energy=52, health=20),
+    dict(FRESH_STATS, hunger=0, health=0),
+]
+
+
+@pytest.mark.parametrize("auto_reset", [False, True])
+@pytest.mark.parametrize("start", STARTS)
+@pytest.mark.parametrize("ticks", [1, 7, 180, 600])
+def test_step_n_matches_n_single_steps(start, auto_reset, ticks):
+    single = PetSimulation(dict(start), auto_reset=auto_reset)
+    events = []
+    for _ in range(ticks):
+        events += single.step(1)
+
+    batch = PetSimulation(dict(start), auto_reset=auto_reset)
+    assert batch.step(ticks) == events
+    assert batch.state == single.state
+
+
+@pytest.mark.parametrize("start", STARTS)
+def test_step_follows_the_per_tick_rules(start):
+    expected = dict(start)
+    for _ in range(180):
+        expected = decay_tick(expected)
+    sim = PetSimulation(dict(start))
+    sim.step(180)
+    assert sim.state == expected
+
+
+def test_auto_reset_restarts_on_the_tick_the_pet_dies():
+    sim = PetSimulation(auto_reset=True)
+    events = sim.step(600)
+    assert events.count("game_over") == events.count("sick") > 1
+    assert sim.state["health"] > 0
@@ -0,0 +1,113 @@
+"""
+Drives PetCareApp.handle_login against a throwaway database.
+
+The app needs the GUI dependencies (customtkinter, Pillow, matplotlib);
+without them these tests are skipped. No window is created: handle_login
+runs on an instance with just the attributes it reads.
+"""
+
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("customtkinter")
+pytest.importorskip("PIL")
+pytest.importorskip("matplotlib")
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import db  # noqa: E402
+from pet_simulation import PetSimulation  # noqa: E402
+
+
+class _Entry:
+    def __init__(self, text):
+        self.text = text
+
+    def get(self):
+        return self.text
+
+    def delete(self, first, last=None):
+        self.text = ""
+
+
+@pytest.fixture
+def app_module(tmp_path, monkeypatch):
+    # The module opens petpal_game.db in the working directory on import
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    sys.modules.pop("sqlite_main_app", None)
+    module = importlib.import_module("sqlite_main_app")
+    yield module
+    db.close_database()
+
+
+def _login_form(module, username, petname, password):
+    app = module.PetCareApp.__new__(module.PetCareApp)
+    app.username_entry = _Entry(username)
+    app.petname_entry = _Entry(petname)
+    app.password_entry = _Entry(password)
+    app.selected_pet = 0
+    app.frames = {"login": None, "welcome": None}
+    app.pet_data = {"id": 1, "name": "Buddy"}
+    app.current_pet_id = None
+    app.simulation = PetSimulation()
+    app.shown = []
+    app.setup_welcome_frame = lambda: None
+    app.update_welcome_message = lambda: None
+    app.update_pet_name_display = lambda: None
+    app.show_frame = app.shown.append
+    return app
+
+
+def test_login_creates_user_and_caches_pet(app_module):
+    app = _login_form(app_module, "alice", "Rex", "secret")
+    app.handle_login()
+
+    pet = db.get_database().execute_query("SELECT * FROM pet WHERE id = ?", (app.current_pet_id,), fetch=True)[0]
+    assert pet["name"] == "Rex"
+    assert app.shown == ["welcome"]
+    # Stats now live in the write-behind cache, shared with the simulation
+    assert db.pet_state_cache.get(pet["id"]) is app.pet_status
+
+    app.pet_status["hunger"] = 42
+    db.pet_state_cache.flush()
+    stored = db.get_database().execute_query("SELECT hunger FROM pet WHERE id = ?", (pet["id"],), fetch=True)
+    assert stored[0]["hunger"] == 42
+
+
+def test_login_again_reuses_pet(app_module):
+    first = _login_form(app_module, "bob", "Max", "pw")
+    first.handle_login()
+    second = _login_form(app_module, "bob", "Maxi", "pw")
+    second.handle_login()
+
+    assert second.current_pet_id == first.current_pet_id
+    assert second.pet_data["name"] == "Maxi"
+
+
+def test_chat_is_saved_under_the_logged_in_user(app_module, monkeypatch):
+    import ai_client
+    from async_db import AsyncDatabase
+
+    app = _login_form(app_module, "carol", "Rex", "pw")
+    app.handle_login()
+    user_id = db.get_database().execute_query("SELECT id FROM users WHERE username = 'carol'", fetch=True)[0][0]
+    assert user_id != 1 and app.current_user_id == user_id
+
+    monkeypatch.setattr(ai_client, "send_message", lambda message: "Woof!")
+    futures = []
+    app.chat_entry = _Entry("Hello")
+    app._add_message_bubble = lambda *args: None
+    app.async_db = AsyncDatabase()
+    app.db_results = type("Dispatcher", (), {"deliver": lambda self, future: futures.append(future)})()
+    try:
+        app.send_chat_message()
+        futures[0].result(timeout=5)
+    finally:
+        app.async_db.close()
+
+    chats = db.get_database().execute_query("SELECT user_id, pet_id FROM ai_chathistory", fetch=True)
+    assert [tuple(chat) for chat in chats] == [(user_id, app.current_pet_id)]
@@ -0,0 +1,92 @@
+"""
+WorldRunner and its in-process Shard state against throwaway databases.
+"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import db  # noqa: E402
+from world_runner import Shard, WorldRunner  # noqa: E402
+
+
+@pytest.fixture
+def world(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    db.close_database()
+    path = tmp_path / "world.db"
+    database = db.DatabaseManager(path)
+    yield path, database
+    database.close()
+    db.close_database()
+
+
+def test_reminder_later_today_is_not_due_yet(world):
+    path, database = world
+    due = datetime.now().replace(microsecond=0) + timedelta(hours=2)
+    for stored in (due.isoformat(), due.strftime("%Y-%m-%d %H:%M:%S")):
+        database.execute_query(
+            """INSERT INTO reminders (pet_id, user_id, title, due_date, reminder_type)
+               VALUES (1, 1, 'Walk', ?, 'care')""", (stored,)
+        )
+
+    shard = Shard(path, 1, 1)
+    assert shard.tick(1)["reminders_due"] == 0
+    assert shard.tick(3 * 3600)["reminders_due"] == 2
+
+
+def test_runner_writes_to_its_own_database(world, tmp_path):
+    path, database = world
+    other = db.init_database(tmp_path / "other.db")
+    query = "SELECT hunger, CAST(strftime('%s', updated_at) AS INTEGER) FROM pet WHERE id = 1"
+    world_before, stamped_before = database.execute_query(query, fetch=True)[0]
+    other_before = other.execute_query(query, fetch=True)[0]
+
+    runner = WorldRunner(path, shards=1)
+    runner.tick(5, flush=True)
+    runner.close()
+
+    # The catch-up on load plus the 5 ticks: one point of hunger per second the stamp moved
+    world_after, stamped_after = database.execute_query(query, fetch=True)[0]
+    assert stamped_after >= stamped_before + 5
+    assert world_before - world_after == stamped_after - stamped_before
+    assert other.execute_query(query, fetch=True)[0] == other_before
+
+
+def test_shard_catches_up_offline_decay(world):
+    path, database = world
+    database.execute_query(
+        "UPDATE pet SET hunger = 90, energy = 90, cleanliness = 90, happiness = 90, "
+        "updated_at = datetime('now', '-30 seconds') WHERE id = 1"
+    )
+
+    shard = Shard(path, 1, 1)
+    rows, _ = shard.take_changes()
+    assert len(rows) == 1
+    # two seconds of slack for a slow run
+    assert 58 <= shard.population["hunger"][0] <= 60
+
+
+def test_shard_unlocks_stat_achievements_once(world):
+    path, database = world
+    database.execute_query("UPDATE achievement SET is_unlocked = 0")
+    database.execute_query("UPDATE pet SET happiness = 100, level = 10, updated_at = CURRENT_TIMESTAMP WHERE id = 1")
+    database.execute_query(
+        """INSERT INTO achievement (pet_id, achievement_name, achievement_type, description, icon, points,
+                                    requirement_type, requirement_value)
+           VALUES (1, 'Cheerful', 'friendship', 'Reach 95 happiness', 'heart', 10, 'happiness', 95)"""
+    )
+    by_name = {row["achievement_name"]: row["id"] for row in database.execute_query(
+        "SELECT achievement_name, id FROM achievement WHERE pet_id = 1", fetch=True
+    )}
+
+    shard = Shard(path, 1, 1)
+    shard.tick(1)
+    shard.tick(1)
+    _, unlocked = shard.take_changes()
+    # Happiness has decayed below 100 by the first check, so Best Friend stays locked
+    assert sorted(unlocked) == sorted([(1, by_name["Veteran"]), (1, by_name["Cheerful"])])
@@ -0,0 +1,294 @@
+"""
+Sharded world tick for multi-core servers.
+
+WorldRunner splits the pet table into id ranges and gives each range to a
+long-lived worker process. A worker loads its shard once, then keeps the
+shard's pets, locked stat achievements and pending reminders in memory
+and ticks them on request. The parent process is the only writer: on a
+flush it collects each shard's changed pets and unlocks and writes them
+to SQLite in one transaction.
+
+A shard catches its pets up on the decay owed since their updated_at when
+it loads them, and flushes stamp the rows with the shard's simulated
+clock, so offline decay is neither lost nor applied twice. Each shard
+steps its pets as one pet_population.PetPopulation, so this needs numpy.
+
+    runner = WorldRunner("petpal_game.db", shards=4)
+    for _ in range(60):
+        runner.tick()
+    runner.tick(flush=True)
+    print(runner.report())
+    runner.close()
+
+Workers are plain multiprocessing processes rather than a
+ProcessPoolExecutor, because a pool hands tasks to whichever worker is
+free, and a shard's state has to stay in the process that loaded it.
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+import db
+from pet_population import POPULATION_FIELDS, PetPopulation
+from pet_simulation import DECAY_TICK_SECONDS
+
+# Pet columns a shard keeps and writes back on flush
+SHARD_FIELDS = POPULATION_FIELDS
+
+
+def shard_ranges(database, shards):
+    """Split pet ids into up to `shards` contiguous (low, high) ranges of similar size"""
+    count = database.execute_query("SELECT COUNT(*) FROM pet", fetch=True)[0][0]
+    if not count:
+        return []
+    shards = max(1, min(shards, count))
+    bounds = []
+    for shard in range(shards):
+        # First id of each shard, found by offset into the primary key
+        offset = shard * count // shards
+        bounds.append(database.execute_query(
+            "SELECT id FROM pet ORDER BY id LIMIT 1 OFFSET ?", (offset,), fetch=True
+        )[0][0])
+    highest = database.execute_query("SELECT MAX(id) FROM pet", fetch=True)[0][0]
+    return [(low, (bounds[i + 1] - 1) if i + 1 < len(bounds) else highest) for i, low in enumerate(bounds)]
+
+
+def _parse_due_date(value):
+    """A reminder's due_date as a naive local datetime, like the shard clock; None if unreadable
+
+    The app stores local-time ISO strings; zone-aware values are converted.
+    """
+    try:
+        due = datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+    if due.tzinfo is not None:
+        due = due.astimezone().replace(tzinfo=None)
+    return due
+
+
+class Shard:
+    """In-memory state of the pets in one id range; lives inside a worker process
+
+    The pets' stats are a PetPopulation stepped all at once, and locked stat
+    achievements are checked as arrays, so a tick costs a few vector
+    operations rather than a Python loop over the pets.
+    """
+
+    def __init__(self, db_path, low, high):
+        self.low = low
+        self.high = high
+        self.clock = datetime.now().replace(microsecond=0)
+        self.locked = {}      # stat -> (pet indexes, required values, achievement ids)
+        self.unlocked = []    # (pet_id, achievement_id) since the last flush
+        self.reminders = []   # (due datetime, reminder_id, pet_id), soonest last
+
+        # Read-only connection of our own; all writes go through the parent
+        connection = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            columns = ', '.join(f"COALESCE({field}, 0)" for field in SHARD_FIELDS)
+            clock = int(self.clock.timestamp())
+            table = np.array(connection.execute(
+                f"""SELECT id, COALESCE(level, 1), {columns},
+                           MAX(0, COALESCE(? - CAST(strftime('%s', updated_at) AS INTEGER), 0))
+                    FROM pet WHERE id BETWEEN ? AND ? ORDER BY id""",
+                (clock, low, high)).fetchall(), dtype=np.int64).reshape(-1, len(SHARD_FIELDS) + 3)
+            self.population = PetPopulation(table[:, 0], table[:, 2:-1].T, clock=clock)
+            self.levels = table[:, 1]
+            # Decay owed since each row was written; those pets are rewritten on the next flush
+            self.population.catch_up(table[:, -1])
+
+            requirements = ', '.join('?' for _ in db.STAT_REQUIREMENTS)
+            locked = {}
+            for pet_id, achievement_id, stat, value in connection.execute(
+                    f"""SELECT pet_id, id, requirement_type, requirement_value FROM achievement
+                        WHERE is_unlocked = 0 AND requirement_type IN ({requirements})
+                        AND pet_id BETWEEN ? AND ?""", db.STAT_REQUIREMENTS + (low, high)):
+                locked.setdefault(stat, []).append((pet_id, value, achievement_id))
+            ids = self.population.ids
+            for stat, entries in locked.items():
+                pet_ids, values, achievement_ids = (np.array(column, dtype=np.int64) for column in zip(*entries))
+                indexes = np.searchsorted(ids, pet_ids)
+                known = (indexes < len(ids)) & (ids[np.minimum(indexes, len(ids) - 1)] == pet_ids)
+                self.locked[stat] = (indexes[known], values[known], achievement_ids[known])
+
+            for due_date, reminder_id, pet_id in connection.execute(
+                    """SELECT due_date, id, pet_id FROM reminders
+                       WHERE is_active = 1 AND is_completed = 0 AND pet_id BETWEEN ? AND ?""",
+                    (low, high)):
+                due = _parse_due_date(due_date)
+                if due is not None:
+                    self.reminders.append((due, reminder_id, pet_id))
+            self.reminders.sort(reverse=True)
+        finally:
+            connection.close()
+
+    def __len__(self):
+        return len(self.population)
+
+    def tick(self, ticks):
+        """Advance every pet; returns this tick's event counts"""
+        self.clock += timedelta(seconds=ticks * DECAY_TICK_SECONDS)
+        events = self.population.step(ticks)
+
+        for stat, (indexes, values, achievement_ids) in self.locked.items():
+            current = self.levels if stat == 'level' else self.population[stat]
+            met = current[indexes] >= values
+            if met.any():
+                self.unlocked.extend(zip(self.population.ids[indexes[met]].tolist(), achievement_ids[met].tolist()))
+                self.locked[stat] = (indexes[~met], values[~met], achievement_ids[~met])
+
+        due = 0
+        while self.reminders and self.reminders[-1][0] <= self.clock:
+            self.reminders.pop()
+            due += 1
+        return {'sick': len(events['sick']), 'game_over': len(events['game_over']), 'reminders_due': due}
+
+    def take_changes(self):
+        """Changed pet rows and unlocks since the last call, ready for the writer
+
+        Rows are stamped with the simulated time their stats are current as of.
+        """
+        population = self.population
+        changed = population.changed()
+        clock = np.full(len(changed), population.clock, dtype=np.int64)
+        # tolist() gives plain ints, which pickle small and bind in sqlite3
+        rows = [tuple(row) for row in
+                np.vstack([population.stats[:, changed], clock, population.ids[changed]]).T.tolist()]
+        population.mark_written(changed)
+        unlocked = self.unlocked
+        self.unlocked = []
+        return rows, unlocked
+
+
+def _shard_main(db_path, low, high, connection):
+    """Worker process entry point: serve tick/stop commands for one shard"""
+    shard = Shard(db_path, low, high)
+    connection.send({'pets': len(shard)})
+    while True:
+        command, ticks, flush = connection.recv()
+        if command == 'stop':
+            break
+        start = time.perf_counter()
+        reply = shard.tick(ticks)
+        reply['seconds'] = time.perf_counter() - start
+        if flush:
+            reply['rows'], reply['unlocked'] = shard.take_changes()
+        connection.send(reply)
+    connection.close()
+
+
+class WorldRunner:
+    """Ticks every pet across long-lived worker processes, one per id-range shard"""
+
+    def __init__(self, db_path="petpal_game.db", shards=None):
+        self.db_path = db_path
+        # Our own manager on db_path: the workers read that file, so the writes must go there
+        # too, whatever database the process has open globally
+        self.database = db.DatabaseManager(db_path)
+        self.ranges = shard_ranges(self.database, shards or os.cpu_count() or 1)
+        self.latencies = [[] for _ in self.ranges]
+        self.events = {'sick': 0, 'game_over': 0, 'reminders_due': 0}
+
+        # spawn, so workers never inherit the parent's SQLite connections
+        context = multiprocessing.get_context('spawn')
+        self._workers = []
+        for low, high in self.ranges:
+            parent_end, child_end = context.Pipe()
+            process = context.Process(target=_shard_main, args=(db_path, low, high, child_end), daemon=True)
+            process.start()
+            self._workers.append((process, parent_end))
+        self.shard_sizes = [connection.recv()['pets'] for _, connection in self._workers]
+
+    def tick(self, ticks=1, flush=False):
+        """Tick every shard in parallel, then write their changes if flush; returns pets written"""
+        for _, connection in self._workers:
+            connection.send(('tick', ticks, flush))
+        replies = [connection.recv() for _, connection in self._workers]
+
+        rows = []
+        unlocked = []
+        for shard, reply in enumerate(replies):
+            self.latencies[shard].append(reply['seconds'])
+            for event in self.events:
+                self.events[event] += reply[event]
+            rows.extend(reply.get('rows', ()))
+            unlocked.extend(reply.get('unlocked', ()))
+        if flush:
+            return self._write(rows, unlocked)
+        return 0
+
+    def _write(self, rows, unlocked):
+        """Single-writer flush of every shard's changes in one transaction"""
+        if not rows and not unlocked:
+            return 0
+        with self.database.transaction():
+            if rows:
+                self.database.execute_many(
+                    f"""UPDATE pet SET {', '.join(f'{field} = ?' for field in SHARD_FIELDS)},
+                        updated_at = datetime(?, 'unixepoch') WHERE id = ?""",
+                    rows
+                )
+            if unlocked:
+                self.database.execute_many(
+                    """UPDATE achievement SET is_unlocked = 1, unlocked_at = CURRENT_TIMESTAMP
+                       WHERE id = ? AND is_unlocked = 0""",
+                    [(achievement_id,) for _, achievement_id in unlocked]
+                )
+        # The in-process engine's cache of locked achievements is now stale
+        db.achievement_engine.reset()
+        return len(rows)
+
+    def report(self):
+        """Per-shard tick latency: one dict per shard"""
+        report = []
+        for shard, ((low, high), latencies) in enumerate(zip(self.ranges, self.latencies)):
+            ordered = sorted(latencies) or [0.0]
+            report.append({
+                'shard': shard,
+                'ids': (low, high),
+                'pets': self.shard_sizes[shard],
+                'ticks': len(latencies),
+                'mean_ms': statistics.fmean(ordered) * 1000,
+                'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+                'max_ms': ordered[-1] * 1000,
+            })
+        return report
+
+    def close(self, flush=True):
+        """Optionally write outstanding changes, then stop the workers"""
+        if flush and self._workers:
+            self.tick(0, flush=True)
+        for process, connection in self._workers:
+            connection.send(('stop', 0, False))
+            process.join()
+            connection.close()
+        self._workers = []
+        if self.database is not None:
+            self.database.close()
+            self.database = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage: python world_runner.py [shards] [ticks] [db_path]
+    shards = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    ticks = int(sys.argv[2]) if len(sys.argv) > 2 else 60
+    db_path = sys.argv[3] if len(sys.argv) > 3 else "petpal_game.db"
+    runner = WorldRunner(db_path, shards=shards)
+    for second in range(ticks):
+        runner.tick(flush=(second % 30 == 29))
+    runner.close()
+    for shard in runner.report():
+        print(f"shard {shard['shard']} ids {shard['ids'][0]}-{shard['ids'][1]}: {shard['pets']} pets, "
+              f"{shard['ticks']} ticks, mean {shard['mean_ms']:.2f} ms, p95 {shard['p95_ms']:.2f} ms, "
+              f"max {shard['max_ms']:.2f} ms")
+    print(f"events: {runner.events}")